@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark of patch verification: subprocess git apply against the in-memory applier.
+Part of project resonantrabbit.
+
+Usage: python benchmarks/bench_apply.py [--patches N] [--files N] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resonantrabbit import applier
+
+
+def make_tree(files, lines, rng):
+    """Return a tree of text files mapping paths to content."""
+    return {
+        f"src/file{i}.txt": "".join(
+            f"{rng.choice(['alpha', 'beta', 'gamma'])} {i}.{n}\n" for n in range(lines)
+        ).encode()
+        for i in range(files)
+    }
+
+
+def make_patch(tree, rng):
+    """Return a git-style patch changing a few lines of a few files of tree."""
+    chunks = []
+    for path in rng.sample(sorted(tree), min(3, len(tree))):
+        lines = tree[path].decode().splitlines(True)
+        chunks.append(f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n")
+        starts = sorted(rng.sample(range(3, len(lines) - 3, 8), 3))
+        # Every earlier hunk adds one line, shifting the target start
+        for offset, start in enumerate(starts):
+            chunks.append(f"@@ -{start - 2},7 +{start - 2 + offset},8 @@\n")
+            chunks.extend(f" {line}" for line in lines[start - 3 : start])
+            chunks.extend((
+                f"-{lines[start]}",
+                f"+{lines[start].rstrip()} changed\n+added {start}\n",
+            ))
+            chunks.extend(f" {line}" for line in lines[start + 1 : start + 4])
+    return "".join(chunks).encode()
+
+
+def check_git_apply(directory, patches):
+    """Verify every patch with one git apply --check process each."""
+    for patch in patches:
+        subprocess.run(
+            ["git", "apply", "--check"],
+            cwd=directory,
+            input=patch,
+            check=True,
+            capture_output=True,
+        )
+
+
+def check_in_memory(tree, patches):
+    """Verify every patch by applying it to a copy of the in-memory tree."""
+    for patch in patches:
+        applier.apply_patch(applier.parse_patch(patch), dict(tree))
+
+
+def check_overlay(directory, patches):
+    """Verify every patch by applying it to an overlay of the directory."""
+    for patch in patches:
+        applier.apply_patch(applier.parse_patch(patch), applier.OverlayTree(directory))
+
+
+def best_time(function, repeat):
+    """Return the best wall time of several runs of function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patches", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    tree = make_tree(args.files, args.lines, rng)
+    patches = [make_patch(tree, rng) for _ in range(args.patches)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for path, content in tree.items():
+            os.makedirs(os.path.join(directory, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(directory, path), "wb") as f:
+                f.write(content)
+
+        variants = [
+            ("git apply --check", lambda: check_git_apply(directory, patches)),
+            ("applier on overlay", lambda: check_overlay(directory, patches)),
+            ("applier in memory", lambda: check_in_memory(tree, patches)),
+        ]
+        print(
+            f"Verifying {args.patches} patches against {args.files} files, "
+            f"best of {args.repeat}:"
+        )
+        baseline = None
+        for name, function in variants:
+            seconds = best_time(function, args.repeat)
+            baseline = baseline or seconds
+            print(
+                f"  {name:<20} {seconds:8.3f}s  "
+                f"{seconds / args.patches * 1000:7.2f} ms/patch  {baseline / seconds:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark of patch memory use: the unidiff object graph against compact lines.
+Part of project resonantrabbit.
+
+Usage: python benchmarks/bench_memory.py [--lines N] [--repeat N]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resonantrabbit import compact, corpus, main
+
+
+def load_compact_bytes(path):
+    """Read the whole patch into memory and index it as compact lines."""
+    with open(path, "rb") as f:
+        return compact.CompactPatchSet(f.read())
+
+
+# Variant name and the function loading a patch set from a path
+VARIANTS = [
+    ("unidiff PatchSet", main.load_patch_from_file),
+    ("CompactPatchSet bytes", load_compact_bytes),
+    ("CompactPatchSet mmap", compact.CompactPatchSet.from_filename),
+]
+
+
+def measure_memory(load, path):
+    """Return the bytes kept by a loaded patch set and the peak while loading.
+
+    Memory maps are not traced, so the mmap variant counts only its index.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        patch_set = load(path)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if hasattr(patch_set, "close"):
+        patch_set.close()
+    return retained, peak
+
+
+def best_time(function, repeat):
+    """Return the best wall time of several runs of function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.patch")
+        line_count = corpus.write_corpus(
+            path, corpus.CorpusSpec(target_lines=args.lines), seed=0
+        )
+        print(
+            f"Patch of {line_count} lines, {os.path.getsize(path) / 2**20:.1f} MiB, "
+            f"best of {args.repeat}:"
+        )
+        print(
+            f"  {'variant':<22} {'retained MiB':>12} {'bytes/line':>10} "
+            f"{'peak MiB':>9} {'load s':>7} {'analyze s':>9}"
+        )
+
+        baseline = None
+        for name, load in VARIANTS:
+            retained, peak = measure_memory(load, path)
+            load_seconds = best_time(lambda load=load: load(path), args.repeat)
+            patch_set = load(path)
+            analyze_seconds = best_time(
+                lambda patch_set=patch_set: main.analyze_patch(patch_set, render=False),
+                args.repeat,
+            )
+            if hasattr(patch_set, "close"):
+                patch_set.close()
+            del patch_set
+
+            baseline = baseline or retained
+            print(
+                f"  {name:<22} {retained / 2**20:12.1f} {retained / line_count:10.1f} "
+                f"{peak / 2**20:9.1f} {load_seconds:7.3f} {analyze_seconds:9.3f}"
+                f"  {baseline / retained:5.1f}x smaller"
+            )
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the patch pipeline with stored baselines and regression gating.
+Part of project resonantrabbit.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes NAME ...] [--save-baseline]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib import metadata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resonantrabbit import corpus, main
+
+# Target patch line counts of the generated corpora
+SIZES = {"small": 1_000, "medium": 100_000, "huge": 1_000_000}
+CORPUS_SEED = 17
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline.json"
+)
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.10
+# Slowdowns smaller than this are timer noise on the small corpus
+MIN_TIME_DELTA = 0.005
+
+
+def rendered(function):
+    """Run a report function with its text output discarded."""
+
+    def run(patch_set):
+        with (
+            open(os.devnull, "w", encoding="utf-8") as devnull,
+            contextlib.redirect_stdout(devnull),
+        ):
+            return function(patch_set)
+
+    return run
+
+
+# Benchmark name, whether it takes a loaded PatchSet, and the measured call
+CASES = [
+    ("load_patch_from_file", False, main.load_patch_from_file),
+    ("analyze_patch", True, rendered(main.analyze_patch)),
+    (
+        "demonstrate_empty_line_detection",
+        True,
+        rendered(main.demonstrate_empty_line_detection),
+    ),
+]
+
+
+def best_time(function, argument, repeat):
+    """Return the best wall time of several calls of function(argument)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(function, argument):
+    """Return the peak bytes traced while calling function(argument).
+
+    Allocations made before the call, such as a loaded PatchSet passed in,
+    are not counted.
+    """
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(sizes, repeat, directory):
+    """Measure every case on a generated patch of each size.
+
+    Returns {size: {case: {"lines", "seconds", "lines_per_second",
+    "peak_bytes"}}}.
+    Times are taken without tracemalloc, whose overhead would skew them, and
+    peak memory in one more traced call.
+    """
+    results = {}
+    for size, target_lines in sizes.items():
+        path = os.path.join(directory, f"{size}.patch")
+        line_count = corpus.write_corpus(
+            path, corpus.CorpusSpec(target_lines=target_lines), CORPUS_SEED
+        )
+        patch_set = main.load_patch_from_file(path)
+
+        results[size] = {}
+        for name, takes_patch_set, function in CASES:
+            argument = patch_set if takes_patch_set else path
+            seconds = best_time(function, argument, repeat)
+            results[size][name] = {
+                "lines": line_count,
+                "seconds": round(seconds, 6),
+                "lines_per_second": round(line_count / seconds),
+                "peak_bytes": peak_memory(function, argument),
+            }
+        del patch_set
+    return results
+
+
+def environment():
+    """Describe what the results were measured with."""
+    return {
+        "python": platform.python_version(),
+        "unidiff": metadata.version("unidiff"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def find_regressions(results, baseline, time_threshold, memory_threshold):
+    """Return a message for every case slower or larger than its baseline.
+
+    A case regresses when its time or peak memory exceeds the baseline by more
+    than the threshold fraction, and for times by at least MIN_TIME_DELTA.
+    Cases missing from either side are skipped.
+    """
+    regressions = []
+    for size, cases in results.items():
+        for name, result in cases.items():
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            for key, threshold, slack in (
+                ("seconds", time_threshold, MIN_TIME_DELTA),
+                ("peak_bytes", memory_threshold, 0),
+            ):
+                limit = max(expected[key] * (1 + threshold), expected[key] + slack)
+                if result[key] > limit:
+                    regressions.append(
+                        f"{size} {name}: {key} {result[key]} > baseline "
+                        f"{expected[key]} + {threshold:.0%}"
+                    )
+    return regressions
+
+
+def print_results(results, baseline):
+    """Print one row per case with its change against the baseline."""
+    print(
+        f"{'size':<8} {'case':<34} {'seconds':>9} {'lines/s':>11} "
+        f"{'peak MiB':>9} {'time':>7} {'memory':>7}"
+    )
+    for size, cases in results.items():
+        for name, result in cases.items():
+            expected = baseline.get(size, {}).get(name)
+            changes = ["", ""]
+            if expected is not None:
+                changes = [
+                    f"{result[key] / expected[key] - 1:+.0%}"
+                    for key in ("seconds", "peak_bytes")
+                ]
+            print(
+                f"{size:<8} {name:<34} {result['seconds']:9.3f} "
+                f"{result['lines_per_second']:11,d} "
+                f"{result['peak_bytes'] / 2**20:9.1f} {changes[0]:>7} {changes[1]:>7}"
+            )
+
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store this run as the baseline instead of comparing against it",
+    )
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if not args.save_baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            print(
+                f"No baseline at {args.baseline}; run with --save-baseline",
+                file=sys.stderr,
+            )
+            return 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_benchmarks(
+            {size: SIZES[size] for size in args.sizes}, args.repeat, directory
+        )
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+            f.write("\n")
+        print_results(results, {})
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    print_results(results, stored["results"])
+    if stored["environment"] != environment():
+        print(f"Note: baseline measured on {stored['environment']}")
+    regressions = find_regressions(
+        results, stored["results"], args.time_threshold, args.memory_threshold
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark of report output: print per line against the buffered ReportWriter.
+Part of project resonantrabbit.
+
+Usage: python benchmarks/bench_writer.py [--files N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resonantrabbit import corpus, main, writer
+
+
+def render_print_per_line(summaries, path):
+    """Render the report with one print call per line, as before ReportWriter."""
+    with open(path, "w", encoding="utf-8") as f:
+        for summary in summaries:
+            for line in main.format_file_analysis(summary):
+                print(line, file=f)
+        print(f"PatchSet contains {len(summaries)} files.", file=f)
+        print(file=f)
+        print("=== Empty Line Change Analysis ===", file=f)
+        print(file=f)
+        for summary in summaries:
+            if summary.empty_added > 0 or summary.empty_removed > 0:
+                print(f"File {summary.path}:", file=f)
+                print(f"  Empty lines added: {summary.empty_added}", file=f)
+                print(f"  Empty lines removed: {summary.empty_removed}", file=f)
+                print(file=f)
+
+
+def render_report_writer(summaries, path, compress=False):
+    """Render the report through one buffered ReportWriter."""
+    with writer.open_report_writer(path, compress=compress) as out:
+        main.print_patch_report(summaries, out)
+
+
+def best_time(function, repeat):
+    """Return the best wall time of several runs of function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    summaries = list(
+        map(
+            main.summarize_file,
+            main.iter_patch_files(
+                corpus.iter_corpus_lines(corpus.CorpusSpec(files=args.files))
+            ),
+        )
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.txt")
+        variants = [
+            ("print per line", lambda: render_print_per_line(summaries, path)),
+            ("ReportWriter", lambda: render_report_writer(summaries, path)),
+            (
+                "ReportWriter gzip",
+                lambda: render_report_writer(summaries, path + ".gz", compress=True),
+            ),
+        ]
+
+        print(f"Rendering the report of {args.files} files, best of {args.repeat}:")
+        baseline = None
+        for name, function in variants:
+            seconds = best_time(function, args.repeat)
+            baseline = baseline or seconds
+            print(f"  {name:<20} {seconds:8.3f}s  {baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,7 @@
+"""
+Analyze git patches, with a focus on empty line changes.
+Part of project resonantrabbit.
+
+Modules are imported on demand, so that light entry points such as the
+daemon client and the pre-commit hook do not load the whole analysis.
+"""
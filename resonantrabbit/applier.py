@@ -0,0 +1,289 @@
+"""
+In-memory patch applier following git apply.
+Part of project resonantrabbit.
+"""
+
+import io
+import os
+from collections.abc import MutableMapping
+
+import unidiff
+from unidiff.constants import (
+    DEV_NULL,
+    LINE_TYPE_ADDED,
+    LINE_TYPE_CONTEXT,
+    LINE_TYPE_NO_NEWLINE,
+    LINE_TYPE_REMOVED,
+)
+
+# Patch text is decoded so that any byte survives the round trip back into
+# file content
+ENCODING = "utf-8"
+ERRORS = "surrogateescape"
+
+# Git directory left out when an overlay lists its base directory
+GIT_DIR = ".git"
+
+
+class PatchApplyError(ValueError):
+    """A patch does not apply to a tree; nothing was changed."""
+
+
+def parse_patch(data, encoding=ENCODING):
+    """Return the PatchSet of patch bytes, keeping line endings as they are.
+
+    Lines are split on LF only, unlike universal newlines, so CRLF and bare
+    CR in file content are applied unchanged.
+    """
+    return unidiff.PatchSet(
+        io.TextIOWrapper(
+            io.BytesIO(data), encoding=encoding, errors=ERRORS, newline="\n"
+        )
+    )
+
+
+def split_lines(content):
+    """Split file content into lines as git does, on LF only."""
+    lines = content.split(b"\n")
+    last = lines.pop()
+    lines = [line + b"\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+class OverlayTree(MutableMapping):
+    """Files of a directory, with changes kept in memory on top of it.
+
+    Maps paths relative to root to file content; the directory itself is
+    only read, and files are read when first looked up.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # Path to new content, or to None for a deleted file
+        self.changes = {}
+
+    def __getitem__(self, path):
+        if path in self.changes:
+            content = self.changes[path]
+            if content is None:
+                raise KeyError(path)
+            return content
+        try:
+            with open(os.path.join(self.root, path), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            raise KeyError(path) from None
+
+    def __setitem__(self, path, content):
+        self.changes[path] = content
+
+    def __delitem__(self, path):
+        if path not in self:
+            raise KeyError(path)
+        self.changes[path] = None
+
+    def __contains__(self, path):
+        if path in self.changes:
+            return self.changes[path] is not None
+        return os.path.isfile(os.path.join(self.root, path))
+
+    def __iter__(self):
+        for directory, subdirectories, files in os.walk(self.root):
+            if GIT_DIR in subdirectories:
+                subdirectories.remove(GIT_DIR)
+            for name in files:
+                path = os.path.relpath(os.path.join(directory, name), self.root)
+                path = path.replace(os.sep, "/")
+                if path not in self.changes:
+                    yield path
+        for path, content in self.changes.items():
+            if content is not None:
+                yield path
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def strip_prefix(name):
+    """Return a git diff file name without its a/ or b/ prefix, or None for
+    /dev/null."""
+    if name == DEV_NULL:
+        return None
+    if name.startswith(("a/", "b/")):
+        return name[2:]
+    return name
+
+
+def file_paths(patched_file):
+    """Return the paths a file diff reads and writes, None for /dev/null."""
+    source = strip_prefix(patched_file.source_file)
+    target = strip_prefix(patched_file.target_file)
+    if not getattr(patched_file, "is_rename", False):
+        # Names of plain diffs may differ, such as "x.orig" and "x"
+        path = patched_file.path
+        source = None if source is None else path
+        target = None if target is None else path
+    return source, target
+
+
+def hunk_images(hunk, encoding=ENCODING):
+    """Return the lines a hunk replaces, the lines it puts in their place,
+    and its number of leading and trailing context lines."""
+    preimage = []
+    postimage = []
+    leading = trailing = 0
+    changed = False
+    last_type = None
+    for line in hunk:
+        line_type = line.line_type
+        if line_type == LINE_TYPE_NO_NEWLINE:
+            # The line before has no newline in the file
+            if last_type in (LINE_TYPE_CONTEXT, LINE_TYPE_REMOVED):
+                preimage[-1] = preimage[-1].removesuffix(b"\n")
+            if last_type in (LINE_TYPE_CONTEXT, LINE_TYPE_ADDED):
+                postimage[-1] = postimage[-1].removesuffix(b"\n")
+            continue
+        value = line.value.encode(encoding, ERRORS)
+        if line_type == LINE_TYPE_CONTEXT:
+            preimage.append(value)
+            postimage.append(value)
+            if changed:
+                trailing += 1
+            else:
+                leading += 1
+        elif line_type == LINE_TYPE_REMOVED:
+            preimage.append(value)
+            changed = True
+            trailing = 0
+        elif line_type == LINE_TYPE_ADDED:
+            postimage.append(value)
+            changed = True
+            trailing = 0
+        else:
+            continue
+        last_type = line_type
+    return preimage, postimage, leading, trailing
+
+
+def find_position(
+    image, preimage, line, match_beginning=False, match_end=False, patched=None
+):
+    """Return where preimage matches the lines of image, or None.
+
+    The search starts at line and moves alternately one line further down
+    and up, as git apply does; match_beginning and match_end pin the match
+    to the start or the end of the image. Lines flagged in patched, written
+    by earlier hunks, are never matched again.
+    """
+    size = len(preimage)
+    if size > len(image):
+        return None
+    if match_beginning:
+        line = 0
+    elif match_end:
+        line = len(image) - size
+    line = min(line, len(image))
+
+    def matches(position):
+        if match_beginning and position:
+            return False
+        if match_end and position + size != len(image):
+            return False
+        if patched is not None and any(patched[position : position + size]):
+            return False
+        return image[position : position + size] == preimage
+
+    if matches(line):
+        return line
+    backwards = forwards = line
+    while backwards > 0 or forwards < len(image):
+        if forwards < len(image):
+            forwards += 1
+            if matches(forwards):
+                return forwards
+        if backwards > 0:
+            backwards -= 1
+            if matches(backwards):
+                return backwards
+    return None
+
+
+def apply_hunks(patched_file, path, content, unidiff_zero=False, encoding=ENCODING):
+    """Return file content with the hunks of a file diff applied.
+
+    Raises PatchApplyError when a hunk's context or removed lines are not
+    found, without fuzz or overlapping an earlier hunk; unidiff_zero relaxes
+    the position checks for hunks without context, like git apply
+    --unidiff-zero.
+    """
+    image = split_lines(content)
+    patched = [False] * len(image)
+    for hunk in patched_file:
+        preimage, postimage, _, trailing = hunk_images(hunk, encoding)
+        match_beginning = hunk.source_start == 0 or (
+            hunk.source_start == 1 and not unidiff_zero
+        )
+        match_end = not unidiff_zero and not trailing
+        line = hunk.target_start - 1 if hunk.target_start else 0
+        position = find_position(
+            image, preimage, line, match_beginning, match_end, patched
+        )
+        if position is None:
+            raise PatchApplyError(f"patch failed: {path}:{hunk.source_start}")
+        image[position : position + len(preimage)] = postimage
+        patched[position : position + len(preimage)] = [True] * len(postimage)
+    return b"".join(image)
+
+
+def apply_patch(patch_set, tree, unidiff_zero=False, encoding=ENCODING):
+    """Apply a parsed patch to a tree mapping paths to file content.
+
+    Like git apply, every file diff is checked before the tree is changed,
+    so on PatchApplyError the tree is left as it was. A dict serves as an
+    in-memory tree and an OverlayTree as a directory with in-memory changes.
+    Returns the changes made, mapping paths to new content or None for
+    deleted files.
+    """
+    changes = {}
+
+    def read(path):
+        if path in changes:
+            return changes[path]
+        return tree.get(path)
+
+    for patched_file in patch_set:
+        source, target = file_paths(patched_file)
+        name = target or source
+        if getattr(patched_file, "is_binary_file", False):
+            raise PatchApplyError(f"{name}: cannot apply binary patch")
+
+        if source is None:
+            if read(target) is not None:
+                raise PatchApplyError(f"{target}: already exists in working directory")
+            if any(hunk_images(hunk, encoding)[0] for hunk in patched_file):
+                raise PatchApplyError(f"new file {target} depends on old contents")
+            content = b""
+        else:
+            content = read(source)
+            if content is None:
+                raise PatchApplyError(f"{source}: No such file or directory")
+            if target is not None and target != source and read(target) is not None:
+                raise PatchApplyError(f"{target}: already exists in working directory")
+
+        content = apply_hunks(patched_file, name, content, unidiff_zero, encoding)
+        if target is None:
+            if content:
+                raise PatchApplyError(f"removal patch leaves file contents: {source}")
+        else:
+            changes[target] = content
+        if source is not None and source != target:
+            changes[source] = None
+
+    for path, content in changes.items():
+        if content is None:
+            tree.pop(path, None)
+        else:
+            tree[path] = content
+    return changes
@@ -0,0 +1,388 @@
+"""
+Streaming rewriter removing whitespace-only noise from patches.
+Part of project resonantrabbit.
+"""
+
+from collections import deque
+
+import unidiff
+from unidiff.constants import DEV_NULL, RE_SOURCE_FILENAME, RE_TARGET_FILENAME
+
+from . import scanner
+from .compressed import open_patch_input
+
+# Bytes of rewritten patch joined into one write to the sink
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# Git extended header lines that still mean something when no hunk of the
+# file is left; a file diff with none of them is dropped with its hunks
+KEPT_HEADERS = (
+    b"old mode ",
+    b"new mode ",
+    b"similarity index ",
+    b"dissimilarity index ",
+    b"rename from ",
+    b"rename to ",
+    b"copy from ",
+    b"copy to ",
+)
+
+# Header lines naming the file, left out when only the extended header stays
+FILE_HEADERS = (b"--- ", b"+++ ")
+
+WHITESPACE = b" \t\f\v"
+
+
+def line_key(body, no_newline):
+    """Return what is compared of a line body: content without trailing
+    whitespace, and the line ending."""
+    if no_newline:
+        # The patch line ends after the content, which has no line ending
+        return body.removesuffix(b"\n").rstrip(WHITESPACE), b""
+    if body.endswith(b"\r\n"):
+        return body[:-2].rstrip(WHITESPACE), b"\r\n"
+    if body.endswith(b"\n"):
+        return body[:-1].rstrip(WHITESPACE), b"\n"
+    return body.rstrip(WHITESPACE), b""
+
+
+def is_noise(body, no_newline):
+    """Return True if a body is a blank line that may be dropped or kept."""
+    return not no_newline and scanner.is_blank(body)
+
+
+def pair_lines(removed_keys, added_keys):
+    """Return the (i, j) index pairs of removed and added lines to pair up.
+
+    Equal keys at the start and end of the run are paired by position; in
+    between, each removed line takes the first added line of its key after
+    the last pair. Pairs keep their order on both sides, and the run is
+    walked in linear time, where a longest matching is quadratic in its
+    length.
+    """
+    removed_end = len(removed_keys)
+    added_end = len(added_keys)
+    start = 0
+    limit = min(removed_end, added_end)
+    while start < limit and removed_keys[start] == added_keys[start]:
+        start += 1
+    while (
+        removed_end > start
+        and added_end > start
+        and removed_keys[removed_end - 1] == added_keys[added_end - 1]
+    ):
+        removed_end -= 1
+        added_end -= 1
+
+    pairs = [(i, i) for i in range(start)]
+    positions = {}
+    for j in range(start, added_end):
+        positions.setdefault(added_keys[j], deque()).append(j)
+    next_j = start
+    for i in range(start, removed_end):
+        candidates = positions.get(removed_keys[i])
+        while candidates and candidates[0] < next_j:
+            candidates.popleft()
+        if candidates:
+            j = candidates.popleft()
+            pairs.append((i, j))
+            next_j = j + 1
+    pairs.extend(
+        zip(range(removed_end, len(removed_keys)), range(added_end, len(added_keys)))
+    )
+    return pairs
+
+
+def fix_change(removed, added):
+    """Return the hunk lines replacing one run of removed and added lines.
+
+    Removed and added lines that differ only in trailing whitespace are
+    paired up in order and become context lines of the source version.
+    Blank lines left unpaired are kept when removed and dropped when added.
+    Lines without a final newline are only paired with one another, so
+    end-of-file newline changes are kept.
+    """
+    pairs = pair_lines(
+        [line_key(*line) for line in removed], [line_key(*line) for line in added]
+    )
+    lines = []
+    i = j = 0
+    for pair_i, pair_j in [*pairs, (len(removed), len(added))]:
+        for body, no_newline in removed[i:pair_i]:
+            marker = scanner.CONTEXT if is_noise(body, no_newline) else scanner.REMOVED
+            lines.append((marker, body, no_newline))
+        lines.extend(
+            (scanner.ADDED, body, no_newline)
+            for body, no_newline in added[j:pair_j]
+            if not is_noise(body, no_newline)
+        )
+        if pair_i < len(removed):
+            lines.append((scanner.CONTEXT, *removed[pair_i]))
+        i = pair_i + 1
+        j = pair_j + 1
+    return lines
+
+
+def fix_hunk_lines(lines):
+    """Return the lines of a hunk without its whitespace-only changes.
+
+    lines are (marker, body, no_newline) triples of one hunk body.
+    """
+    fixed = []
+    removed = []
+    added = []
+    for marker, body, no_newline in lines:
+        if marker == scanner.REMOVED:
+            removed.append((body, no_newline))
+        elif marker == scanner.ADDED:
+            added.append((body, no_newline))
+        else:
+            if removed or added:
+                fixed.extend(fix_change(removed, added))
+                removed = []
+                added = []
+            fixed.append((marker, body, no_newline))
+    if removed or added:
+        fixed.extend(fix_change(removed, added))
+    return fixed
+
+
+def hunk_header(source_start, source_length, target_length, offset, section):
+    """Return the "@@" line of a rewritten hunk.
+
+    offset is how many more lines the target has than the source before the
+    hunk; empty ranges start at the line before them, as in git output.
+    """
+    before = source_start - 1 if source_length else source_start
+    target_start = before + offset + 1 if target_length else before + offset
+    header = (
+        f"@@ -{source_start},{source_length} +{target_start},{target_length} @@"
+        f"{' ' + section if section else ''}\n"
+    )
+    return header.encode("utf-8")
+
+
+def render_hunk(lines):
+    """Yield the raw body lines of (marker, body, no_newline) triples."""
+    for marker, body, no_newline in lines:
+        yield bytes((marker,)) + body
+        if no_newline:
+            yield b"\\ No newline at end of file\n"
+
+
+class PatchRewriter:
+    """State of one pass rewriting the raw lines of a patch.
+
+    File headers are held back until a hunk of the file is kept, and hunks
+    are rewritten one at a time, so memory stays bounded by the largest
+    hunk. Hunks of new and deleted files are passed through line by line.
+    Rewritten lines collect in output, for the caller to write and clear.
+    """
+
+    def __init__(self):
+        self.output = []
+        self.pending_source = None
+        self.source_left = self.target_left = 0
+        self.in_file = False
+        self.reset_file()
+
+    def reset_file(self):
+        self.header = []
+        self.trailer = []
+        self.header_written = False
+        self.in_git_header = False
+        self.source_file = self.target_file = None
+        self.had_hunks = False
+        self.verbatim = False
+        self.offset = 0
+        self.hunk = None
+        self.hunk_lines = []
+
+    def feed(self, line):
+        """Take one raw patch line."""
+        if self.source_left > 0 or self.target_left > 0:
+            self.hunk_line(line)
+        elif line.startswith(b"\\") and self.hunk is not None:
+            self.no_newline(line)
+        elif line.startswith(scanner.DIFF_GIT_HEADER):
+            self.start_file(line)
+            self.source_file, self.target_file = scanner.parse_diff_git_header(line)
+            self.in_git_header = True
+        elif line.startswith(b"@@ ") and (header := scanner.parse_hunk_header(line)):
+            self.start_hunk(line, header)
+        elif self.in_git_header and line.startswith(b"new file mode "):
+            self.source_file = DEV_NULL
+            self.header.append(line)
+        elif self.in_git_header and line.startswith(b"deleted file mode "):
+            self.target_file = DEV_NULL
+            self.header.append(line)
+        elif line.startswith(b"--- ") and not self.in_git_header:
+            # A plain unified diff starts a new file at its source header
+            match = RE_SOURCE_FILENAME.match(line.decode("utf-8"))
+            if match is None:
+                self.other_line(line)
+            else:
+                self.start_file(line)
+                self.pending_source = match.group("filename")
+        elif line.startswith(b"+++ ") and self.pending_source is not None:
+            match = RE_TARGET_FILENAME.match(line.decode("utf-8"))
+            if match is not None:
+                self.source_file = self.pending_source
+                self.target_file = match.group("filename")
+            self.pending_source = None
+            self.other_line(line)
+        else:
+            self.other_line(line)
+
+    def close(self):
+        """Finish the patch; raises UnidiffParseError for a truncated hunk."""
+        if self.source_left > 0 or self.target_left > 0:
+            raise unidiff.UnidiffParseError("Hunk is shorter than expected")
+        self.end_file()
+
+    def start_file(self, line):
+        self.end_file()
+        self.in_file = True
+        self.header.append(line)
+
+    def end_file(self):
+        """Write what is left of the current file diff."""
+        self.end_hunk()
+        if self.in_file and not self.header_written:
+            if not self.had_hunks:
+                # Nothing to rewrite, such as a binary or mode-only diff
+                self.output.extend(self.header)
+            elif any(line.startswith(KEPT_HEADERS) for line in self.header):
+                self.output.extend(
+                    line for line in self.header if not line.startswith(FILE_HEADERS)
+                )
+            self.output.extend(self.trailer)
+        self.in_file = False
+        self.reset_file()
+
+    def write_header(self):
+        if not self.header_written:
+            self.output.extend(self.header)
+            self.output.extend(self.trailer)
+            self.header_written = True
+
+    def other_line(self, line):
+        """Take a line outside hunks: a file header line or text between files."""
+        if not self.in_file:
+            self.output.append(line)
+        elif not self.had_hunks:
+            self.header.append(line)
+        else:
+            self.end_hunk()
+            if self.header_written:
+                self.output.append(line)
+            else:
+                self.trailer.append(line)
+
+    def start_hunk(self, line, header):
+        self.end_hunk()
+        if self.source_file is None:
+            raise unidiff.UnidiffParseError(f"Unexpected hunk found: {line!r}")
+        self.in_git_header = False
+        self.had_hunks = True
+        source_start, self.source_left, _, self.target_left, section = header
+        self.hunk = (source_start, self.source_left, section)
+        self.verbatim = DEV_NULL in (self.source_file, self.target_file)
+        if self.verbatim:
+            self.write_header()
+            self.output.append(line)
+
+    def hunk_line(self, line):
+        """Take one body line of the current hunk."""
+        marker = line[0] if line else None
+        if marker == scanner.ADDED:
+            self.target_left -= 1
+        elif marker == scanner.REMOVED:
+            self.source_left -= 1
+        elif marker == scanner.CONTEXT or marker in scanner.BARE_NEWLINE:
+            self.source_left -= 1
+            self.target_left -= 1
+        elif marker == scanner.NO_NEWLINE:
+            self.no_newline(line)
+            return
+        else:
+            raise unidiff.UnidiffParseError(f"Hunk diff line expected: {line!r}")
+        if self.source_left < 0 or self.target_left < 0:
+            raise unidiff.UnidiffParseError("Hunk is longer than expected")
+
+        if self.verbatim:
+            self.output.append(line)
+        elif marker in scanner.BARE_NEWLINE:
+            self.hunk_lines.append([scanner.CONTEXT, line, False])
+        else:
+            self.hunk_lines.append([marker, line[1:], False])
+
+    def no_newline(self, line):
+        """Mark the last hunk line as having no final newline."""
+        if self.verbatim:
+            self.output.append(line)
+        elif self.hunk_lines:
+            self.hunk_lines[-1][2] = True
+
+    def end_hunk(self):
+        """Write the current hunk rewritten, or nothing if no change is left."""
+        if self.hunk is None or self.verbatim:
+            self.hunk = None
+            return
+        source_start, source_length, section = self.hunk
+        lines = fix_hunk_lines(self.hunk_lines)
+        self.hunk = None
+        self.hunk_lines = []
+        target_length = sum(marker != scanner.REMOVED for marker, _, _ in lines)
+        if any(marker != scanner.CONTEXT for marker, _, _ in lines):
+            self.write_header()
+            self.output.append(
+                hunk_header(
+                    source_start, source_length, target_length, self.offset, section
+                )
+            )
+            self.output.extend(render_hunk(lines))
+        self.offset += target_length - source_length
+
+
+def iter_fixed_lines(lines):
+    """Yield the raw lines of a patch with its whitespace-only changes removed.
+
+    The output applies with git apply and has the same effect as the input,
+    except that blank lines added or removed and changes to trailing
+    whitespace are left out. Hunk headers are recomputed; file diffs left
+    without changes are dropped, while new and deleted files are kept as
+    they are.
+    """
+    rewriter = PatchRewriter()
+    for line in lines:
+        rewriter.feed(line)
+        if rewriter.output:
+            yield from rewriter.output
+            rewriter.output.clear()
+    rewriter.close()
+    yield from rewriter.output
+
+
+def write_fixed_patch(lines, sink, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Write the fixed patch of raw lines to a binary sink in large writes."""
+    chunk = []
+    pending = 0
+    for line in iter_fixed_lines(lines):
+        chunk.append(line)
+        pending += len(line)
+        if pending >= buffer_size:
+            sink.write(b"".join(chunk))
+            chunk = []
+            pending = 0
+    if chunk:
+        sink.write(b"".join(chunk))
+
+
+def fix_patch_file(patch_path, sink):
+    """Write the fixed patch of a patch path, or standard input for "-".
+
+    Compressed patches are decompressed as they are read.
+    """
+    with open_patch_input(patch_path) as f:
+        write_fixed_patch(f, sink)
@@ -0,0 +1,209 @@
+"""
+Batch analysis of many patch files with a bounded worker pool.
+Part of project resonantrabbit.
+"""
+
+import functools
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import unidiff
+
+from . import compressed, main, scanner
+from .parallel import START_METHOD
+from .report import EmptyLineCount
+from .writer import write_lines
+
+# File name patterns picked up when a directory is given, plain or compressed
+PATCH_PATTERNS = tuple(
+    pattern + suffix
+    for pattern in ("*.patch", "*.diff")
+    for suffix in ("", *compressed.SUFFIXES)
+)
+
+EXECUTORS = {
+    "process": functools.partial(
+        ProcessPoolExecutor, mp_context=multiprocessing.get_context(START_METHOD)
+    ),
+    "thread": ThreadPoolExecutor,
+}
+
+
+def expand_patch_paths(patterns):
+    """Yield the patch files named by directories and glob patterns.
+
+    Directories contribute their *.patch and *.diff files, also compressed
+    ones such as *.patch.gz; other arguments are expanded as (recursive) glob
+    patterns, and plain paths match themselves.
+    """
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = itertools.chain.from_iterable(
+                glob.glob(os.path.join(glob.escape(pattern), name))
+                for name in PATCH_PATTERNS
+            )
+        else:
+            paths = glob.glob(pattern, recursive=True)
+        yield from sorted(p for p in paths if os.path.isfile(p))
+
+
+def unmatched_patterns(patterns):
+    """Return the directories and glob patterns naming no patch file."""
+    return [
+        pattern
+        for pattern in patterns
+        if next(expand_patch_paths([pattern]), None) is None
+    ]
+
+
+def analyze_patch_file(patch_file_path, cache=None):
+    """Return the empty line analysis of one patch file.
+
+    Runs in a worker, so parse errors are returned in the result rather than
+    raised and one bad patch does not stop the batch. With a ResultCache the
+    full analysis is looked up, or computed and stored for other consumers;
+    otherwise the parse-free scanner is used.
+    """
+    try:
+        if cache is not None:
+            files = [
+                EmptyLineCount.from_summary(summary)
+                for summary in cache.iter_patch_file(patch_file_path)
+            ]
+        else:
+            files = list(scanner.scan_empty_lines(patch_file_path))
+    except (
+        unidiff.UnidiffParseError,
+        UnicodeDecodeError,
+        OSError,
+        *compressed.DECOMPRESSION_ERRORS,
+    ) as e:
+        return {"patch": patch_file_path, "error": str(e)}
+
+    return {
+        "patch": patch_file_path,
+        "files": [f.to_dict() for f in files],
+        "empty_added": sum(f.empty_added for f in files),
+        "empty_removed": sum(f.empty_removed for f in files),
+    }
+
+
+def _analyze_in_pool(patch_file_path, cache):
+    """Run analyze_patch_file in a worker of the pool.
+
+    Returns the result and the bytes the worker stored in the cache. Workers
+    store entries without evicting, and the parent process adds their bytes
+    to its running cache size, which workers of a process pool never share.
+    """
+    if cache is None:
+        return analyze_patch_file(patch_file_path), 0
+    worker_cache = cache.worker_copy()
+    return analyze_patch_file(patch_file_path, worker_cache), worker_cache.stored_bytes
+
+
+def iter_batch_results(
+    patch_paths, max_workers=None, executor="process", max_in_flight=None, cache=None
+):
+    """Analyze patch files in a pool and yield results in completion order.
+
+    No more than max_in_flight patches (twice the worker count by default) are
+    submitted at a time, and paths are pulled lazily, so memory stays flat no
+    matter how many patches there are.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    paths = iter(patch_paths)
+
+    with EXECUTORS[executor](max_workers=max_workers) as pool:
+        pending = {
+            pool.submit(_analyze_in_pool, path, cache)
+            for path in itertools.islice(paths, max_in_flight)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for path in itertools.islice(paths, 1):
+                    pending.add(pool.submit(_analyze_in_pool, path, cache))
+                result, stored_bytes = future.result()
+                if stored_bytes:
+                    cache.account(stored_bytes)
+                yield result
+
+
+def _batch_totals(results, totals):
+    """Yield results while adding them to the combined totals."""
+    for result in results:
+        if "error" in result:
+            totals["errors"] += 1
+        else:
+            totals["patches"] += 1
+            totals["empty_added"] += result["empty_added"]
+            totals["empty_removed"] += result["empty_removed"]
+        yield result
+
+
+def format_batch_result(result):
+    """Return the lines reporting one batch result."""
+    if "error" in result:
+        return [f"Patch {result['patch']}:", f"  Error: {result['error']}", ""]
+    return [
+        f"Patch {result['patch']}:",
+        f"  Files: {len(result['files'])}",
+        f"  Empty lines added: {result['empty_added']}",
+        f"  Empty lines removed: {result['empty_removed']}",
+        "",
+    ]
+
+
+def print_batch_report(results, out=None):
+    """Print batch results as they arrive, then the combined totals.
+
+    Returns the combined totals.
+    """
+    totals = {"patches": 0, "errors": 0, "empty_added": 0, "empty_removed": 0}
+
+    write_lines(out, ["=== Batch Empty Line Analysis ===", ""])
+    for result in _batch_totals(results, totals):
+        write_lines(out, format_batch_result(result))
+
+    write_lines(
+        out,
+        [
+            f"Patches analyzed: {totals['patches']}",
+            f"Patches failed: {totals['errors']}",
+            "",
+        ],
+    )
+    main.print_empty_line_totals(
+        totals["empty_added"], totals["empty_removed"], label="all patches", out=out
+    )
+    return totals
+
+
+def write_batch_ndjson(results, out):
+    """Write one JSON record per patch as it completes, then the totals."""
+    totals = {"patches": 0, "errors": 0, "empty_added": 0, "empty_removed": 0}
+    for result in _batch_totals(results, totals):
+        out.write(json.dumps({"type": "patch", **result}) + "\n")
+    out.write(json.dumps({"type": "totals", **totals}) + "\n")
+    return totals
+
+
+def write_batch_json(results, out):
+    """Write batch results and totals as one streamed JSON document."""
+    totals = {"patches": 0, "errors": 0, "empty_added": 0, "empty_removed": 0}
+    out.write('{"patches": [')
+    for i, result in enumerate(_batch_totals(results, totals)):
+        out.write(", " if i else "")
+        out.write(json.dumps(result))
+    out.write(f'], "totals": {json.dumps(totals)}}}\n')
+    return totals
@@ -0,0 +1,168 @@
+"""
+Columnar NumPy representation of patch lines for vectorized analytics.
+Part of project resonantrabbit.
+
+Requires the optional numpy dependency (install the "columnar" extra).
+"""
+
+import mmap
+import os
+from array import array
+
+import numpy as np
+
+from . import mapped, scanner
+from .report import EmptyLineCount
+
+# Line type codes used in the "line_type" column
+ADDED = mapped.ADDED
+REMOVED = mapped.REMOVED
+CONTEXT = mapped.CONTEXT
+NO_NEWLINE = mapped.NO_NEWLINE
+EMPTY = mapped.EMPTY
+
+# Byte span handled per step of the vectorized blank line detection
+BLANK_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Byte classes for blank detection: ASCII whitespace as str.isspace() sees it,
+# and the bytes of multi-byte UTF-8 characters, some of which are whitespace
+_ASCII_SPACE = np.zeros(256, dtype=bool)
+_ASCII_SPACE[list(b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")] = True
+_NON_ASCII = np.zeros(256, dtype=bool)
+_NON_ASCII[0x80:] = True
+_OTHER = ~(_ASCII_SPACE | _NON_ASCII)
+
+
+def _line_numbers(counted, hunk_starts, hunk_sizes):
+    """Number the counted lines of every hunk from its start line, else -1."""
+    counted = counted.astype(np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(counted)))
+    first_line = np.cumsum(hunk_sizes) - hunk_sizes
+    before_hunk = np.repeat(cumulative[first_line], hunk_sizes)
+    numbers = (
+        np.repeat(hunk_starts, hunk_sizes) + cumulative[1:] - before_hunk - counted
+    )
+    return np.where(counted == 1, numbers, -1)
+
+
+def _blank_flags(buffer, starts, ends):
+    """Return whether each line body buffer[start + 1:end] is blank."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    flags = np.zeros(len(starts), dtype=bool)
+
+    i = 0
+    while i < len(starts):
+        region_start = int(starts[i])
+        j = int(np.searchsorted(ends, region_start + BLANK_CHUNK_SIZE, "right"))
+        j = max(j, i + 1)
+        region = data[region_start : int(ends[j - 1])]
+
+        other = np.concatenate(([0], np.cumsum(_OTHER[region], dtype=np.int64)))
+        non_ascii = np.concatenate(([0], np.cumsum(_NON_ASCII[region], dtype=np.int64)))
+        body_starts = starts[i:j] + 1 - region_start
+        body_ends = ends[i:j] - region_start
+        only_space = other[body_ends] == other[body_starts]
+        plain = non_ascii[body_ends] == non_ascii[body_starts]
+        flags[i:j] = only_space & plain
+
+        # Lines holding nothing but whitespace and multi-byte characters may
+        # still be blank; they are rare enough to check one by one
+        for k in np.flatnonzero(only_space & ~plain):
+            flags[i + k] = scanner.is_blank_at(
+                buffer, int(starts[i + k]) + 1, int(ends[i + k])
+            )
+        i = j
+
+    return flags
+
+
+def build_columns(buffer):
+    """Build columnar arrays for every hunk line of a patch buffer.
+
+    Returns a dict with one entry per line in the "line_type",
+    "source_line_no", "target_line_no", "file_index", "hunk_index" and
+    "is_blank" arrays, plus the list of file "paths" indexed by file_index.
+    Line numbers that do not apply to a line are -1, and hunk_index counts
+    hunks within their file.
+    """
+    paths = []
+    line_types = bytearray()
+    starts = array("Q")
+    ends = array("Q")
+    hunk_files = array("q")
+    hunk_numbers = array("q")
+    hunk_source_starts = array("q")
+    hunk_target_starts = array("q")
+    hunk_sizes = array("q")
+
+    for file_index, mapped_file in enumerate(mapped.iter_mapped_files(buffer)):
+        paths.append(mapped_file.path)
+        for hunk_index, hunk in enumerate(mapped_file.hunks):
+            line_types += hunk.line_types
+            starts.extend(hunk.line_offsets[:-1])
+            ends.extend(hunk.line_offsets[1:])
+            hunk_files.append(file_index)
+            hunk_numbers.append(hunk_index)
+            hunk_source_starts.append(hunk.source_start)
+            hunk_target_starts.append(hunk.target_start)
+            hunk_sizes.append(len(hunk))
+
+    types = np.frombuffer(line_types, dtype=np.uint8)
+    sizes = np.frombuffer(hunk_sizes, dtype=np.int64)
+    line_starts = np.frombuffer(starts, dtype=np.uint64).astype(np.int64)
+    line_ends = np.frombuffer(ends, dtype=np.uint64).astype(np.int64)
+
+    return {
+        "paths": paths,
+        "line_type": types,
+        "source_line_no": _line_numbers(
+            (types == REMOVED) | (types == CONTEXT),
+            np.frombuffer(hunk_source_starts, dtype=np.int64),
+            sizes,
+        ),
+        "target_line_no": _line_numbers(
+            (types == ADDED) | (types == CONTEXT),
+            np.frombuffer(hunk_target_starts, dtype=np.int64),
+            sizes,
+        ),
+        "file_index": np.repeat(np.frombuffer(hunk_files, dtype=np.int64), sizes),
+        "hunk_index": np.repeat(np.frombuffer(hunk_numbers, dtype=np.int64), sizes),
+        "is_blank": _blank_flags(buffer, line_starts, line_ends),
+    }
+
+
+def load_columns(patch_file_path):
+    """Build the columnar arrays of a patch file read through a memory map."""
+    if not os.path.getsize(patch_file_path):
+        return build_columns(b"")
+
+    with (
+        open(patch_file_path, "rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        return build_columns(mm)
+
+
+def count_empty_lines(columns):
+    """Return per-file empty line counts using vectorized reductions.
+
+    Returns a list of EmptyLineCount, so the usual report can be rendered
+    from it with print_empty_line_analysis.
+    """
+    file_count = len(columns["paths"])
+    blank = columns["is_blank"]
+    line_type = columns["line_type"]
+    file_index = columns["file_index"]
+
+    empty_added = np.bincount(
+        file_index[blank & (line_type == ADDED)], minlength=file_count
+    )
+    empty_removed = np.bincount(
+        file_index[blank & (line_type == REMOVED)], minlength=file_count
+    )
+    return [
+        EmptyLineCount(path, int(added), int(removed))
+        for path, added, removed in zip(
+            columns["paths"], empty_added.tolist(), empty_removed.tolist()
+        )
+    ]
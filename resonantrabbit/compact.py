@@ -0,0 +1,316 @@
+"""
+Compact line records for analyzing whole patches held in memory.
+Part of project resonantrabbit.
+"""
+
+import functools
+import re
+from array import array
+
+from . import main, mapped, scanner
+from .report import EmptyLineCount, EmptyLineEvent, FileReport, HunkReport
+
+# Set in a stored type code when the line's value is empty or whitespace-only
+BLANK_FLAG = 0x80
+BLANK_LINE = re.compile(b"[\x80-\xff]")
+# Stored in place of a missing source or target line number
+NO_LINE = 0
+
+
+class LineStore:
+    """Every line of a patch as parallel arrays, about 21 bytes a line.
+
+    A line is its type code byte (with BLANK_FLAG), source and target line
+    numbers (NO_LINE when absent) and the offset and length of its value in
+    the patch buffer.
+    """
+
+    __slots__ = (
+        "source_line_nos",
+        "target_line_nos",
+        "types",
+        "value_lengths",
+        "value_starts",
+    )
+
+    def __init__(self):
+        self.types = bytearray()
+        self.source_line_nos = array("I")
+        self.target_line_nos = array("I")
+        self.value_starts = array("Q")
+        self.value_lengths = array("I")
+
+    def __len__(self):
+        return len(self.types)
+
+
+class CompactLine:
+    """A diff line with the fields of a unidiff Line that the analysis reads.
+
+    Records are made on demand from a LineStore and are not kept by it.
+    """
+
+    __slots__ = (
+        "diff_line_no",
+        "line_type",
+        "source_line_no",
+        "target_line_no",
+        "value",
+    )
+
+    def __init__(self, line_type, source_line_no, target_line_no, value, diff_line_no):
+        self.line_type = line_type
+        self.source_line_no = source_line_no
+        self.target_line_no = target_line_no
+        self.value = value
+        self.diff_line_no = diff_line_no
+
+    def __str__(self):
+        return f"{self.line_type}{self.value}"
+
+    def __repr__(self):
+        return f"<CompactLine: {self}>"
+
+    @property
+    def is_added(self):
+        return self.line_type == "+"
+
+    @property
+    def is_removed(self):
+        return self.line_type == "-"
+
+    @property
+    def is_context(self):
+        return self.line_type == " "
+
+
+class CompactHunk:
+    """A hunk whose lines are a range of LineStore entries.
+
+    Iterating or indexing the hunk gives CompactLine records.
+    """
+
+    __slots__ = (
+        "_next_source",
+        "_next_target",
+        "added",
+        "buffer",
+        "diff_line_no",
+        "first",
+        "lines",
+        "removed",
+        "section_header",
+        "size",
+        "source_length",
+        "source_start",
+        "start",
+        "target_length",
+        "target_start",
+    )
+
+    def __init__(
+        self,
+        buffer,
+        lines,
+        source_start,
+        source_length,
+        target_start,
+        target_length,
+        section,
+        start,
+        diff_line_no,
+    ):
+        self.buffer = buffer
+        self.lines = lines
+        self.source_start = source_start
+        self.source_length = source_length
+        self.target_start = target_start
+        self.target_length = target_length
+        self.section_header = section
+        # Byte offset and patch line number of the hunk header
+        self.start = start
+        self.diff_line_no = diff_line_no
+        # Index of the first line in the store, and the number of lines
+        self.first = len(lines)
+        self.size = 0
+        self.added = 0
+        self.removed = 0
+        self._next_source = source_start
+        self._next_target = target_start
+
+    def append_line(self, line_type, start, end):
+        """Store a line spanning buffer[start:end], numbered and blank-checked."""
+        lines = self.lines
+        source_line_no = target_line_no = NO_LINE
+        if line_type == mapped.EMPTY or self.buffer[start] in scanner.BARE_NEWLINE:
+            value_start = start
+        else:
+            value_start = start + 1
+        if line_type == mapped.ADDED:
+            self.added += 1
+            target_line_no = self._next_target
+            self._next_target += 1
+        elif line_type == mapped.REMOVED:
+            self.removed += 1
+            source_line_no = self._next_source
+            self._next_source += 1
+        elif line_type == mapped.CONTEXT:
+            source_line_no = self._next_source
+            target_line_no = self._next_target
+            self._next_source += 1
+            self._next_target += 1
+        if (source_line_no or target_line_no) and scanner.is_blank_at(
+            self.buffer, value_start, end
+        ):
+            line_type |= BLANK_FLAG
+        lines.types.append(line_type)
+        lines.source_line_nos.append(source_line_no)
+        lines.target_line_nos.append(target_line_no)
+        lines.value_starts.append(value_start)
+        lines.value_lengths.append(end - value_start)
+        self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def _line(self, i):
+        lines = self.lines
+        index = self.first + i
+        line_type = lines.types[index] & ~BLANK_FLAG
+        value_start = lines.value_starts[index]
+        value = self.buffer[value_start : value_start + lines.value_lengths[index]]
+        # Like unidiff, only diff lines proper are numbered in the patch
+        numbered = line_type in (mapped.ADDED, mapped.REMOVED, mapped.CONTEXT)
+        return CompactLine(
+            mapped.LINE_TYPES[line_type],
+            lines.source_line_nos[index] or None,
+            lines.target_line_nos[index] or None,
+            value.decode("utf-8"),
+            self.diff_line_no + 1 + i if numbered else None,
+        )
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self._line(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._line(i) for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("hunk line index out of range")
+        return self._line(index)
+
+
+class CompactPatchedFile(mapped.MappedFile):
+    """A file diff of a CompactPatchSet; iterating it gives its CompactHunks."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self.hunks)
+
+    def __len__(self):
+        return len(self.hunks)
+
+    def __getitem__(self, index):
+        return self.hunks[index]
+
+
+def summarize_compact_file(patched_file, samples=True):
+    """Summarize a CompactPatchedFile into the same FileReport as main.summarize_file.
+
+    Blank lines are found by scanning the flagged type codes, so lines that
+    are not blank are never visited one by one.
+    """
+    report = FileReport(
+        path=patched_file.path,
+        source_file=patched_file.source_file,
+        target_file=patched_file.target_file,
+        is_added_file=patched_file.is_added_file,
+        is_removed_file=patched_file.is_removed_file,
+        is_modified_file=patched_file.is_modified_file,
+    )
+
+    for hunk in patched_file.hunks:
+        hunk_report = HunkReport(
+            source_start=hunk.source_start,
+            source_length=hunk.source_length,
+            target_start=hunk.target_start,
+            target_length=hunk.target_length,
+            section_header=hunk.section_header,
+        )
+        if samples:
+            hunk_report.sample_lines = [
+                (line.line_type, line.value) for line in hunk[: main.SAMPLE_LINE_COUNT]
+            ]
+            hunk_report.has_more_lines = len(hunk) > main.SAMPLE_LINE_COUNT
+        report.added += hunk.added
+        report.removed += hunk.removed
+
+        lines = hunk.lines
+        events = hunk_report.empty_line_events
+        for match in BLANK_LINE.finditer(
+            lines.types, hunk.first, hunk.first + hunk.size
+        ):
+            index = match.start()
+            line_type = lines.types[index] & ~BLANK_FLAG
+            if line_type == mapped.ADDED:
+                report.empty_added += 1
+                events.append(EmptyLineEvent("+", None, lines.target_line_nos[index]))
+            elif line_type == mapped.REMOVED:
+                report.empty_removed += 1
+                events.append(EmptyLineEvent("-", lines.source_line_nos[index], None))
+            else:
+                events.append(
+                    EmptyLineEvent(
+                        " ", lines.source_line_nos[index], lines.target_line_nos[index]
+                    )
+                )
+        report.hunks.append(hunk_report)
+
+    return report
+
+
+def count_compact_empty_lines(patched_file):
+    """Return the EmptyLineCount of a CompactPatchedFile from its flagged types."""
+    count = EmptyLineCount(patched_file.path)
+    for hunk in patched_file.hunks:
+        types = hunk.lines.types
+        for match in BLANK_LINE.finditer(types, hunk.first, hunk.first + hunk.size):
+            line_type = types[match.start()] & ~BLANK_FLAG
+            if line_type == mapped.ADDED:
+                count.empty_added += 1
+            elif line_type == mapped.REMOVED:
+                count.empty_removed += 1
+    return count
+
+
+class CompactPatchSet(mapped.MappedPatchSet):
+    """PatchSet-like patch whose lines are entries of one LineStore.
+
+    It keeps the patch bytes, or a memory map of the file, plus a few dozen
+    bytes a line, instead of a unidiff Line object and value string for each.
+    main.analyze_patch and main.demonstrate_empty_line_detection accept it
+    and summarize its files from the stored arrays through summarize_file.
+    """
+
+    def __init__(self, buffer):
+        self.lines = LineStore()
+        super().__init__(buffer)
+
+    def _index_files(self, buffer):
+        return mapped.iter_mapped_files(
+            buffer,
+            file_class=CompactPatchedFile,
+            hunk_class=functools.partial(CompactHunk, buffer, self.lines),
+        )
+
+    def summarize_file(self, patched_file, samples=True):
+        """Return the FileReport of one of this patch set's files."""
+        return summarize_compact_file(patched_file, samples)
+
+    def count_empty_lines(self, patched_file):
+        """Return the EmptyLineCount of one of this patch set's files."""
+        return count_compact_empty_lines(patched_file)
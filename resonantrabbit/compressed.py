@@ -0,0 +1,139 @@
+"""
+Transparent decompression of patch input, detected by magic bytes.
+Part of project resonantrabbit.
+"""
+
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import sys
+import zlib
+
+try:
+    # Python 3.14 and later
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Leading bytes of each supported format; MAGIC_SIZE covers the longest
+MAGIC = (
+    ("gzip", b"\x1f\x8b"),
+    ("bz2", b"BZh"),
+    ("xz", b"\xfd7zXZ\x00"),
+    ("zstd", b"\x28\xb5\x2f\xfd"),
+)
+MAGIC_SIZE = 6
+
+# File name suffixes of compressed patches picked up in batch directories
+SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+
+class UnsupportedCompressionError(OSError):
+    """Compressed input in a format that cannot be read here."""
+
+
+class CorruptBZ2Error(OSError):
+    """Corrupt bz2 input, which bz2 itself reports as a plain OSError."""
+
+
+# Raised while reading corrupt or truncated compressed input; other OSErrors,
+# such as those of writing the report, are not decompression errors
+DECOMPRESSION_ERRORS = (
+    gzip.BadGzipFile,
+    zlib.error,
+    lzma.LZMAError,
+    EOFError,
+    CorruptBZ2Error,
+    UnsupportedCompressionError,
+) + tuple(module.ZstdError for module in (zstd, zstandard) if module is not None)
+
+
+def detect_compression(head):
+    """Return the compression format starting head, or None for plain input."""
+    for name, magic in MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _open_zstd(stream):
+    if zstd is not None:
+        return zstd.ZstdFile(stream)
+    if zstandard is not None:
+        # stream_reader only reads blocks; buffering it adds readline
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream))
+    raise UnsupportedCompressionError(
+        "zstd compressed input needs Python 3.14 or the zstandard package"
+    )
+
+
+class _BZ2Stream(io.RawIOBase):
+    """Raw reader of decompressed bz2 data raising CorruptBZ2Error."""
+
+    def __init__(self, stream):
+        self._file = bz2.BZ2File(stream)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            return self._file.readinto(buffer)
+        except OSError as e:
+            raise CorruptBZ2Error(str(e)) from e
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+DECOMPRESSORS = {
+    "gzip": lambda stream: gzip.GzipFile(fileobj=stream),
+    "bz2": lambda stream: io.BufferedReader(_BZ2Stream(stream)),
+    "xz": lzma.LZMAFile,
+    "zstd": _open_zstd,
+}
+
+
+def decompressing_reader(stream):
+    """Return a binary reader of stream's content, decompressed if needed.
+
+    Compressed data is decompressed block by block as it is read, so the
+    whole decompressed patch is never held in memory.
+    """
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+    name = detect_compression(stream.peek(MAGIC_SIZE)[:MAGIC_SIZE])
+    if name is None:
+        return stream
+    return DECOMPRESSORS[name](stream)
+
+
+@contextlib.contextmanager
+def open_patch_input(patch_path):
+    """Open a patch path, or standard input for "-", as decompressed bytes.
+
+    Iterating the reader gives raw lines split on newlines only.
+    """
+    if patch_path == "-":
+        yield decompressing_reader(sys.stdin.buffer)
+        return
+    # Decompressing readers leave the file they wrap open
+    with (
+        open(patch_path, "rb") as f,
+        contextlib.closing(decompressing_reader(f)) as reader,
+    ):
+        yield reader
+
+
+def file_compression(patch_file_path):
+    """Return the compression format of a patch file, or None."""
+    with open(patch_file_path, "rb") as f:
+        return detect_compression(f.read(MAGIC_SIZE))
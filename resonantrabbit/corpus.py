@@ -0,0 +1,303 @@
+"""
+Deterministic generator of synthetic git-format patches for benchmarks.
+Part of project resonantrabbit.
+
+Usage: python -m resonantrabbit.corpus OUTPUT [--seed N]
+       [--files N | --lines N] [options]
+"""
+
+import argparse
+import random
+import sys
+from dataclasses import dataclass
+
+DIRECTORIES = ["src", "src/core", "src/util", "lib/net", "docs", "tests", "tools"]
+EXTENSIONS = [".py", ".py", ".py", ".c", ".md", ".txt", ".json"]
+
+CODE_LINES = [
+    "import os",
+    "from collections import defaultdict",
+    "def handle(request, *args):",
+    "class Widget(Base):",
+    "    def __init__(self, name):",
+    "        self.name = name",
+    "    return result",
+    "    if not items:",
+    "        continue",
+    "        raise ValueError(message)",
+    "    for key, value in mapping.items():",
+    "        total += value * weight",
+    "    # keep the old behaviour for callers",
+    "x = compute(a, b) + offset",
+    "logger.debug('state=%s', state)",
+    "static int parse(const char *buf, size_t len)",
+    "{",
+    "}",
+    "    return -EINVAL;",
+    "## Configuration",
+    "Set `timeout` to a positive number of seconds.",
+    '  "enabled": true,',
+    '  "retries": 3',
+    "-- not a removed line",
+    "++ not an added line",
+]
+# Blank lines include whitespace-only ones, which count as empty lines too
+BLANK_LINES = ["", "", "", "    ", "\t", " "]
+NON_ASCII_LINES = [
+    "# Größe der Datei prüfen",
+    'message = "café déjà vu"',
+    "# 日本語のコメント",
+    'print("Привет, мир")',
+    'label = "naïve – résumé"',
+    "# emoji 🚀 launch",
+    "Ελληνικά κείμενο",
+]
+SECTION_HEADERS = ["", "def handle(request, *args):", "class Widget(Base):", "main()"]
+NO_NEWLINE = "\\ No newline at end of file"
+
+
+@dataclass(slots=True)
+class CorpusSpec:
+    """Shape of a generated patch.
+
+    Ranges are inclusive (low, high) bounds drawn uniformly. With target_lines
+    set, whole file diffs are generated until at least that many lines were
+    written and files is ignored.
+    """
+
+    files: int = 100
+    target_lines: int | None = None
+    hunks_per_file: tuple[int, int] = (1, 6)
+    changes_per_hunk: tuple[int, int] = (1, 12)
+    context_lines: int = 3
+    blank_ratio: float = 0.15
+    non_ascii_ratio: float = 0.05
+    added_file_ratio: float = 0.05
+    removed_file_ratio: float = 0.03
+    renamed_file_ratio: float = 0.05
+    no_newline_ratio: float = 0.02
+
+
+DEFAULT_SPEC = CorpusSpec()
+
+
+def _content(rng, spec):
+    """Pick the text of one source line."""
+    r = rng.random()
+    if r < spec.blank_ratio:
+        return rng.choice(BLANK_LINES)
+    if r < spec.blank_ratio + spec.non_ascii_ratio:
+        return rng.choice(NON_ASCII_LINES)
+    return rng.choice(CODE_LINES)
+
+
+def _blob_id(rng):
+    return f"{rng.getrandbits(28):07x}"
+
+
+def _file_kind(rng, spec):
+    r = rng.random()
+    for kind, ratio in (
+        ("added", spec.added_file_ratio),
+        ("removed", spec.removed_file_ratio),
+        ("renamed", spec.renamed_file_ratio),
+    ):
+        if r < ratio:
+            return kind
+        r -= ratio
+    return "modified"
+
+
+def _whole_file_hunk(rng, spec, line_type):
+    """Lines of the single hunk of an added or removed file."""
+    count = sum(rng.randint(*spec.changes_per_hunk) for _ in range(3))
+    body = [line_type + _content(rng, spec) for _ in range(count)]
+    if line_type == "+":
+        header = f"@@ -0,0 +1,{count} @@"
+    else:
+        header = f"@@ -1,{count} +0,0 @@"
+    return [header, *body]
+
+
+def _modified_hunks(rng, spec):
+    """Lines of the hunks of a modified or renamed file."""
+    lines = []
+    source_start = rng.randint(1, 40)
+    delta = 0
+    for _ in range(rng.randint(*spec.hunks_per_file)):
+        body = [" " + _content(rng, spec) for _ in range(spec.context_lines)]
+        added = removed = 0
+        for block in range(rng.randint(1, 3)):
+            if block:
+                body.extend(" " + _content(rng, spec) for _ in range(rng.randint(1, 4)))
+            changes = rng.randint(*spec.changes_per_hunk)
+            block_removed = rng.randint(0, changes)
+            body.extend("-" + _content(rng, spec) for _ in range(block_removed))
+            body.extend(
+                "+" + _content(rng, spec) for _ in range(changes - block_removed)
+            )
+            added += changes - block_removed
+            removed += block_removed
+        body.extend(" " + _content(rng, spec) for _ in range(spec.context_lines))
+
+        context = len(body) - added - removed
+        source_length = context + removed
+        target_length = context + added
+        lines.append(
+            f"@@ -{source_start},{source_length} "
+            f"+{source_start + delta},{target_length} @@"
+            + (f" {section}" if (section := rng.choice(SECTION_HEADERS)) else "")
+        )
+        lines.extend(body)
+        delta += added - removed
+        source_start += source_length + rng.randint(1, 60)
+    return lines
+
+
+def file_diff_lines(rng, spec, index):
+    """Return the lines, without newlines, of the index-th file diff."""
+    kind = _file_kind(rng, spec)
+    path = f"{rng.choice(DIRECTORIES)}/module_{index}{rng.choice(EXTENSIONS)}"
+    new_path = path
+    if kind == "renamed":
+        stem, _, extension = path.rpartition(".")
+        new_path = f"{stem}_renamed.{extension}"
+
+    lines = [f"diff --git a/{path} b/{new_path}"]
+    if kind == "added":
+        lines += ["new file mode 100644", f"index 0000000..{_blob_id(rng)}"]
+        lines += ["--- /dev/null", f"+++ b/{path}"]
+        lines += _whole_file_hunk(rng, spec, "+")
+    elif kind == "removed":
+        lines += ["deleted file mode 100644", f"index {_blob_id(rng)}..0000000"]
+        lines += [f"--- a/{path}", "+++ /dev/null"]
+        lines += _whole_file_hunk(rng, spec, "-")
+    else:
+        if kind == "renamed":
+            lines += [
+                f"similarity index {rng.randint(50, 99)}%",
+                f"rename from {path}",
+                f"rename to {new_path}",
+            ]
+        lines += [f"index {_blob_id(rng)}..{_blob_id(rng)} 100644"]
+        lines += [f"--- a/{path}", f"+++ b/{new_path}"]
+        lines += _modified_hunks(rng, spec)
+
+    if rng.random() < spec.no_newline_ratio:
+        lines.append(NO_NEWLINE)
+    return lines
+
+
+def iter_file_diffs(spec=None, seed=0):
+    """Yield each file diff of a generated patch as a list of text lines.
+
+    The same spec and seed always give the same patch. File diffs are made
+    one at a time, so corpora of tens of millions of lines can be streamed
+    to disk without holding them in memory.
+    """
+    spec = spec or DEFAULT_SPEC
+    rng = random.Random(seed)
+    written = 0
+    index = 0
+    while (
+        written < spec.target_lines
+        if spec.target_lines is not None
+        else index < spec.files
+    ):
+        lines = file_diff_lines(rng, spec, index)
+        written += len(lines)
+        index += 1
+        yield lines
+
+
+def iter_corpus_lines(spec=None, seed=0):
+    """Yield the byte lines of a generated patch."""
+    for lines in iter_file_diffs(spec, seed):
+        for line in lines:
+            yield line.encode("utf-8") + b"\n"
+
+
+def generate_corpus(spec=None, seed=0):
+    """Return a generated patch as one bytes object."""
+    return b"".join(iter_corpus_lines(spec, seed))
+
+
+def write_corpus(path, spec=None, seed=0):
+    """Write a generated patch to path, or stdout for "-", and return its line count."""
+    count = 0
+    f = sys.stdout.buffer if path == "-" else open(path, "wb")  # noqa: SIM115 - closed below
+    try:
+        for lines in iter_file_diffs(spec, seed):
+            lines.append("")
+            f.write("\n".join(lines).encode("utf-8"))
+            count += len(lines) - 1
+        f.flush()
+    finally:
+        if f is not sys.stdout.buffer:
+            f.close()
+    return count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Write a deterministic synthetic git-format patch."
+    )
+    parser.add_argument("output", help="patch file to write, or - for stdout")
+    parser.add_argument("--seed", type=int, default=0)
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--files", type=int, default=DEFAULT_SPEC.files)
+    size.add_argument(
+        "--lines", type=int, help="write file diffs until at least N lines"
+    )
+    parser.add_argument(
+        "--hunks",
+        type=int,
+        nargs=2,
+        metavar=("MIN", "MAX"),
+        default=DEFAULT_SPEC.hunks_per_file,
+    )
+    parser.add_argument(
+        "--changes",
+        type=int,
+        nargs=2,
+        metavar=("MIN", "MAX"),
+        default=DEFAULT_SPEC.changes_per_hunk,
+    )
+    parser.add_argument("--context", type=int, default=DEFAULT_SPEC.context_lines)
+    parser.add_argument("--blank-ratio", type=float, default=DEFAULT_SPEC.blank_ratio)
+    parser.add_argument(
+        "--non-ascii-ratio", type=float, default=DEFAULT_SPEC.non_ascii_ratio
+    )
+    parser.add_argument(
+        "--added-ratio", type=float, default=DEFAULT_SPEC.added_file_ratio
+    )
+    parser.add_argument(
+        "--removed-ratio", type=float, default=DEFAULT_SPEC.removed_file_ratio
+    )
+    parser.add_argument(
+        "--renamed-ratio", type=float, default=DEFAULT_SPEC.renamed_file_ratio
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    spec = CorpusSpec(
+        files=args.files,
+        target_lines=args.lines,
+        hunks_per_file=tuple(args.hunks),
+        changes_per_hunk=tuple(args.changes),
+        context_lines=args.context,
+        blank_ratio=args.blank_ratio,
+        non_ascii_ratio=args.non_ascii_ratio,
+        added_file_ratio=args.added_ratio,
+        removed_file_ratio=args.removed_ratio,
+        renamed_file_ratio=args.renamed_ratio,
+    )
+    count = write_corpus(args.output, spec, args.seed)
+    print(f"Wrote {count} lines to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Analysis daemon keeping a warm process on a Unix domain socket.
+Part of project resonantrabbit.
+"""
+
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import os
+import signal
+import socket
+import stat
+
+import unidiff
+
+from . import main
+from .compressed import DECOMPRESSION_ERRORS, decompressing_reader
+from .daemon_client import encode_message
+from .report import PatchReport
+from .writer import write_lines
+
+
+def analyze_request(message, data):
+    """Return the response to one analysis request.
+
+    The patch is data when the request carried any, otherwise the file at
+    message["path"]. Errors are returned in the response so that one bad
+    patch does not end the connection.
+    """
+    name = message.get("name", "-")
+    if data is None and "path" not in message:
+        return {"patch": name, "error": "Request has neither patch data nor a path"}
+    try:
+        if data is not None:
+            files = main.iter_patch_files(decompressing_reader(io.BytesIO(data)))
+        else:
+            files = main.stream_patch_from_file(message["path"])
+        report = PatchReport(files=[main.summarize_file(f) for f in files])
+    except (
+        unidiff.UnidiffParseError,
+        UnicodeDecodeError,
+        OSError,
+        *DECOMPRESSION_ERRORS,
+    ) as e:
+        return {"patch": name, "error": str(e)}
+
+    response = {"patch": name, **report.to_dict()}
+    if message.get("format") == "text":
+        out = io.StringIO()
+        main.print_patch_report(report.files, out)
+        response["output"] = out.getvalue()
+    return response
+
+
+async def handle_connection(reader, writer, stop):
+    """Answer the requests of one client connection until it closes.
+
+    Analyses run in worker threads, so a large patch does not hold up the
+    requests of other connections.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                # Raises ValueError for a line over the reader's size limit
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if not isinstance(message, dict):
+                    raise TypeError("a request must be a JSON object")
+                data = None
+                if "length" in message:
+                    data = await reader.readexactly(message["length"])
+            except (ValueError, TypeError) as e:
+                writer.write(encode_message({"error": f"Bad request: {e}"}))
+                break
+
+            command = message.get("command", "analyze")
+            if command == "analyze":
+                response = await loop.run_in_executor(
+                    None, analyze_request, message, data
+                )
+            elif command == "ping":
+                response = {"pid": os.getpid()}
+            elif command == "shutdown":
+                response = {"pid": os.getpid()}
+                stop.set()
+            else:
+                response = {"error": f"Unknown command: {command}"}
+            writer.write(encode_message(response))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def remove_stale_socket(socket_path):
+    """Remove a socket left behind by a daemon that is no longer running.
+
+    Raises OSError when another daemon is still listening on socket_path or
+    the path is not a socket.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"Not a socket: {socket_path}")
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+            return
+    raise OSError(f"A daemon is already listening on {socket_path}")
+
+
+def bind_socket(socket_path):
+    """Return a Unix socket bound to socket_path that only its owner can use.
+
+    The daemon reads any path it is sent, so the socket is created with mode
+    0600 whatever the umask of the caller.
+    """
+    sock = socket.socket(socket.AF_UNIX)
+    umask = os.umask(0o177)
+    try:
+        sock.bind(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    finally:
+        os.umask(umask)
+    return sock
+
+
+async def serve(socket_path, ready=None):
+    """Serve analysis requests on socket_path until shut down.
+
+    A shutdown request, SIGINT or SIGTERM stops the daemon and removes the
+    socket. ready, if given, is called once the socket accepts connections.
+    """
+    remove_stale_socket(socket_path)
+    stop = asyncio.Event()
+    server = await asyncio.start_unix_server(
+        functools.partial(handle_connection, stop=stop), sock=bind_socket(socket_path)
+    )
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        async with server:
+            if ready is not None:
+                ready()
+            await stop.wait()
+    finally:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signum)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+
+
+def run_daemon(socket_path, out=None):
+    """Run the daemon in the foreground until it is shut down."""
+    asyncio.run(
+        serve(
+            socket_path,
+            ready=lambda: write_lines(
+                out, [f"Listening on {socket_path} (pid {os.getpid()})"]
+            ),
+        )
+    )
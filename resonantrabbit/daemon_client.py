@@ -0,0 +1,211 @@
+"""
+Thin client of the analysis daemon, and the daemon's wire format.
+Part of project resonantrabbit.
+
+Only light standard library modules are imported, so a client call costs
+little more than a bare interpreter start instead of loading unidiff.
+
+Usage: python -m resonantrabbit.daemon_client --socket PATH
+       [--format FORMAT] [PATCH ...]
+"""
+
+import argparse
+import collections
+import json
+import os
+import socket
+import sys
+
+# Every message is one JSON line; a request with a "length" is followed by
+# that many bytes of patch data
+ENCODING = "utf-8"
+
+TITLE = "=== Git Patch Parsing with Unidiff ==="
+
+# Connections analyze_all keeps open to the daemon at once
+MAX_CONNECTIONS = 16
+
+
+def encode_message(message, data=None):
+    """Return the bytes of a message, followed by data when given."""
+    if data is not None:
+        message = {**message, "length": len(data)}
+    line = json.dumps(message).encode(ENCODING) + b"\n"
+    return line if data is None else line + data
+
+
+def analysis_request(patch_path, output_format="json"):
+    """Return the message and data asking for the analysis of a patch path.
+
+    Paths are sent, not their content, so the daemon must be able to read
+    them; standard input ("-") is sent as patch data.
+    """
+    message = {"name": patch_path, "format": output_format}
+    if patch_path == "-":
+        return message, sys.stdin.buffer.read()
+    message["path"] = os.path.abspath(patch_path)
+    return message, None
+
+
+class DaemonClient:
+    """Connection to a running daemon.
+
+    Requests on one connection are answered in order; keeping the connection
+    open for repeated calls saves connecting each time.
+    """
+
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX)
+        try:
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+        self._responses = self.sock.makefile("rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._responses.close()
+        self.sock.close()
+
+    def send(self, message, data=None):
+        """Send a request without waiting for its response."""
+        self.sock.sendall(encode_message(message, data))
+
+    def receive(self):
+        """Return the next response."""
+        line = self._responses.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection without a response")
+        return json.loads(line)
+
+    def request(self, message, data=None):
+        """Send a request and return its response."""
+        self.send(message, data)
+        return self.receive()
+
+    def analyze(self, patch_path, output_format="json"):
+        """Return the analysis of a patch path, or standard input for "-"."""
+        return self.request(*analysis_request(patch_path, output_format))
+
+    def analyze_bytes(self, data, name="-", output_format="json"):
+        """Return the analysis of patch bytes, which may be compressed."""
+        return self.request({"name": name, "format": output_format}, data)
+
+
+def analyze_all(
+    socket_path, patch_paths, output_format="json", max_connections=MAX_CONNECTIONS
+):
+    """Analyze several patches concurrently, one connection each.
+
+    Up to max_connections requests are sent before the oldest response is
+    read, so the daemon works on that many patches at once without a large
+    batch opening a connection for every patch. Responses are returned in
+    the order of patch_paths.
+    """
+    responses = []
+    clients = collections.deque()
+    try:
+        for patch_path in patch_paths:
+            if len(clients) >= max_connections:
+                with clients.popleft() as client:
+                    responses.append(client.receive())
+            clients.append(DaemonClient(socket_path))
+            clients[-1].send(*analysis_request(patch_path, output_format))
+        while clients:
+            with clients.popleft() as client:
+                responses.append(client.receive())
+        return responses
+    finally:
+        for client in clients:
+            client.close()
+
+
+def write_responses(responses, output_format, out):
+    """Write analyses in the layout of the local report of that format.
+
+    Returns the number of patches the daemon could not analyze.
+    """
+    errors = 0
+    reports = []
+    for response in responses:
+        if "error" in response:
+            errors += 1
+            print(
+                f"Could not analyze {response['patch']}: {response['error']}",
+                file=sys.stderr,
+            )
+        else:
+            reports.append(response)
+
+    if output_format == "json":
+        out.write(json.dumps({"patches": reports}) + "\n")
+    elif output_format == "ndjson":
+        for report in reports:
+            for file_report in report["files"]:
+                record = {"type": "file", "patch": report["patch"], **file_report}
+                out.write(json.dumps(record) + "\n")
+            totals = {
+                "type": "totals",
+                "patch": report["patch"],
+                "files": len(report["files"]),
+                "empty_added": report["total_empty_added"],
+                "empty_removed": report["total_empty_removed"],
+            }
+            out.write(json.dumps(totals) + "\n")
+    else:
+        out.write(f"{TITLE}\n\n")
+        for report in reports:
+            if len(responses) > 1:
+                out.write(f"=== Patch: {report['patch']} ===\n\n")
+            out.write(report["output"])
+    return errors
+
+
+def main(argv=None):
+    """Client entry point; returns the process exit status."""
+    parser = argparse.ArgumentParser(
+        prog="resonantrabbit-client",
+        description="Analyze patches with a running resonantrabbit --daemon.",
+    )
+    parser.add_argument(
+        "patches",
+        nargs="*",
+        default=["-"],
+        metavar="PATCH",
+        help='patch files to analyze; "-" reads standard input (the default)',
+    )
+    parser.add_argument(
+        "--socket", required=True, help="Unix socket the daemon listens on"
+    )
+    parser.add_argument(
+        "--format",
+        choices=("text", "json", "ndjson"),
+        default="text",
+        help="output format (default: text)",
+    )
+    parser.add_argument(
+        "--shutdown", action="store_true", help="stop the daemon and exit"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        if args.shutdown:
+            with DaemonClient(args.socket) as client:
+                client.request({"command": "shutdown"})
+            return 0
+        responses = analyze_all(args.socket, args.patches, args.format)
+    except (OSError, ValueError) as e:
+        print(f"Could not reach daemon at {args.socket}: {e}", file=sys.stderr)
+        return 1
+    errors = write_responses(responses, args.format, sys.stdout)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
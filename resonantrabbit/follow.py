@@ -0,0 +1,150 @@
+"""
+Incremental analysis of a patch file that keeps growing.
+Part of project resonantrabbit.
+"""
+
+import io
+import json
+import os
+import time
+
+from . import main, scanner
+from .writer import write_lines
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Bytes read from the patch file at a time, so that a large spool is scanned
+# chunk by chunk instead of being read whole by the first poll
+READ_SIZE = 1024 * 1024
+
+# A file diff is known to be complete once the next one has started
+NEXT_FILE_HEADER = b"\n" + scanner.DIFF_GIT_HEADER
+
+
+class PatchFollower:
+    """Analyze the file diffs appended to a patch file since the last poll.
+
+    The follower keeps the offset of the first file diff that may still be
+    growing, the bytes read after it and the running empty line totals, so
+    every poll reads only appended bytes and scans only completed file diffs.
+    A file diff is complete once the next "diff --git" header has been
+    written; the last one is only scanned by finish().
+    """
+
+    def __init__(self, patch_file_path):
+        self.patch_file_path = patch_file_path
+        self.reset()
+
+    def reset(self):
+        """Forget everything read so far and start again from the beginning."""
+        # Offset in the patch file of the first byte not yet analyzed
+        self.offset = 0
+        self.totals = {"files": 0, "empty_added": 0, "empty_removed": 0}
+        self._pending = bytearray()
+        self._scan_from = 0
+
+    def _read_appended(self, f):
+        """Add up to READ_SIZE appended bytes of f to the pending bytes.
+
+        Returns False once the end of the file has been reached.
+        """
+        read_offset = self.offset + len(self._pending)
+        if os.fstat(f.fileno()).st_size < read_offset:
+            # The file was truncated or replaced: start over
+            self.reset()
+            read_offset = 0
+        f.seek(read_offset)
+        data = f.read(READ_SIZE)
+        self._pending += data
+        return len(data) == READ_SIZE
+
+    def _scan(self, data):
+        """Return the empty line counts of complete file diffs in data."""
+        return list(scanner.iter_empty_line_counts(io.BytesIO(data)))
+
+    def _consume(self, size, counts):
+        """Drop the first size pending bytes, scanned into counts.
+
+        Called only once the scan is over, so an interrupted scan leaves the
+        bytes pending and the totals untouched.
+        """
+        del self._pending[:size]
+        # A header may still be cut in half at the end of the pending bytes
+        self._scan_from = max(0, len(self._pending) - len(NEXT_FILE_HEADER))
+        self.offset += size
+        for file_counts in counts:
+            self.totals["files"] += 1
+            self.totals["empty_added"] += file_counts.empty_added
+            self.totals["empty_removed"] += file_counts.empty_removed
+
+    def poll(self):
+        """Return the EmptyLineCounts of file diffs completed since the last poll.
+
+        Appended bytes are read and scanned READ_SIZE at a time, so only the
+        last file diff and one chunk are held in memory.
+        """
+        counts = []
+        with open(self.patch_file_path, "rb") as f:
+            more = True
+            while more:
+                more = self._read_appended(f)
+                cut = self._pending.rfind(NEXT_FILE_HEADER, self._scan_from)
+                size = 0 if cut == -1 else cut + 1
+                chunk_counts = self._scan(self._pending[:size])
+                self._consume(size, chunk_counts)
+                counts.extend(chunk_counts)
+        return counts
+
+    def finish(self):
+        """Return the EmptyLineCounts of everything left, once writing is over."""
+        counts = self.poll()
+        last_counts = self._scan(self._pending)
+        self._consume(len(self._pending), last_counts)
+        return counts + last_counts
+
+
+def _print_counts(follower, counts, out):
+    """Print new file counts and the running totals as text."""
+    for file_counts in counts:
+        if file_counts.empty_added > 0 or file_counts.empty_removed > 0:
+            write_lines(out, main.format_empty_line_counts(file_counts))
+    main.print_empty_line_totals(
+        follower.totals["empty_added"],
+        follower.totals["empty_removed"],
+        label=f"{follower.totals['files']} files",
+        out=out,
+    )
+
+
+def _write_ndjson_counts(follower, counts, out):
+    """Write new file records and a running totals record as NDJSON."""
+    patch = follower.patch_file_path
+    for file_counts in counts:
+        out.write(
+            json.dumps({"type": "file", "patch": patch, **file_counts.to_dict()}) + "\n"
+        )
+    out.write(json.dumps({"type": "totals", "patch": patch, **follower.totals}) + "\n")
+
+
+def follow_patch(
+    patch_file_path, out, output_format="text", poll_interval=DEFAULT_POLL_INTERVAL
+):
+    """Report file diffs appended to a patch file until interrupted.
+
+    New file diffs are reported after every poll that completes at least one,
+    followed by the running totals. On KeyboardInterrupt the last file diff is
+    analyzed and the final totals are reported. Returns the final totals.
+    """
+    report = _write_ndjson_counts if output_format == "ndjson" else _print_counts
+    follower = PatchFollower(patch_file_path)
+    try:
+        while True:
+            counts = follower.poll()
+            if counts:
+                report(follower, counts, out)
+                out.flush()
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        report(follower, follower.finish(), out)
+        out.flush()
+    return follower.totals
@@ -0,0 +1,179 @@
+"""
+Empty line analysis of git history, streamed from git log -p.
+Part of project resonantrabbit.
+"""
+
+import json
+import subprocess
+
+import unidiff
+
+from . import main, scanner
+from .writer import write_lines
+
+# Marks the start of every commit in the git log output; no diff line can
+# start with a NUL byte
+COMMIT_SENTINEL = b"\x00resonantrabbit commit "
+GIT_LOG_FORMAT = "--format=%x00resonantrabbit commit %H"
+
+
+def git_log_command(repository, revision_range):
+    """Return the git log command streaming the patches of a commit range.
+
+    The a/ and b/ prefixes are pinned, as diff.noprefix or diff.mnemonicPrefix
+    would otherwise change the file names that are stripped.
+    """
+    return [
+        "git",
+        "-C",
+        repository,
+        "log",
+        "-p",
+        "--no-color",
+        "--no-ext-diff",
+        "--no-textconv",
+        "--src-prefix=a/",
+        "--dst-prefix=b/",
+        GIT_LOG_FORMAT,
+        revision_range,
+        "--",
+    ]
+
+
+def iter_commit_patches(lines):
+    """Split git log output into (commit SHA, patch lines) pairs.
+
+    Only the lines of one commit are held at a time.
+    """
+    commit = None
+    patch_lines = []
+    for line in lines:
+        if line.startswith(COMMIT_SENTINEL):
+            if commit is not None:
+                yield commit, patch_lines
+            commit = line[len(COMMIT_SENTINEL) :].strip().decode("ascii")
+            patch_lines = []
+        elif commit is not None:
+            patch_lines.append(line)
+
+    if commit is not None:
+        yield commit, patch_lines
+
+
+def analyze_commit(commit, patch_lines):
+    """Return the empty line analysis of one commit's patch.
+
+    Like batch results, parse errors are returned in the result so one odd
+    commit does not stop the audit of a whole history.
+    """
+    try:
+        files = list(scanner.iter_empty_line_counts(patch_lines))
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        return {"commit": commit, "error": str(e)}
+
+    return {
+        "commit": commit,
+        "files": [f.to_dict() for f in files],
+        "empty_added": sum(f.empty_added for f in files),
+        "empty_removed": sum(f.empty_removed for f in files),
+    }
+
+
+def iter_history_results(repository=".", revision_range="HEAD"):
+    """Run git log -p over a commit range and yield one result per commit.
+
+    Commits are analyzed as the log streams in, newest first, without
+    temporary files. Raises CalledProcessError if git log fails.
+    """
+    command = git_log_command(repository, revision_range)
+    with subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    ) as process:
+        try:
+            for commit, patch_lines in iter_commit_patches(process.stdout):
+                yield analyze_commit(commit, patch_lines)
+        except BaseException:
+            # Includes the consumer closing the generator early
+            process.kill()
+            raise
+        stderr = process.stderr.read()
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr=stderr.decode("utf-8", "replace")
+        )
+
+
+def analyze_history(repository=".", revision_range="HEAD"):
+    """Return the results of every commit in a range, keyed by commit SHA."""
+    return {
+        result["commit"]: result
+        for result in iter_history_results(repository, revision_range)
+    }
+
+
+def _history_totals(results, totals):
+    """Yield results while adding them to the combined totals."""
+    for result in results:
+        if "error" in result:
+            totals["errors"] += 1
+        else:
+            totals["commits"] += 1
+            totals["empty_added"] += result["empty_added"]
+            totals["empty_removed"] += result["empty_removed"]
+        yield result
+
+
+def _new_totals():
+    """Return empty combined totals of a history report."""
+    return {"commits": 0, "errors": 0, "empty_added": 0, "empty_removed": 0}
+
+
+def print_history_report(results, out=None):
+    """Print commit results as they arrive, then the combined totals."""
+    totals = _new_totals()
+
+    write_lines(out, ["=== Commit Empty Line Analysis ===", ""])
+    for result in _history_totals(results, totals):
+        if "error" in result:
+            lines = [f"  Error: {result['error']}"]
+        else:
+            lines = [
+                f"  Files: {len(result['files'])}",
+                f"  Empty lines added: {result['empty_added']}",
+                f"  Empty lines removed: {result['empty_removed']}",
+            ]
+        write_lines(out, [f"Commit {result['commit']}:", *lines, ""])
+
+    write_lines(
+        out,
+        [
+            f"Commits analyzed: {totals['commits']}",
+            f"Commits failed: {totals['errors']}",
+            "",
+        ],
+    )
+    main.print_empty_line_totals(
+        totals["empty_added"], totals["empty_removed"], label="all commits", out=out
+    )
+    return totals
+
+
+def write_history_ndjson(results, out):
+    """Write one JSON record per commit as it is analyzed, then the totals."""
+    totals = _new_totals()
+    for result in _history_totals(results, totals):
+        out.write(json.dumps({"type": "commit", **result}) + "\n")
+    out.write(json.dumps({"type": "totals", **totals}) + "\n")
+    return totals
+
+
+def write_history_json(results, out):
+    """Write commit results keyed by SHA, and the totals, as one JSON document."""
+    totals = _new_totals()
+    out.write('{"commits": {')
+    for i, result in enumerate(_history_totals(results, totals)):
+        out.write(", " if i else "")
+        out.write(f"{json.dumps(result['commit'])}: {json.dumps(result)}")
+    out.write(f'}}, "totals": {json.dumps(totals)}}}\n')
+    return totals
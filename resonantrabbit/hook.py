@@ -0,0 +1,202 @@
+"""
+Pre-commit hook checking the empty lines of the staged diff.
+Part of project resonantrabbit.
+
+Usage: python -m resonantrabbit.hook [--max-empty-added N]
+       [--max-whitespace-only-added N] [--max-empty-removed N] [--repo DIR]
+"""
+
+import argparse
+import subprocess
+import sys
+
+import unidiff
+
+from . import scanner
+
+# Kinds of lines the hook counts and how its report names them; empty lines
+# are blank like in the analysis report, whitespace-only ones are the blank
+# lines holding more than a line ending
+CHECKS = {
+    "empty_added": "added empty lines",
+    "whitespace_only_added": "added whitespace-only lines",
+    "empty_removed": "removed empty lines",
+}
+
+# A whitespace-only line added to a file is refused unless configured
+DEFAULT_LIMITS = {"whitespace_only_added": 0}
+
+LINE_ENDINGS = (b"", b"\n", b"\r\n")
+
+
+def collect_staged_lines(lines):
+    """Return the locations of the counted lines in raw git diff lines.
+
+    The result maps every kind in CHECKS to (path, line number) pairs, target
+    line numbers for added lines and source line numbers for removed ones.
+    Lines are classified by scanner.classify_lines without parsing the diff.
+    """
+    found = {kind: [] for kind in CHECKS}
+    path = None
+    source_line_no = target_line_no = 0
+
+    for kind, line, value in scanner.classify_lines(lines):
+        if kind == scanner.ADDED:
+            body = line[1:]
+            if scanner.is_blank(body):
+                location = (path, target_line_no)
+                found["empty_added"].append(location)
+                if body not in LINE_ENDINGS:
+                    found["whitespace_only_added"].append(location)
+            target_line_no += 1
+        elif kind == scanner.REMOVED:
+            if scanner.is_blank(line[1:]):
+                found["empty_removed"].append((path, source_line_no))
+            source_line_no += 1
+        elif kind == scanner.CONTEXT:
+            source_line_no += 1
+            target_line_no += 1
+        elif kind == scanner.HUNK:
+            path, (source_line_no, _, target_line_no, _, _) = value
+    return found
+
+
+def git_diff_command(repository):
+    """Return the git diff command streaming the staged changes.
+
+    Context lines are left out, since no check looks at them. The a/ and b/
+    prefixes are pinned, as diff.noprefix or diff.mnemonicPrefix would
+    otherwise change the file names that are stripped.
+    """
+    return [
+        "git",
+        "-C",
+        repository,
+        "diff",
+        "--cached",
+        "-U0",
+        "--no-color",
+        "--no-ext-diff",
+        "--no-textconv",
+        "--src-prefix=a/",
+        "--dst-prefix=b/",
+    ]
+
+
+def staged_lines(repository="."):
+    """Stream the staged diff of a repository into collect_staged_lines.
+
+    Raises CalledProcessError if git diff fails.
+    """
+    command = git_diff_command(repository)
+    with subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    ) as process:
+        try:
+            found = collect_staged_lines(process.stdout)
+        except BaseException:
+            process.kill()
+            raise
+        stderr = process.stderr.read()
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr=stderr.decode("utf-8", "replace")
+        )
+    return found
+
+
+def find_violations(found, limits):
+    """Yield (kind, limit, locations) for every check over its limit.
+
+    limits maps kinds to the most lines allowed; kinds without a limit, or
+    with a limit of None, are not checked.
+    """
+    for kind in CHECKS:
+        limit = limits.get(kind)
+        if limit is not None and len(found[kind]) > limit:
+            yield kind, limit, found[kind]
+
+
+def format_violation(kind, limit, locations):
+    """Return the report lines of one check over its limit."""
+    count = len(locations)
+    return [
+        f"Staged changes have {count} {CHECKS[kind]} (at most {limit} allowed):",
+        *(f"  {path}:{line_no}" for path, line_no in locations),
+    ]
+
+
+def run_hook(repository=".", limits=None, out=None):
+    """Check the staged changes of a repository; returns the exit status.
+
+    Nothing is printed when every check passes.
+    """
+    out = sys.stderr if out is None else out
+    limits = DEFAULT_LIMITS if limits is None else limits
+    try:
+        found = staged_lines(repository)
+    except subprocess.CalledProcessError as e:
+        out.write(f"git diff --cached failed: {e.stderr.strip()}\n")
+        return 1
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        out.write(f"Could not parse staged diff: {e}\n")
+        return 1
+    except OSError as e:
+        out.write(f"Could not run git: {e}\n")
+        return 1
+
+    violations = list(find_violations(found, limits))
+    for violation in violations:
+        out.write("\n".join(format_violation(*violation)) + "\n")
+    if violations:
+        out.write("Fix the lines above, or commit with --no-verify to skip.\n")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    """Hook entry point; returns the process exit status."""
+    parser = argparse.ArgumentParser(
+        prog="resonantrabbit-hook",
+        description="Refuse a commit whose staged changes exceed empty line limits.",
+    )
+    parser.add_argument(
+        "--max-empty-added",
+        type=int,
+        metavar="N",
+        help="most empty or whitespace-only lines added (default: no limit)",
+    )
+    parser.add_argument(
+        "--max-whitespace-only-added",
+        type=int,
+        default=DEFAULT_LIMITS["whitespace_only_added"],
+        metavar="N",
+        help="most added lines holding only whitespace (default: 0)",
+    )
+    parser.add_argument(
+        "--max-empty-removed",
+        type=int,
+        metavar="N",
+        help="most empty or whitespace-only lines removed (default: no limit)",
+    )
+    parser.add_argument(
+        "--repo",
+        default=".",
+        metavar="DIR",
+        help="repository to check (default: current directory)",
+    )
+    args = parser.parse_args(argv)
+
+    return run_hook(
+        args.repo,
+        {
+            "empty_added": args.max_empty_added,
+            "whitespace_only_added": args.max_whitespace_only_added,
+            "empty_removed": args.max_empty_removed,
+        },
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
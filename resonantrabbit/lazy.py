@@ -0,0 +1,117 @@
+"""
+Lazy PatchSet whose hunks are parsed into Line objects only when iterated.
+Part of project resonantrabbit.
+"""
+
+import functools
+import io
+
+import unidiff
+
+from . import mapped
+
+# Stand-in file header put in front of a hunk so unidiff can parse it alone
+HUNK_FILE_HEADER = b"--- a\n+++ b\n"
+HUNK_FILE_HEADER_LINES = 2
+
+
+class LazyHunk:
+    """Index entry of a hunk: its header fields, line counts and byte range."""
+
+    __slots__ = (
+        "added",
+        "buffer",
+        "diff_line_no",
+        "end",
+        "removed",
+        "section_header",
+        "source_length",
+        "source_start",
+        "start",
+        "target_length",
+        "target_start",
+    )
+
+    def __init__(
+        self,
+        buffer,
+        source_start,
+        source_length,
+        target_start,
+        target_length,
+        section,
+        start,
+        diff_line_no,
+    ):
+        self.buffer = buffer
+        self.source_start = source_start
+        self.source_length = source_length
+        self.target_start = target_start
+        self.target_length = target_length
+        self.section_header = section
+        self.start = start
+        self.diff_line_no = diff_line_no
+        # End offset of the last line, including trailing markers
+        self.end = buffer.find(b"\n", start) + 1 or len(buffer)
+        self.added = 0
+        self.removed = 0
+
+    def append_line(self, line_type, start, end):
+        """Count a line spanning buffer[start:end] and extend the hunk to it."""
+        if line_type == mapped.ADDED:
+            self.added += 1
+        elif line_type == mapped.REMOVED:
+            self.removed += 1
+        self.end = end
+
+    def materialize(self):
+        """Parse the hunk into a unidiff Hunk of Line objects.
+
+        Nothing is cached, so keep the returned Hunk rather than parsing the
+        same hunk again.
+        """
+        text = HUNK_FILE_HEADER + self.buffer[self.start : self.end]
+        (patched_file,) = unidiff.PatchSet(io.BytesIO(text), encoding="utf-8")
+        hunk = patched_file[0]
+        # Number lines as in the whole patch
+        line_offset = self.diff_line_no - HUNK_FILE_HEADER_LINES - 1
+        for line in hunk:
+            if line.diff_line_no is not None:
+                line.diff_line_no += line_offset
+        return hunk
+
+
+class LazyPatchedFile(mapped.MappedFile):
+    """A file diff of a LazyPatchSet.
+
+    The header fields and line counts come from the index; iterating the file
+    parses its hunks one at a time into unidiff Hunks.
+    """
+
+    __slots__ = ()
+
+    def __iter__(self):
+        for hunk in self.hunks:
+            yield hunk.materialize()
+
+    def __len__(self):
+        return len(self.hunks)
+
+    def __getitem__(self, index):
+        return self.hunks[index].materialize()
+
+
+class LazyPatchSet(mapped.MappedPatchSet):
+    """PatchSet-like sequence of files indexed from a patch in one byte scan.
+
+    Building the index reads every line once but only decodes file and hunk
+    headers, so reports limited to file level fields cost little more than
+    the scan. Line objects are created when a file's hunks are iterated.
+    """
+
+    def _index_files(self, buffer):
+        return mapped.iter_mapped_files(
+            buffer,
+            file_class=LazyPatchedFile,
+            hunk_class=functools.partial(LazyHunk, buffer),
+        )
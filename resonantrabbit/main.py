@@ -0,0 +1,1092 @@
+"""
+Example demonstrating unidiff library parsing git patches including empty line handling.
+Part of project resonantrabbit.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+import unidiff
+
+from .compressed import (
+    DECOMPRESSION_ERRORS,
+    UnsupportedCompressionError,
+    detect_compression,
+    file_compression,
+    open_patch_input,
+)
+from .profiling import PhaseProfiler, format_profile, patch_scope, profile_run
+from .report import (
+    EmptyLineCount,
+    EmptyLineEvent,
+    EmptyLineReport,
+    FileReport,
+    HunkReport,
+    PatchReport,
+)
+from .scanner import DIFF_GIT_HEADER
+from .writer import FLUSH_POLICIES, open_report_writer, write_lines
+
+# Number of lines shown from the start of each hunk
+SAMPLE_LINE_COUNT = 5
+
+# Exit status of --rules when the check cannot run, as 1 means violations
+RULES_ERROR_STATUS = 2
+
+
+def _is_blank(value):
+    """Return True for empty or whitespace-only line values."""
+    # Same result as value.strip() == "" without building a new string
+    return not value or value.isspace()
+
+
+def summarize_file(file_patch, samples=True):
+    """Collect everything the reports need from a patched file in one pass.
+
+    Returns a FileReport with the file metadata, per-hunk headers, empty line
+    events, sample lines and line counts, walking each line of the file
+    exactly once. Without samples, hunks carry no sample lines, for reports
+    that are never rendered.
+    """
+    report = FileReport(
+        path=file_patch.path,
+        source_file=file_patch.source_file,
+        target_file=file_patch.target_file,
+        is_added_file=file_patch.is_added_file,
+        is_removed_file=file_patch.is_removed_file,
+        is_modified_file=file_patch.is_modified_file,
+    )
+
+    for hunk in file_patch:
+        hunk_report = HunkReport(
+            source_start=hunk.source_start,
+            source_length=hunk.source_length,
+            target_start=hunk.target_start,
+            target_length=hunk.target_length,
+            section_header=hunk.section_header,
+        )
+        if samples:
+            hunk_report.sample_lines = [
+                (line.line_type, line.value) for line in hunk[:SAMPLE_LINE_COUNT]
+            ]
+            hunk_report.has_more_lines = len(hunk) > SAMPLE_LINE_COUNT
+        events = hunk_report.empty_line_events
+        for line in hunk:
+            line_type = line.line_type
+            if line_type == "+":
+                report.added += 1
+                if _is_blank(line.value):
+                    report.empty_added += 1
+                    events.append(EmptyLineEvent("+", None, line.target_line_no))
+            elif line_type == "-":
+                report.removed += 1
+                if _is_blank(line.value):
+                    report.empty_removed += 1
+                    events.append(EmptyLineEvent("-", line.source_line_no, None))
+            elif line_type == " " and _is_blank(line.value):
+                events.append(
+                    EmptyLineEvent(" ", line.source_line_no, line.target_line_no)
+                )
+        report.hunks.append(hunk_report)
+
+    return report
+
+
+def count_empty_lines(file_patch):
+    """Return the EmptyLineCount of a patched file, without building hunks."""
+    count = EmptyLineCount(file_patch.path)
+    for hunk in file_patch:
+        for line in hunk:
+            line_type = line.line_type
+            if line_type == "+":
+                count.empty_added += _is_blank(line.value)
+            elif line_type == "-":
+                count.empty_removed += _is_blank(line.value)
+    return count
+
+
+def format_file_header(summary):
+    """Return the lines describing a file, without its hunks.
+
+    Works with a FileReport or anything else with the same file level fields,
+    such as the files of a lazy.LazyPatchSet.
+    """
+    return [
+        f"File: {summary.path}",
+        f"  Source file: {summary.source_file}",
+        f"  Target file: {summary.target_file}",
+        f"  Is added file: {summary.is_added_file}",
+        f"  Is removed file: {summary.is_removed_file}",
+        f"  Is modified file: {summary.is_modified_file}",
+        f"  Added lines: {summary.added}",
+        f"  Removed lines: {summary.removed}",
+        f"  Number of hunks: {len(summary.hunks)}",
+        "",
+    ]
+
+
+def format_file_analysis(summary):
+    """Return the lines of the detailed analysis of a single FileReport."""
+    lines = format_file_header(summary)
+
+    for i, hunk in enumerate(summary.hunks):
+        lines += (
+            f"  Hunk {i + 1}:",
+            f"    Source start: {hunk.source_start}, length: {hunk.source_length}",
+            f"    Target start: {hunk.target_start}, length: {hunk.target_length}",
+            f"    Section header: {hunk.section_header}",
+            "",
+        )
+
+        if hunk.empty_line_events:
+            lines.append("    Empty line changes detected:")
+            for event in hunk.empty_line_events:
+                if event.line_type == "+":
+                    lines.append(
+                        f"    + Added empty line at target line {event.target_line_no}"
+                    )
+                elif event.line_type == "-":
+                    lines.append(
+                        f"    - Removed empty line from source line {event.source_line_no}"
+                    )
+                else:
+                    lines.append("    = Context empty line")
+            lines.append("")
+
+        # Show first few lines of the hunk for context
+        lines.append("    Sample lines from hunk:")
+        for line_type, value in hunk.sample_lines:
+            line_type = line_type if line_type in ("+", "-") else " "
+            line_repr = repr(value) if _is_blank(value) else value.rstrip()
+            lines.append(f"    {line_type} {line_repr}")
+        if hunk.has_more_lines:
+            lines.append("    ... (more lines)")
+        lines.append("")
+
+    return lines
+
+
+def print_file_analysis(summary, out=None):
+    """Print the detailed analysis of a single FileReport."""
+    write_lines(out, format_file_analysis(summary))
+
+
+def print_header_report(files, out=None):
+    """Print the file level part of the detailed analysis, then the file count."""
+    file_count = 0
+    for patched_file in files:
+        file_count += 1
+        write_lines(out, format_file_header(patched_file))
+    print_file_count(file_count, out)
+
+
+def print_file_count(file_count, out=None):
+    """Print the number of files covered by the analysis."""
+    write_lines(out, [f"PatchSet contains {file_count} files.", ""])
+
+
+def format_empty_line_counts(summary):
+    """Return the lines reporting the empty line counts of one file."""
+    return [
+        f"File {summary.path}:",
+        f"  Empty lines added: {summary.empty_added}",
+        f"  Empty lines removed: {summary.empty_removed}",
+        "",
+    ]
+
+
+def print_empty_line_analysis(summaries, out=None):
+    """Print per-file and total empty line counts from file reports."""
+    write_lines(out, ["=== Empty Line Change Analysis ===", ""])
+
+    total_empty_added = 0
+    total_empty_removed = 0
+
+    for summary in summaries:
+        total_empty_added += summary.empty_added
+        total_empty_removed += summary.empty_removed
+
+        if summary.empty_added > 0 or summary.empty_removed > 0:
+            write_lines(out, format_empty_line_counts(summary))
+
+    print_empty_line_totals(total_empty_added, total_empty_removed, out=out)
+
+
+def print_empty_line_totals(empty_added, empty_removed, label="all files", out=None):
+    """Print the closing totals section of an empty line analysis."""
+    write_lines(
+        out,
+        [
+            f"Total across {label}:",
+            f"  Empty lines added: {empty_added}",
+            f"  Empty lines removed: {empty_removed}",
+            "",
+        ],
+    )
+
+
+def print_patch_analysis(summaries, out=None):
+    """Print the detailed analysis for a stream of file summaries."""
+    file_count = 0
+    for summary in summaries:
+        file_count += 1
+        print_file_analysis(summary, out)
+    print_file_count(file_count, out)
+
+
+def print_patch_report(summaries, out=None):
+    """Print the detailed analysis followed by the empty line analysis.
+
+    The detailed section is printed as file reports stream in and only the
+    small per-file empty line counts are kept for the summary section.
+    """
+    empty_line_counts = []
+    for summary in summaries:
+        print_file_analysis(summary, out)
+        empty_line_counts.append(EmptyLineCount.from_summary(summary))
+    print_file_count(len(empty_line_counts), out)
+    print_empty_line_analysis(empty_line_counts, out)
+
+
+def iter_patch_summaries(patch_set, samples=True):
+    """Yield the FileReport of each file of a patch set as it is summarized.
+
+    Accepts a PatchSet or any iterable of patched files, such as the generator
+    returned by stream_patch_from_file. Patch sets with their own
+    summarize_file, such as compact.CompactPatchSet, summarize their files.
+    """
+    summarize = getattr(patch_set, "summarize_file", summarize_file)
+    return (summarize(file_patch, samples=samples) for file_patch in patch_set)
+
+
+def build_patch_report(patch_set, samples=True):
+    """Return the PatchReport of a patch set without printing anything.
+
+    Every FileReport is kept; the printing analyses below stream instead.
+    """
+    return PatchReport(files=list(iter_patch_summaries(patch_set, samples)))
+
+
+def _keep_counts(summaries, counts):
+    """Yield summaries while appending their EmptyLineCount to counts."""
+    for summary in summaries:
+        counts.append(EmptyLineCount.from_summary(summary))
+        yield summary
+
+
+def stream_patch_report(summaries, render, print_report):
+    """Print the report of FileReports as they are produced.
+
+    Only the empty line counts of printed files are kept, so an
+    EmptyLineReport is returned. Without render nothing is printed and the
+    PatchReport of every summary is returned; its FileReports need no sample
+    lines then.
+    """
+    if not render:
+        return PatchReport(files=list(summaries))
+    counts = []
+    print_report(_keep_counts(summaries, counts))
+    return EmptyLineReport(files=counts)
+
+
+def stream_empty_line_report(counts, render):
+    """Print the empty line analysis of EmptyLineCounts as they are produced.
+
+    The EmptyLineReport of the counts is returned; nothing is printed
+    without render.
+    """
+    if not render:
+        return EmptyLineReport(files=list(counts))
+    return stream_patch_report(counts, render, print_empty_line_analysis)
+
+
+def analyze_patch(patch_set, render=True):
+    """Analyze the patch set and return its report.
+
+    The detailed text analysis is printed file by file unless render is
+    False; the file count is printed after the per-file details. A printed
+    analysis returns an EmptyLineReport, otherwise the PatchReport of every
+    file is returned.
+    """
+    return stream_patch_report(
+        iter_patch_summaries(patch_set, samples=render), render, print_patch_analysis
+    )
+
+
+def demonstrate_empty_line_detection(patch_set, render=True):
+    """Detect empty line additions and removals and return the EmptyLineReport.
+
+    Only EmptyLineCounts are built, as that is all the analysis shows; it is
+    printed unless render is False. Patch sets with their own
+    count_empty_lines, such as compact.CompactPatchSet, count their files.
+    """
+    count = getattr(patch_set, "count_empty_lines", count_empty_lines)
+    return stream_empty_line_report(map(count, patch_set), render)
+
+
+def report_patch(patch_set, render=True):
+    """Build the report used by both analyses and print them.
+
+    Each file is traversed once, so this is cheaper than calling analyze_patch
+    and demonstrate_empty_line_detection on the same patch.
+    """
+    return stream_patch_report(
+        iter_patch_summaries(patch_set, samples=render), render, print_patch_report
+    )
+
+
+def load_patch_from_file(patch_file_path):
+    """Load a patch from a file, decompressing gzip, bz2, xz or zstd input."""
+    with open_patch_input(patch_file_path) as f:
+        # Decoded as PatchSet.from_filename does, with universal newlines
+        return unidiff.PatchSet(io.TextIOWrapper(f, encoding="utf-8"))
+
+
+def _parse_file_chunk(chunk, line_offset, encoding):
+    """Parse the lines of a single file diff and yield its patched files."""
+    for file_patch in unidiff.PatchSet(chunk, encoding=encoding):
+        if line_offset:
+            # Keep diff line numbers relative to the whole patch
+            file_patch.diff_line_no += line_offset
+            for hunk in file_patch:
+                for line in hunk:
+                    if line.diff_line_no is not None:
+                        line.diff_line_no += line_offset
+        yield file_patch
+
+
+def iter_file_chunks(lines):
+    """Split raw patch lines on "diff --git" headers.
+
+    Yields (chunk, line_offset) pairs of a file diff's lines and the number of
+    patch lines before it. Diffs without git headers come out as one chunk.
+    """
+    chunk = []
+    line_offset = 0
+    for line in lines:
+        if line.startswith(DIFF_GIT_HEADER) and chunk:
+            yield chunk, line_offset
+            line_offset += len(chunk)
+            chunk = []
+        chunk.append(line)
+
+    if chunk:
+        yield chunk, line_offset
+
+
+def iter_patch_files(lines, encoding="utf-8"):
+    """Yield parsed files one at a time from an iterable of raw patch lines.
+
+    Each file diff is parsed on its own, so memory is bounded by the largest
+    single file diff rather than by the whole patch.
+    """
+    for chunk, line_offset in iter_file_chunks(lines):
+        yield from _parse_file_chunk(chunk, line_offset, encoding)
+
+
+def stream_patch_from_file(patch_file_path, encoding="utf-8"):
+    """Stream the files of a patch, or of standard input for "-", one at a time.
+
+    Lines are split on newlines only, as git does, so CRLF content is preserved.
+    Compressed patches are decompressed as they are read.
+    """
+    with open_patch_input(patch_file_path) as f:
+        yield from iter_patch_files(f, encoding=encoding)
+
+
+def iter_profiled_summaries(patch_path, profiler, encoding="utf-8"):
+    """Yield the file reports of a patch, charging each step to a profiler phase.
+
+    Lines are decoded before unidiff sees them so that decoding and parsing
+    are timed separately. Read, decode and parse time of a file diff holding
+    several files (a diff without git headers) goes to its first file.
+    Decompressing compressed input is charged to reading.
+    """
+    with open_patch_input(patch_path) as source:
+        profiler.begin_file()
+        for chunk, line_offset in profiler.timed(iter_file_chunks(source), "read"):
+            with profiler.phase("decode"):
+                text = [line.decode(encoding) for line in chunk]
+            with profiler.phase("parse"):
+                file_patches = list(_parse_file_chunk(text, line_offset, None))
+            for i, file_patch in enumerate(file_patches):
+                if i:
+                    profiler.begin_file()
+                profiler.set_file_path(file_patch.path)
+                with profiler.phase("analysis"):
+                    summary = summarize_file(file_patch)
+                yield summary
+            profiler.begin_file()
+        profiler.end_file()
+
+
+def iter_summaries(patch_path, cache=None, profiler=None, jobs=None):
+    """Yield the file reports of a patch path or "-" for standard input.
+
+    With a ResultCache, patch files are looked up by content first and only
+    parsed on a miss; standard input is never cached. With a PhaseProfiler,
+    the cache is not used and every step is charged to its phase. With jobs,
+    the files of an uncompressed patch file are analyzed in that many worker
+    processes.
+    """
+    if profiler is not None:
+        return iter_profiled_summaries(patch_path, profiler)
+    if cache is not None and patch_path != "-":
+        return cache.iter_patch_file(patch_path)
+    if jobs is not None and patch_path != "-" and not file_compression(patch_path):
+        from . import parallel
+
+        return parallel.iter_summaries_parallel(patch_path, max_workers=jobs)
+    return map(summarize_file, stream_patch_from_file(patch_path))
+
+
+def _empty_line_totals(summaries, counts):
+    """Yield summaries while adding their empty line counts to counts."""
+    for summary in summaries:
+        counts["files"] += 1
+        counts["empty_added"] += summary.empty_added
+        counts["empty_removed"] += summary.empty_removed
+        yield summary
+
+
+def write_json_report(patch_paths, out, cache=None, profiler=None, jobs=None):
+    """Write the analysis of every patch as one JSON document.
+
+    The document is written file by file, so it never has to be held in
+    memory as a whole.
+    """
+    out.write('{"patches": [')
+    for i, patch_path in enumerate(patch_paths):
+        counts = {"files": 0, "empty_added": 0, "empty_removed": 0}
+        out.write(", " if i else "")
+        with patch_scope(profiler, patch_path):
+            out.write(f'{{"patch": {json.dumps(patch_path)}, "files": [')
+            summaries = iter_summaries(patch_path, cache, profiler, jobs)
+            for j, summary in enumerate(_empty_line_totals(summaries, counts)):
+                out.write(", " if j else "")
+                out.write(json.dumps(summary.to_dict()))
+            out.write(
+                f'], "total_empty_added": {counts["empty_added"]}, '
+                f'"total_empty_removed": {counts["empty_removed"]}}}'
+            )
+    out.write("]}\n")
+
+
+def write_ndjson_report(patch_paths, out, cache=None, profiler=None, jobs=None):
+    """Write one JSON record per file, then a totals record per patch."""
+    for patch_path in patch_paths:
+        counts = {"files": 0, "empty_added": 0, "empty_removed": 0}
+        with patch_scope(profiler, patch_path):
+            summaries = iter_summaries(patch_path, cache, profiler, jobs)
+            for summary in _empty_line_totals(summaries, counts):
+                out.write(
+                    json.dumps({
+                        "type": "file",
+                        "patch": patch_path,
+                        **summary.to_dict(),
+                    })
+                )
+                out.write("\n")
+            out.write(json.dumps({"type": "totals", "patch": patch_path, **counts}))
+            out.write("\n")
+
+
+def write_text_report(patch_paths, cache=None, out=None, profiler=None, jobs=None):
+    """Print the text analysis of every patch."""
+    write_lines(out, ["=== Git Patch Parsing with Unidiff ===", ""])
+
+    for patch_path in patch_paths:
+        if len(patch_paths) > 1:
+            write_lines(out, [f"=== Patch: {patch_path} ===", ""])
+        # Analyze the patch and demonstrate empty line detection in one pass
+        with patch_scope(profiler, patch_path):
+            print_patch_report(iter_summaries(patch_path, cache, profiler, jobs), out)
+
+
+def write_header_report(patch_paths, out=None):
+    """Print the file level analysis of every patch from a lazy index."""
+    from . import lazy
+
+    write_lines(out, ["=== Git Patch Parsing with Unidiff ===", ""])
+
+    for patch_path in patch_paths:
+        if len(patch_paths) > 1:
+            write_lines(out, [f"=== Patch: {patch_path} ===", ""])
+        if patch_path == "-":
+            data = sys.stdin.buffer.read()
+            if detect_compression(data):
+                raise UnsupportedCompressionError(
+                    "--headers-only needs an uncompressed patch"
+                )
+            patch_set = lazy.LazyPatchSet(data)
+        else:
+            patch_set = lazy.LazyPatchSet.from_filename(patch_path)
+        with patch_set:
+            print_header_report(patch_set, out)
+
+
+def positive_int(text):
+    """Parse a command line count that must be at least 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {text}")
+    return value
+
+
+def non_negative_float(text):
+    """Parse a command line number of seconds that cannot be negative."""
+    value = float(text)
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {text}")
+    return value
+
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(
+        prog="resonantrabbit",
+        description="Analyze git patches, with a focus on empty line changes.",
+    )
+    parser.add_argument(
+        "patches",
+        nargs="*",
+        default=["-"],
+        metavar="PATCH",
+        help='patch files to analyze; "-" reads standard input (the default)',
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "ndjson"],
+        default="text",
+        help="output format (default: text)",
+    )
+    parser.add_argument(
+        "--headers-only",
+        action="store_true",
+        help="only report file level fields and line counts, read from a "
+        "lazy index without parsing hunk lines (text format only)",
+    )
+    parser.add_argument(
+        "--file",
+        metavar="PATH",
+        help="report the statistics of one file of a single PATCH through "
+        "its .idx sidecar index, which is built or rebuilt when needed",
+    )
+    parser.add_argument(
+        "--hunk",
+        type=int,
+        metavar="N",
+        help="with --file, print hunk N (from 1) of that file",
+    )
+    parser.add_argument(
+        "--verify-index",
+        action="store_true",
+        help="with --file, hash the patch to check the index is current even "
+        "when its size and mtime match",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="treat PATCH arguments as directories or glob patterns and "
+        "analyze every matching patch in a worker pool",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=None,
+        metavar="N",
+        help="number of batch workers (default: number of CPUs); without "
+        "--batch, analyze the files of each uncompressed PATCH in N worker "
+        "processes",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread"],
+        default="process",
+        help="kind of batch worker pool (default: process)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="reuse analysis results stored in DIR, keyed by patch content",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="evict least recently used cache entries beyond this size (default: 256)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        help="write the report to FILE instead of standard output; "
+        'names ending in ".gz" are gzip compressed',
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="gzip compress the report as it is written",
+    )
+    parser.add_argument(
+        "--flush",
+        choices=FLUSH_POLICIES,
+        default=None,
+        help="write buffered output when the buffer fills up, or after every "
+        "block such as a file diff (default: block on a terminal, else buffer)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="keep reading file diffs appended to a single PATCH file and "
+        "update the empty line totals until interrupted",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=non_negative_float,
+        default=1.0,
+        metavar="SECONDS",
+        help="how often --follow checks for appended data (default: 1.0)",
+    )
+    parser.add_argument(
+        "--rules",
+        nargs="?",
+        const="default",
+        metavar="SPEC",
+        help="check added lines against whitespace rules instead of reporting "
+        "empty lines, and exit with status 1 on any violation or 2 when the "
+        "check cannot run; SPEC is a comma "
+        "separated list of trailing-whitespace, whitespace-only, crlf, "
+        "indent=spaces|tabs and max-blank-run=N (default: trailing-whitespace,"
+        "whitespace-only,crlf,max-blank-run=2)",
+    )
+    parser.add_argument(
+        "--fix",
+        action="store_true",
+        help="write each patch without its blank line and trailing whitespace "
+        "changes, as a patch git apply accepts, instead of reporting empty lines",
+    )
+    parser.add_argument(
+        "--daemon",
+        metavar="SOCKET",
+        help="keep a warm process serving analyses on the Unix socket SOCKET "
+        "until stopped; query it with resonantrabbit-client",
+    )
+    parser.add_argument(
+        "--git-log",
+        metavar="RANGE",
+        help="analyze every commit in a revision range of a git repository, "
+        "streamed from git log -p, instead of PATCH arguments",
+    )
+    parser.add_argument(
+        "--repo",
+        default=".",
+        metavar="DIR",
+        help="git repository used by --git-log (default: current directory)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time and allocations of the read, decode, parse, "
+        "analysis and render phases per patch and file to standard error",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        help="with --profile, also run under cProfile and dump its stats to FILE",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        metavar="FILE",
+        help="with --profile, trace allocations in bytes with tracemalloc and "
+        "dump a snapshot to FILE",
+    )
+    return parser
+
+
+def print_os_error(error, patch_paths):
+    """Print an OSError of a report run and return the exit status.
+
+    Errors naming one of the patches come from reading it; any other error
+    comes from writing the report, such as a full disk or a closed pipe.
+    """
+    if error.filename is not None and error.filename in patch_paths:
+        print(f"Could not read patch: {error}", file=sys.stderr)
+    else:
+        print(f"Could not write report: {error}", file=sys.stderr)
+    return 1
+
+
+def error_status(args):
+    """Return the exit status of a run that cannot go on.
+
+    Status 1 of --rules means violations, so its errors exit with
+    RULES_ERROR_STATUS instead.
+    """
+    return RULES_ERROR_STATUS if args.rules is not None else 1
+
+
+def open_cache(args):
+    """Return the ResultCache selected on the command line, if any."""
+    if args.cache_dir is None:
+        return None
+
+    from . import result_cache
+
+    return result_cache.ResultCache(
+        args.cache_dir, max_bytes=args.cache_size * 1024 * 1024
+    )
+
+
+def open_output(args):
+    """Open the buffered report writer selected on the command line."""
+    return open_report_writer(args.output, compress=args.gzip, flush_policy=args.flush)
+
+
+def run_batch(args):
+    """Run the --batch mode and return the process exit status."""
+    from . import batch
+
+    unmatched = batch.unmatched_patterns(args.patches)
+    if unmatched:
+        print(f"No patch files match: {', '.join(unmatched)}", file=sys.stderr)
+        return 1
+
+    results = batch.iter_batch_results(
+        batch.expand_patch_paths(args.patches),
+        max_workers=args.jobs,
+        executor=args.executor,
+        cache=open_cache(args),
+    )
+    with open_output(args) as out:
+        if args.format == "json":
+            totals = batch.write_batch_json(results, out)
+        elif args.format == "ndjson":
+            totals = batch.write_batch_ndjson(results, out)
+        else:
+            totals = batch.print_batch_report(results, out)
+    return 1 if totals["errors"] else 0
+
+
+def run_history(args):
+    """Run the --git-log mode and return the process exit status."""
+    import subprocess
+
+    from . import history
+
+    if args.patches != ["-"]:
+        print("--git-log does not take PATCH arguments", file=sys.stderr)
+        return 1
+
+    results = history.iter_history_results(args.repo, args.git_log)
+    try:
+        with open_output(args) as out:
+            if args.format == "json":
+                totals = history.write_history_json(results, out)
+            elif args.format == "ndjson":
+                totals = history.write_history_ndjson(results, out)
+            else:
+                totals = history.print_history_report(results, out)
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", None)
+        print(f"git log failed: {(stderr or str(e)).strip()}", file=sys.stderr)
+        return 1
+    return 1 if totals["errors"] else 0
+
+
+def run_index_query(args):
+    """Run a --file query against a sidecar index; returns the exit status."""
+    from . import sidecar
+
+    if len(args.patches) != 1 or args.patches[0] == "-":
+        print("--file needs exactly one patch file", file=sys.stderr)
+        return 1
+
+    patch_path = args.patches[0]
+    try:
+        index = sidecar.open_index(patch_path, verify_hash=args.verify_index)
+    except (OSError, unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        print(f"Could not index patch: {e}", file=sys.stderr)
+        return 1
+
+    with index, open_output(args) as out:
+        stats = index.stats_for_path(args.file)
+        if stats is None:
+            print(f"File not in patch: {args.file}", file=sys.stderr)
+            return 1
+        if args.hunk is None:
+            if args.format == "text":
+                write_lines(out, sidecar.format_file_stats(stats))
+            else:
+                out.write(json.dumps(stats.to_dict()) + "\n")
+            return 0
+
+        try:
+            hunk = index.hunk(args.file, args.hunk)
+        except IndexError:
+            print(f"{args.file} has no hunk {args.hunk}", file=sys.stderr)
+            return 1
+        out.write(str(hunk))
+    return 0
+
+
+def run_follow(args):
+    """Run the --follow mode and return the process exit status."""
+    from . import follow
+
+    if len(args.patches) != 1 or args.patches[0] == "-":
+        print("--follow needs exactly one patch file", file=sys.stderr)
+        return 1
+    if args.format == "json":
+        print("--follow supports the text and ndjson formats", file=sys.stderr)
+        return 1
+
+    try:
+        with open_output(args) as out:
+            follow.follow_patch(
+                args.patches[0], out, args.format, poll_interval=args.poll_interval
+            )
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        print(f"Could not parse patch: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def write_report(args, cache=None, profiler=None):
+    """Write the report of the PATCH arguments in the selected format."""
+    with open_output(args) as out:
+        if args.format == "json":
+            write_json_report(args.patches, out, cache, profiler, args.jobs)
+        elif args.format == "ndjson":
+            write_ndjson_report(args.patches, out, cache, profiler, args.jobs)
+        elif args.headers_only:
+            write_header_report(args.patches, out)
+        else:
+            write_text_report(args.patches, cache, out, profiler, args.jobs)
+
+
+def run_profiled(args):
+    """Write the report with phase profiling; returns the exit status."""
+    status = error_status(args)
+    if args.headers_only or args.cache_dir is not None or args.jobs is not None:
+        print(
+            "--profile cannot be combined with --headers-only, --cache-dir or --jobs",
+            file=sys.stderr,
+        )
+        return status
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        profiler = PhaseProfiler()
+        with profile_run(profiler, args.cprofile, args.tracemalloc):
+            write_report(args, profiler=profiler)
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        print(f"Could not parse patch: {e}", file=sys.stderr)
+        return status
+    except DECOMPRESSION_ERRORS as e:
+        print(f"Could not read patch: {e}", file=sys.stderr)
+        return status
+    except OSError as e:
+        print_os_error(e, args.patches)
+        return status
+    finally:
+        tracemalloc.stop()
+    write_lines(sys.stderr, format_profile(profiler))
+    return 0
+
+
+def run_rules(args):
+    """Run the --rules check and return the process exit status.
+
+    The status is 1 when a violation is found and RULES_ERROR_STATUS when the
+    check could not run, so that scripts can tell the two apart.
+    """
+    from . import rules
+
+    spec = rules.DEFAULT_RULES if args.rules == "default" else args.rules
+    try:
+        rule_set = rules.RuleSet.parse(spec)
+    except ValueError as e:
+        print(f"Bad --rules: {e}", file=sys.stderr)
+        return RULES_ERROR_STATUS
+
+    checked = ", ".join(rule_set.rules)
+    total = 0
+    try:
+        with open_output(args) as out:
+            if args.format == "json":
+                out.write('{"patches": [')
+            for i, patch_path in enumerate(args.patches):
+                violations = list(rules.check_patch_file(patch_path, rule_set))
+                total += len(violations)
+                if args.format == "json":
+                    out.write(", " if i else "")
+                    out.write(
+                        json.dumps({
+                            "patch": patch_path,
+                            "violations": [v.to_dict() for v in violations],
+                        })
+                    )
+                elif args.format == "ndjson":
+                    for violation in violations:
+                        record = {"type": "violation", "patch": patch_path}
+                        out.write(json.dumps({**record, **violation.to_dict()}) + "\n")
+                    totals = {"type": "totals", "patch": patch_path}
+                    out.write(
+                        json.dumps({**totals, "violations": len(violations)}) + "\n"
+                    )
+                else:
+                    if len(args.patches) > 1:
+                        write_lines(out, [f"=== Patch: {patch_path} ===", ""])
+                    count = len(violations)
+                    noun = "violation" if count == 1 else "violations"
+                    summary = f"{count} {noun} of {checked}"
+                    write_lines(
+                        out, [*map(rules.format_violation, violations), summary, ""]
+                    )
+            if args.format == "json":
+                out.write("]}\n")
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        print(f"Could not parse patch: {e}", file=sys.stderr)
+        return RULES_ERROR_STATUS
+    except DECOMPRESSION_ERRORS as e:
+        print(f"Could not read patch: {e}", file=sys.stderr)
+        return RULES_ERROR_STATUS
+    except OSError as e:
+        print_os_error(e, args.patches)
+        return RULES_ERROR_STATUS
+    return 1 if total else 0
+
+
+def run_fix(args):
+    """Run the --fix mode and return the process exit status."""
+    from . import autofix
+
+    try:
+        with open_output(args) as writer:
+            for patch_path in args.patches:
+                autofix.fix_patch_file(patch_path, writer.sink)
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        print(f"Could not parse patch: {e}", file=sys.stderr)
+        return 1
+    except DECOMPRESSION_ERRORS as e:
+        print(f"Could not read patch: {e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        return print_os_error(e, args.patches)
+    return 0
+
+
+def run_daemon(args):
+    """Run the --daemon mode and return the process exit status."""
+    from . import daemon
+
+    if args.patches != ["-"]:
+        print("--daemon does not take PATCH arguments", file=sys.stderr)
+        return 1
+    try:
+        daemon.run_daemon(args.daemon, out=sys.stderr)
+    except OSError as e:
+        print(f"Could not start daemon: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    """Command line entry point; returns the process exit status."""
+    args = build_parser().parse_args(argv)
+    status = error_status(args)
+    if args.profile and (
+        args.daemon is not None
+        or args.batch
+        or args.git_log is not None
+        or args.follow
+        or args.file is not None
+        or args.rules is not None
+        or args.fix
+    ):
+        # The profiler only covers the PATCH report written by run_profiled
+        print(
+            "--profile cannot be combined with --daemon, --batch, --git-log, "
+            "--follow, --file, --rules or --fix",
+            file=sys.stderr,
+        )
+        return status
+    if args.rules is not None and (
+        args.daemon is not None
+        or args.batch
+        or args.git_log is not None
+        or args.follow
+        or args.file is not None
+        or args.fix
+    ):
+        print(
+            "--rules cannot be combined with --daemon, --batch, --git-log, "
+            "--follow, --file or --fix",
+            file=sys.stderr,
+        )
+        return status
+    if args.daemon is not None:
+        return run_daemon(args)
+    if args.batch:
+        return run_batch(args)
+    if args.git_log is not None:
+        return run_history(args)
+
+    for patch_path in args.patches:
+        if patch_path != "-" and not os.path.exists(patch_path):
+            print(f"Patch file not found: {patch_path}", file=sys.stderr)
+            return status
+    if args.patches.count("-") > 1:
+        print("Standard input can only be read once", file=sys.stderr)
+        return status
+    if args.follow or args.file is not None or args.headers_only:
+        # These modes map or seek within the patch file itself
+        for patch_path in args.patches:
+            if patch_path != "-" and file_compression(patch_path):
+                print(
+                    "--follow, --file and --headers-only need an uncompressed "
+                    f"patch: {patch_path}",
+                    file=sys.stderr,
+                )
+                return status
+    if args.follow:
+        return run_follow(args)
+    if args.file is not None:
+        return run_index_query(args)
+    if args.rules is not None:
+        return run_rules(args)
+    if args.fix:
+        return run_fix(args)
+    if args.headers_only and args.format != "text":
+        print("--headers-only supports the text format only", file=sys.stderr)
+        return status
+
+    if args.profile:
+        return run_profiled(args)
+    if args.cprofile or args.tracemalloc:
+        print("--cprofile and --tracemalloc need --profile", file=sys.stderr)
+        return status
+
+    try:
+        write_report(args, open_cache(args))
+    except (unidiff.UnidiffParseError, UnicodeDecodeError) as e:
+        print(f"Could not parse patch: {e}", file=sys.stderr)
+        return status
+    except DECOMPRESSION_ERRORS as e:
+        print(f"Could not read patch: {e}", file=sys.stderr)
+        return status
+    except OSError as e:
+        print_os_error(e, args.patches)
+        return status
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+Memory-mapped patch input where lines are offsets into the mapped file.
+Part of project resonantrabbit.
+"""
+
+import mmap
+import os
+from array import array
+
+import unidiff
+from unidiff.constants import DEV_NULL, RE_SOURCE_FILENAME, RE_TARGET_FILENAME
+
+from . import main, scanner
+from .report import EmptyLineEvent, FileReport, HunkReport
+
+# Line type codes stored per line; EMPTY marks the bare newline unidiff keeps
+# after a complete hunk, which is neither context nor a change
+ADDED = scanner.ADDED
+REMOVED = scanner.REMOVED
+CONTEXT = scanner.CONTEXT
+NO_NEWLINE = scanner.NO_NEWLINE
+EMPTY = 0
+
+LINE_TYPES = {ADDED: "+", REMOVED: "-", CONTEXT: " ", NO_NEWLINE: "\\", EMPTY: ""}
+
+
+class MappedHunk:
+    """A hunk whose lines are byte offsets into the mapped patch."""
+
+    __slots__ = (
+        "diff_line_no",
+        "line_offsets",
+        "line_types",
+        "section_header",
+        "source_length",
+        "source_start",
+        "start",
+        "target_length",
+        "target_start",
+    )
+
+    def __init__(
+        self,
+        source_start,
+        source_length,
+        target_start,
+        target_length,
+        section,
+        start=None,
+        diff_line_no=None,
+    ):
+        self.source_start = source_start
+        self.source_length = source_length
+        self.target_start = target_start
+        self.target_length = target_length
+        self.section_header = section
+        # Byte offset and patch line number of the hunk header
+        self.start = start
+        self.diff_line_no = diff_line_no
+        # One type code per line, and the start offset of every line followed
+        # by the end offset of the last one
+        self.line_types = bytearray()
+        self.line_offsets = array("Q")
+
+    def __len__(self):
+        return len(self.line_types)
+
+    @property
+    def added(self):
+        return self.line_types.count(ADDED)
+
+    @property
+    def removed(self):
+        return self.line_types.count(REMOVED)
+
+    def append_line(self, line_type, start, end):
+        """Record a line spanning buffer[start:end]."""
+        if self.line_offsets:
+            self.line_offsets[-1] = start
+        else:
+            self.line_offsets.append(start)
+        self.line_types.append(line_type)
+        self.line_offsets.append(end)
+
+
+class MappedFile:
+    """A file diff indexed from the mapped patch, mirroring PatchedFile."""
+
+    __slots__ = ("end", "hunks", "source_file", "start", "target_file")
+
+    def __init__(self, source_file, target_file, start):
+        self.source_file = source_file
+        self.target_file = target_file
+        self.hunks = []
+        # Byte range of this file diff in the mapped patch
+        self.start = start
+        self.end = start
+
+    @property
+    def path(self):
+        return scanner.file_path(self.source_file, self.target_file)
+
+    @property
+    def is_added_file(self):
+        if self.source_file == DEV_NULL:
+            return True
+        return (
+            len(self.hunks) == 1
+            and self.hunks[0].source_start == 0
+            and self.hunks[0].source_length == 0
+        )
+
+    @property
+    def is_removed_file(self):
+        if self.target_file == DEV_NULL:
+            return True
+        return (
+            len(self.hunks) == 1
+            and self.hunks[0].target_start == 0
+            and self.hunks[0].target_length == 0
+        )
+
+    @property
+    def is_modified_file(self):
+        return not (self.is_added_file or self.is_removed_file)
+
+    @property
+    def added(self):
+        return sum(hunk.added for hunk in self.hunks)
+
+    @property
+    def removed(self):
+        return sum(hunk.removed for hunk in self.hunks)
+
+
+def iter_mapped_files(buffer, file_class=MappedFile, hunk_class=MappedHunk):
+    """Yield MappedFile records indexed from a patch buffer.
+
+    Only file and hunk headers are copied out of the buffer; hunk body lines
+    are recorded as offsets and type codes. Other file and hunk classes with
+    the same constructors and append_line can record less, or more.
+    """
+    size = len(buffer)
+    position = 0
+    line_no = 0
+    current = None
+    pending_source = None
+    in_git_header = False
+    # Whether trailing newlines and markers still belong to the last hunk
+    attach_to_hunk = False
+    hunk = None
+    source_left = 0
+    target_left = 0
+
+    while position < size:
+        end = buffer.find(b"\n", position)
+        end = size if end == -1 else end + 1
+        start = position
+        position = end
+        line_no += 1
+
+        if source_left > 0 or target_left > 0:
+            marker = buffer[start]
+            if marker == ADDED:
+                target_left -= 1
+            elif marker == REMOVED:
+                source_left -= 1
+            elif marker == CONTEXT or marker in scanner.BARE_NEWLINE:
+                marker = CONTEXT
+                source_left -= 1
+                target_left -= 1
+            elif marker != NO_NEWLINE:
+                raise unidiff.UnidiffParseError(
+                    f"Hunk diff line expected: {buffer[start:end]!r}"
+                )
+            if source_left < 0 or target_left < 0:
+                raise unidiff.UnidiffParseError("Hunk is longer than expected")
+            hunk.append_line(marker, start, end)
+            current.end = end
+            continue
+
+        line = buffer[start:end]
+        if line.startswith(scanner.DIFF_GIT_HEADER):
+            if current is not None:
+                yield current
+            source_file, target_file = scanner.parse_diff_git_header(line)
+            current = file_class(source_file, target_file, start)
+            in_git_header = True
+            attach_to_hunk = False
+        elif line.startswith(b"@@ ") and (header := scanner.parse_hunk_header(line)):
+            if current is None:
+                raise unidiff.UnidiffParseError(f"Unexpected hunk found: {line!r}")
+            hunk = hunk_class(*header, start, line_no)
+            current.hunks.append(hunk)
+            source_left = hunk.source_length
+            target_left = hunk.target_length
+            in_git_header = False
+            attach_to_hunk = True
+        elif in_git_header and line.startswith(b"new file mode "):
+            current.source_file = DEV_NULL
+        elif in_git_header and line.startswith(b"deleted file mode "):
+            current.target_file = DEV_NULL
+        elif line.startswith(b"--- ") and not in_git_header:
+            match = RE_SOURCE_FILENAME.match(line.decode("utf-8"))
+            if match is not None:
+                if current is not None:
+                    yield current
+                current = None
+                pending_source = (match.group("filename"), start)
+                attach_to_hunk = False
+        elif line.startswith(b"+++ ") and current is None:
+            match = RE_TARGET_FILENAME.match(line.decode("utf-8"))
+            if match is not None and pending_source is not None:
+                source_file, file_start = pending_source
+                current = file_class(source_file, match.group("filename"), file_start)
+                pending_source = None
+        elif attach_to_hunk and line.startswith(b"\\ No newline at end of file"):
+            hunk.append_line(NO_NEWLINE, start, end)
+        elif attach_to_hunk and line == b"\n":
+            hunk.append_line(EMPTY, start, end)
+        elif not in_git_header:
+            # Anything else after the hunks is patch info for what follows
+            attach_to_hunk = False
+
+        if current is not None:
+            current.end = end
+
+    if source_left > 0 or target_left > 0:
+        raise unidiff.UnidiffParseError("Hunk is shorter than expected")
+    if current is not None:
+        yield current
+
+
+class MappedPatchSet:
+    """PatchSet-like sequence of the MappedFiles indexed from a patch buffer.
+
+    Subclasses choose the file and hunk records by overriding _index_files.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.files = list(self._index_files(buffer))
+        self._mmap = None
+
+    def _index_files(self, buffer):
+        return iter_mapped_files(buffer)
+
+    @classmethod
+    def from_filename(cls, patch_file_path):
+        """Index a patch file read through a memory map.
+
+        The map stays open for later reads of line data until close() is
+        called or the with block using the patch set ends.
+        """
+        if not os.path.getsize(patch_file_path):
+            return cls(b"")
+
+        # The map stays valid once the file itself is closed
+        with open(patch_file_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            patch_set = cls(mm)
+        except BaseException:
+            mm.close()
+            raise
+        patch_set._mmap = mm
+        return patch_set
+
+    def close(self):
+        """Release the memory map of a patch opened with from_filename."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, index):
+        return self.files[index]
+
+    @property
+    def added(self):
+        return sum(f.added for f in self.files)
+
+    @property
+    def removed(self):
+        return sum(f.removed for f in self.files)
+
+
+def line_value(buffer, line_type, start, end):
+    """Decode the value of one line, as unidiff would store it."""
+    if line_type == EMPTY or buffer[start] in scanner.BARE_NEWLINE:
+        return buffer[start:end].decode("utf-8")
+    return buffer[start + 1 : end].decode("utf-8")
+
+
+def summarize_mapped_file(mapped_file, buffer):
+    """Summarize a MappedFile into the same FileReport as main.summarize_file.
+
+    Blank checks run directly on the mapped bytes, and only the sample lines
+    shown by the report are decoded.
+    """
+    report = FileReport(
+        path=mapped_file.path,
+        source_file=mapped_file.source_file,
+        target_file=mapped_file.target_file,
+        is_added_file=mapped_file.is_added_file,
+        is_removed_file=mapped_file.is_removed_file,
+        is_modified_file=mapped_file.is_modified_file,
+    )
+
+    for hunk in mapped_file.hunks:
+        offsets = hunk.line_offsets
+        sample_count = min(len(hunk), main.SAMPLE_LINE_COUNT)
+        hunk_report = HunkReport(
+            source_start=hunk.source_start,
+            source_length=hunk.source_length,
+            target_start=hunk.target_start,
+            target_length=hunk.target_length,
+            section_header=hunk.section_header,
+            sample_lines=[
+                (
+                    LINE_TYPES[hunk.line_types[i]],
+                    line_value(buffer, hunk.line_types[i], offsets[i], offsets[i + 1]),
+                )
+                for i in range(sample_count)
+            ],
+            has_more_lines=len(hunk) > main.SAMPLE_LINE_COUNT,
+        )
+        events = hunk_report.empty_line_events
+        source_line_no = hunk.source_start
+        target_line_no = hunk.target_start
+        for i, line_type in enumerate(hunk.line_types):
+            if line_type == ADDED:
+                report.added += 1
+                if scanner.is_blank_at(buffer, offsets[i] + 1, offsets[i + 1]):
+                    report.empty_added += 1
+                    events.append(EmptyLineEvent("+", None, target_line_no))
+                target_line_no += 1
+            elif line_type == REMOVED:
+                report.removed += 1
+                if scanner.is_blank_at(buffer, offsets[i] + 1, offsets[i + 1]):
+                    report.empty_removed += 1
+                    events.append(EmptyLineEvent("-", source_line_no, None))
+                source_line_no += 1
+            elif line_type == CONTEXT:
+                if scanner.is_blank_at(buffer, offsets[i], offsets[i + 1]):
+                    events.append(EmptyLineEvent(" ", source_line_no, target_line_no))
+                source_line_no += 1
+                target_line_no += 1
+        report.hunks.append(hunk_report)
+
+    return report
+
+
+def iter_mapped_summaries(patch_file_path):
+    """Yield FileReports of a patch file read through a memory map.
+
+    Pages of file diffs that have been summarized are dropped from the process
+    as the scan moves on, so resident memory stays well below the patch size.
+    """
+    if not os.path.getsize(patch_file_path):
+        return
+
+    with (
+        open(patch_file_path, "rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        can_advise = hasattr(mm, "madvise")
+        if can_advise:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        released = 0
+
+        for mapped_file in iter_mapped_files(mm):
+            yield summarize_mapped_file(mapped_file, mm)
+
+            boundary = mapped_file.end - mapped_file.end % mmap.PAGESIZE
+            if can_advise and boundary > released:
+                mm.madvise(mmap.MADV_DONTNEED, released, boundary - released)
+                released = boundary
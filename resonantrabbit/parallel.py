@@ -0,0 +1,132 @@
+"""
+Parallel analysis of the files in one large patch using a process pool.
+Part of project resonantrabbit.
+"""
+
+import io
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import main
+from .report import EmptyLineCount
+from .scanner import DIFF_GIT_HEADER
+
+# Shards are grown to at least this many bytes to amortize the per-task overhead
+DEFAULT_SHARD_SIZE = 4 * 1024 * 1024
+
+# Workers are never forked from the caller, which may be running threads
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def find_file_offsets(buffer):
+    """Return the byte offsets of every "diff --git" line in a buffer."""
+    offsets = []
+    if buffer[: len(DIFF_GIT_HEADER)] == DIFF_GIT_HEADER:
+        offsets.append(0)
+
+    needle = b"\n" + DIFF_GIT_HEADER
+    position = buffer.find(needle)
+    while position != -1:
+        offsets.append(position + 1)
+        position = buffer.find(needle, position + 1)
+    return offsets
+
+
+def plan_shards(offsets, size, shard_size=DEFAULT_SHARD_SIZE):
+    """Group consecutive file diffs into (start, end) byte ranges.
+
+    Every shard starts on a file boundary and holds whole file diffs, except
+    that the first one also carries any preamble before the first file. A
+    patch without git headers becomes a single shard.
+    """
+    if not size:
+        return []
+
+    shards = []
+    start = 0
+    for offset in offsets[1:]:
+        if offset - start >= shard_size:
+            shards.append((start, offset))
+            start = offset
+    shards.append((start, size))
+    return shards
+
+
+def summarize_shard(patch_file_path, start, end, samples=True):
+    """Parse one shard of a patch file and return its FileReports."""
+    with (
+        open(patch_file_path, "rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        data = mm[start:end]
+    return [
+        main.summarize_file(file_patch, samples)
+        for file_patch in main.iter_patch_files(io.BytesIO(data))
+    ]
+
+
+def iter_summaries_parallel(
+    patch_file_path, max_workers=None, shard_size=DEFAULT_SHARD_SIZE, samples=True
+):
+    """Yield FileReports of a patch file analyzed across a process pool.
+
+    Summaries come back in the original file order, so rendering them gives
+    the same output as the serial path. At most two shards per worker are in
+    flight at any time, which keeps memory flat on very large patches.
+    """
+    size = os.path.getsize(patch_file_path)
+    if not size:
+        return
+
+    with (
+        open(patch_file_path, "rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        shards = plan_shards(find_file_offsets(mm), size, shard_size)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context(START_METHOD)
+    ) as executor:
+        pending = deque()
+        for start, end in shards:
+            pending.append(
+                executor.submit(summarize_shard, patch_file_path, start, end, samples)
+            )
+            if len(pending) >= max_workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def analyze_patch_parallel(patch_file_path, max_workers=None, render=True):
+    """Parallel equivalent of analyze_patch for a patch file on disk."""
+    return main.stream_patch_report(
+        iter_summaries_parallel(patch_file_path, max_workers, samples=render),
+        render,
+        main.print_patch_analysis,
+    )
+
+
+def demonstrate_empty_line_detection_parallel(
+    patch_file_path, max_workers=None, render=True
+):
+    """Parallel equivalent of demonstrate_empty_line_detection for a patch file."""
+    summaries = iter_summaries_parallel(patch_file_path, max_workers, samples=False)
+    return main.stream_empty_line_report(
+        map(EmptyLineCount.from_summary, summaries), render
+    )
+
+
+def report_patch_parallel(patch_file_path, max_workers=None, render=True):
+    """Parallel equivalent of report_patch for a patch file on disk."""
+    return main.stream_patch_report(
+        iter_summaries_parallel(patch_file_path, max_workers, samples=render),
+        render,
+        main.print_patch_report,
+    )
@@ -0,0 +1,302 @@
+"""
+Opt-in per-phase timing and allocation profiling of patch analysis.
+Part of project resonantrabbit.
+"""
+
+import contextlib
+import cProfile
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+PHASES = ("read", "decode", "parse", "analysis", "render")
+# Number of files listed by format_profile for each patch
+SLOWEST_FILES = 10
+
+
+@dataclass(slots=True)
+class PhaseStats:
+    """Time and allocations charged to one phase.
+
+    allocations is the net change in live memory, which goes negative when
+    a phase frees objects made by another. peak is the largest growth above
+    the phase's starting memory, and is only measured in tracemalloc bytes.
+    """
+
+    seconds: float = 0.0
+    allocations: int = 0
+    peak: int = 0
+
+    def add(self, other):
+        self.seconds += other.seconds
+        self.allocations += other.allocations
+        self.peak = max(self.peak, other.peak)
+
+
+def _new_phases():
+    return {phase: PhaseStats() for phase in PHASES}
+
+
+def _total_seconds(phases):
+    return sum(stats.seconds for stats in phases.values())
+
+
+def _phases_to_dict(phases):
+    return {
+        phase: {
+            "seconds": stats.seconds,
+            "allocations": stats.allocations,
+            "peak": stats.peak,
+        }
+        for phase, stats in phases.items()
+    }
+
+
+@dataclass(slots=True)
+class FileProfile:
+    """Phase statistics of one file diff; path is None for patch level work."""
+
+    path: str | None = None
+    phases: dict = field(default_factory=_new_phases)
+
+    @property
+    def seconds(self):
+        return _total_seconds(self.phases)
+
+    def to_dict(self):
+        return {"path": self.path, "phases": _phases_to_dict(self.phases)}
+
+
+@dataclass(slots=True)
+class PatchProfile:
+    """Phase statistics of a patch: its files and the work outside any file."""
+
+    patch: str
+    files: list = field(default_factory=list)
+    other: FileProfile = field(default_factory=FileProfile)
+
+    @property
+    def phases(self):
+        totals = _new_phases()
+        for record in [*self.files, self.other]:
+            for phase, stats in record.phases.items():
+                totals[phase].add(stats)
+        return totals
+
+    @property
+    def seconds(self):
+        return _total_seconds(self.phases)
+
+    def to_dict(self):
+        return {
+            "patch": self.patch,
+            "phases": _phases_to_dict(self.phases),
+            "other": _phases_to_dict(self.other.phases),
+            "files": [f.to_dict() for f in self.files],
+        }
+
+
+class PhaseProfiler:
+    """Records exclusive time and allocations per phase, patch and file.
+
+    The streaming pipeline nests phases as each step pulls from the one
+    before it: rendering pulls a report, analysis pulls a parsed file and
+    parsing pulls raw lines. Only the innermost active phase is charged, so
+    the phases of a run add up to its instrumented wall time.
+
+    Allocations are the net change in live memory blocks, or in traced bytes
+    when tracemalloc is tracing as the profiler is created; see
+    allocation_unit. on_file(patch_profile, file_profile) is called as each
+    file's record is complete.
+    """
+
+    __slots__ = (
+        "_current",
+        "_patch",
+        "_stack",
+        "allocation_unit",
+        "on_file",
+        "patches",
+        "run",
+    )
+
+    def __init__(self, on_file=None):
+        self.on_file = on_file
+        self.allocation_unit = "bytes" if tracemalloc.is_tracing() else "blocks"
+        self.patches = []
+        # Work outside any patch, such as report headers
+        self.run = FileProfile()
+        self._current = self.run
+        self._patch = None
+        self._stack = []
+
+    def _allocated(self):
+        if self.allocation_unit == "bytes":
+            return tracemalloc.get_traced_memory()[0]
+        return sys.getallocatedblocks()
+
+    def _charge(self, frame, now, allocated):
+        stats = self._current.phases[frame[0]]
+        stats.seconds += now - frame[1]
+        stats.allocations += allocated - frame[2]
+        if self.allocation_unit == "bytes":
+            stats.peak = max(stats.peak, tracemalloc.get_traced_memory()[1] - frame[2])
+            # The next phase segment measures its peak from here
+            tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Charge the time and allocations of the with block to phase name."""
+        now, allocated = time.perf_counter(), self._allocated()
+        if self._stack:
+            self._charge(self._stack[-1], now, allocated)
+        frame = [name, now, allocated]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            now, allocated = time.perf_counter(), self._allocated()
+            self._charge(self._stack.pop(), now, allocated)
+            if self._stack:
+                self._stack[-1][1:] = [now, allocated]
+
+    def timed(self, iterable, name):
+        """Yield the items of iterable, charging each step to phase name."""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _switch(self, record):
+        """Charge from now on to record, closing off the active phase's time."""
+        if self._stack:
+            now, allocated = time.perf_counter(), self._allocated()
+            self._charge(self._stack[-1], now, allocated)
+            self._stack[-1][1:] = [now, allocated]
+        self._current = record
+
+    @contextlib.contextmanager
+    def patch(self, patch_path):
+        """Charge the with block to a new PatchProfile for patch_path."""
+        self._patch = PatchProfile(patch_path)
+        self.patches.append(self._patch)
+        self._switch(self._patch.other)
+        try:
+            yield self._patch
+        finally:
+            self.end_file()
+            self._switch(self.run)
+            self._patch = None
+
+    def begin_file(self, path=None):
+        """Charge to a new file record of the current patch.
+
+        The path may be set later, once the file diff has been parsed.
+        """
+        self.end_file()
+        if self._patch is not None:
+            self._switch(FileProfile(path))
+
+    def end_file(self):
+        """Finish the current file record and charge to the patch again.
+
+        A record that never got a path is folded into the patch's other work.
+        """
+        record = self._current
+        patch = self._patch
+        if patch is None or record is patch.other:
+            return
+        self._switch(patch.other)
+        if record.path is None:
+            for phase, stats in record.phases.items():
+                patch.other.phases[phase].add(stats)
+            return
+        patch.files.append(record)
+        if self.on_file is not None:
+            self.on_file(patch, record)
+
+    def set_file_path(self, path):
+        """Name the current file record."""
+        if self._patch is not None:
+            self._current.path = path
+
+    def to_dict(self):
+        return {
+            "allocation_unit": self.allocation_unit,
+            "run": _phases_to_dict(self.run.phases),
+            "patches": [p.to_dict() for p in self.patches],
+        }
+
+
+def patch_scope(profiler, patch_path):
+    """Return profiler.patch(patch_path), or a null context without a profiler."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.patch(patch_path)
+
+
+@contextlib.contextmanager
+def profile_run(profiler, cprofile_path=None, tracemalloc_path=None):
+    """Profile the with block, charging it to the render base phase.
+
+    Time not spent in a nested phase is report rendering and output. With
+    cprofile_path the block also runs under cProfile and its stats are
+    dumped there; with tracemalloc_path a tracemalloc snapshot is dumped.
+    tracemalloc should be started before the profiler is created so that it
+    counts allocations in bytes.
+    """
+    cprofile = cProfile.Profile() if cprofile_path else None
+    if cprofile is not None:
+        cprofile.enable()
+    try:
+        with profiler.phase("render"):
+            yield profiler
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
+            cprofile.dump_stats(cprofile_path)
+        if tracemalloc_path and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(tracemalloc_path)
+
+
+def format_phases(phases, unit):
+    """Return the lines of a table of phase times and allocations."""
+    total = _total_seconds(phases) or 1.0
+    show_peak = unit == "bytes"
+    header = f"  {'phase':<10} {'seconds':>10} {'share':>7} {'net ' + unit:>14}"
+    lines = [header + (f" {'peak bytes':>14}" if show_peak else "")]
+    for phase, stats in phases.items():
+        line = (
+            f"  {phase:<10} {stats.seconds:10.4f} {stats.seconds / total:7.1%} "
+            f"{stats.allocations:14,d}"
+        )
+        lines.append(line + (f" {stats.peak:14,d}" if show_peak else ""))
+    return lines
+
+
+def format_profile(profiler):
+    """Return the text lines of a profile: per patch phases and slowest files."""
+    unit = profiler.allocation_unit
+    lines = ["=== Profile ===", ""]
+    for patch in profiler.patches:
+        lines.append(
+            f"Patch: {patch.patch} ({len(patch.files)} files, {patch.seconds:.4f}s)"
+        )
+        lines.extend(format_phases(patch.phases, unit))
+        slowest = sorted(patch.files, key=lambda f: f.seconds, reverse=True)
+        if slowest:
+            lines.append("  Slowest files:")
+        for record in slowest[:SLOWEST_FILES]:
+            phases = " ".join(
+                f"{phase}={stats.seconds:.4f}" for phase, stats in record.phases.items()
+            )
+            lines.append(f"    {record.seconds:.4f}s {record.path}: {phases}")
+        lines.append("")
+    lines.append("Outside patches:")
+    lines.extend(format_phases(profiler.run.phases, unit))
+    return lines
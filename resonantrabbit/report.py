@@ -0,0 +1,193 @@
+"""
+Structured results of patch analysis.
+Part of project resonantrabbit.
+"""
+
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass(slots=True)
+class EmptyLineEvent:
+    """An empty or whitespace-only line found in a hunk."""
+
+    line_type: str
+    source_line_no: int | None
+    target_line_no: int | None
+
+    def to_dict(self):
+        return {
+            "line_type": self.line_type,
+            "source_line_no": self.source_line_no,
+            "target_line_no": self.target_line_no,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+@dataclass(slots=True)
+class HunkReport:
+    """Header fields, empty line events and first lines of a hunk."""
+
+    source_start: int
+    source_length: int
+    target_start: int
+    target_length: int
+    section_header: str
+    empty_line_events: list = field(default_factory=list)
+    # (line_type, value) pairs of the first lines of the hunk
+    sample_lines: list = field(default_factory=list)
+    has_more_lines: bool = False
+
+    def to_dict(self):
+        return {
+            "source_start": self.source_start,
+            "source_length": self.source_length,
+            "target_start": self.target_start,
+            "target_length": self.target_length,
+            "section_header": self.section_header,
+            "empty_line_events": [e.to_dict() for e in self.empty_line_events],
+            "sample_lines": [list(line) for line in self.sample_lines],
+            "has_more_lines": self.has_more_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{
+            **data,
+            "empty_line_events": [
+                EmptyLineEvent.from_dict(e) for e in data["empty_line_events"]
+            ],
+            "sample_lines": [tuple(line) for line in data["sample_lines"]],
+        })
+
+
+@dataclass(slots=True)
+class FileReport:
+    """Analysis of a single file diff."""
+
+    path: str
+    source_file: str
+    target_file: str
+    is_added_file: bool
+    is_removed_file: bool
+    is_modified_file: bool
+    added: int = 0
+    removed: int = 0
+    hunks: list = field(default_factory=list)
+    empty_added: int = 0
+    empty_removed: int = 0
+
+    def to_dict(self):
+        # Written out field by field, as asdict deep-copies every value
+        return {
+            "path": self.path,
+            "source_file": self.source_file,
+            "target_file": self.target_file,
+            "is_added_file": self.is_added_file,
+            "is_removed_file": self.is_removed_file,
+            "is_modified_file": self.is_modified_file,
+            "added": self.added,
+            "removed": self.removed,
+            "hunks": [h.to_dict() for h in self.hunks],
+            "empty_added": self.empty_added,
+            "empty_removed": self.empty_removed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{
+            **data,
+            "hunks": [HunkReport.from_dict(h) for h in data["hunks"]],
+        })
+
+
+@dataclass(slots=True)
+class EmptyLineCount:
+    """Empty line counts of a file, all the empty line analysis needs."""
+
+    path: str
+    empty_added: int = 0
+    empty_removed: int = 0
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def from_summary(cls, summary):
+        """Return the counts of a FileReport or of another EmptyLineCount."""
+        return cls(summary.path, summary.empty_added, summary.empty_removed)
+
+
+@dataclass(slots=True)
+class RuleViolation:
+    """An added line breaking a whitespace rule, at its target line number."""
+
+    rule: str
+    path: str
+    line_no: int
+    message: str
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+@dataclass(slots=True)
+class PatchReport:
+    """Analysis of every file in a patch."""
+
+    files: list = field(default_factory=list)
+
+    @property
+    def empty_added(self):
+        return sum(f.empty_added for f in self.files)
+
+    @property
+    def empty_removed(self):
+        return sum(f.empty_removed for f in self.files)
+
+    def to_dict(self):
+        return {
+            "files": [f.to_dict() for f in self.files],
+            "total_empty_added": self.empty_added,
+            "total_empty_removed": self.empty_removed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(files=[FileReport.from_dict(f) for f in data["files"]])
+
+
+@dataclass(slots=True)
+class EmptyLineReport:
+    """Empty line counts of every file in a patch, all a printed analysis keeps."""
+
+    files: list = field(default_factory=list)
+
+    @property
+    def empty_added(self):
+        return sum(f.empty_added for f in self.files)
+
+    @property
+    def empty_removed(self):
+        return sum(f.empty_removed for f in self.files)
+
+    def to_dict(self):
+        return {
+            "files": [f.to_dict() for f in self.files],
+            "total_empty_added": self.empty_added,
+            "total_empty_removed": self.empty_removed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(files=[EmptyLineCount.from_dict(f) for f in data["files"]])
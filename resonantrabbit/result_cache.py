@@ -0,0 +1,218 @@
+"""
+Content-addressed on-disk cache of patch analysis results.
+Part of project resonantrabbit.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+
+import unidiff
+
+from . import main
+from .report import FileReport
+
+# Bump whenever the shape or meaning of file summaries changes, so results
+# computed by an older analyzer are never served again
+ANALYZER_VERSION = "4"
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Chunk size used when hashing patch files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Entries stored between two scans of the cache directory; a scan also picks
+# up the entries written by other processes sharing the directory
+SCAN_INTERVAL = 100
+
+ENTRY_SUFFIX = ".json"
+
+# Bytes read from the end of an entry to find its closing record
+TAIL_SIZE = 64
+
+
+def read_file_count(f):
+    """Return the number of files of an open entry from its closing record.
+
+    Only the end of the file is read, and f is left at its start; None is
+    returned for an entry that was cut short.
+    """
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, size - TAIL_SIZE))
+    tail = f.read()
+    f.seek(0)
+    try:
+        return json.loads(tail.splitlines()[-1])["files"]
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class ResultCache:
+    """FileReports of patches, stored as JSON under a hash of the patch bytes.
+
+    Entries live in a directory shared by every process using the cache. The
+    key covers the patch content, the analyzer version and the unidiff
+    version; entries hold one FileReport per line, closed by a record of
+    their number of files, and are written atomically. The size of the cache
+    is kept as a running total, and the least recently used entries are
+    evicted once it grows beyond max_bytes.
+
+    A cache made with evict=False only adds up the bytes it stores in
+    stored_bytes, for the process owning the running total to account().
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, evict=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evict_on_store = evict
+        # Unknown until the first scan of the directory
+        self.total_size = None
+        self.stored_since_scan = 0
+        self.stored_bytes = 0
+
+    def worker_copy(self):
+        """Return a copy of the cache that stores entries without evicting."""
+        return ResultCache(self.directory, self.max_bytes, evict=False)
+
+    def key_for_file(self, patch_file_path):
+        """Return the cache key of a patch file's content."""
+        digest = hashlib.sha256()
+        digest.update(f"{ANALYZER_VERSION}\0{unidiff.VERSION}\0".encode())
+        with open(patch_file_path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Return the cached FileReports for a key, or None on a miss."""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                count = read_file_count(f)
+                if count is None:
+                    return None
+                summaries = [
+                    FileReport.from_dict(json.loads(f.readline())) for _ in range(count)
+                ]
+            # Mark the entry as recently used for eviction
+            os.utime(entry_path)
+        except (FileNotFoundError, KeyError, TypeError, ValueError):
+            return None
+        return summaries
+
+    def put(self, key, summaries):
+        """Store FileReports under a key and evict old entries if needed."""
+        for _ in self._store(key, summaries):
+            pass
+
+    def _store(self, key, summaries):
+        """Yield FileReports as they are written to a new entry for a key.
+
+        The entry only appears once every summary has been written.
+        """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                count = 0
+                for summary in summaries:
+                    f.write(json.dumps(summary.to_dict()) + "\n")
+                    count += 1
+                    yield summary
+                f.write(json.dumps({"files": count}) + "\n")
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        if self.evict_on_store:
+            self.account(size)
+        else:
+            self.stored_bytes += size
+
+    def account(self, size):
+        """Add a new entry to the running total and evict if it may be too big.
+
+        A replaced entry is counted twice, which only brings the next scan
+        forward.
+        """
+        self.stored_since_scan += 1
+        if self.total_size is not None:
+            self.total_size += size
+        if (
+            self.total_size is None
+            or self.total_size > self.max_bytes
+            or self.stored_since_scan >= SCAN_INTERVAL
+        ):
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes.
+
+        Scans the whole cache directory and resets the running size total.
+        """
+        entries = []
+        total_size = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+        self.total_size = total_size
+        self.stored_since_scan = 0
+
+    def iter_patch_file(self, patch_file_path):
+        """Yield the FileReports of a patch, parsing it only on a miss.
+
+        Hits are read back one file at a time and misses are stored as they
+        are summarized, so neither holds the whole analysis in memory. An
+        entry that was cut short is a miss.
+        """
+        key = self.key_for_file(patch_file_path)
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                count = read_file_count(f)
+                if count is not None:
+                    for _ in range(count):
+                        yield FileReport.from_dict(json.loads(f.readline()))
+        except FileNotFoundError:
+            count = None
+        if count is not None:
+            # Mark the entry as recently used for eviction
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(entry_path)
+            return
+
+        yield from self._store(
+            key, map(main.summarize_file, main.stream_patch_from_file(patch_file_path))
+        )
+
+    def summarize_patch_file(self, patch_file_path):
+        """Return the FileReports of a patch, parsing it only on a miss."""
+        return list(self.iter_patch_file(patch_file_path))
@@ -0,0 +1,170 @@
+"""
+Whitespace policy rules checked in a single pass over patch lines.
+Part of project resonantrabbit.
+"""
+
+import re
+
+from . import scanner
+from .compressed import open_patch_input
+from .report import RuleViolation
+
+# Rules enabled by a bare --rules
+DEFAULT_RULES = "trailing-whitespace,whitespace-only,crlf,max-blank-run=2"
+
+# Rules decided by a pattern matched at the start of an added line's body,
+# with the message of a violation
+PATTERN_RULES = {
+    "trailing-whitespace": (rb"[^\n]*\S[ \t]+\r?\n?\Z", "trailing whitespace added"),
+    "crlf": (rb"[^\n]*\r\n\Z", "CRLF line ending added"),
+}
+
+# Indentation that breaks each indent style, on lines that are not blank
+INDENT_PATTERNS = {
+    "spaces": (rb"[ ]*\t[ \t]*\S", "tab in indentation, spaces expected"),
+    "tabs": (rb"\t*[ ][ \t]*\S", "space in indentation, tabs expected"),
+}
+
+LINE_ENDINGS = (b"", b"\n", b"\r\n")
+
+
+class RuleSet:
+    """Configured rules compiled into one check of each added line.
+
+    Every pattern rule becomes an optional lookahead of a single regular
+    expression, so one match tells which of them an added line breaks; the
+    blank line rules share one blank check. Adding rules does not add passes
+    over the patch or calls per line.
+    """
+
+    def __init__(
+        self,
+        trailing_whitespace=False,
+        whitespace_only=False,
+        crlf=False,
+        indent=None,
+        max_blank_run=None,
+    ):
+        if indent not in (None, *INDENT_PATTERNS):
+            raise ValueError(f"Unknown indent style: {indent!r}")
+        if max_blank_run is not None and max_blank_run < 0:
+            raise ValueError("max-blank-run must not be negative")
+        self.whitespace_only = whitespace_only
+        self.max_blank_run = max_blank_run
+
+        enabled = []
+        if trailing_whitespace:
+            enabled.append((
+                "trailing-whitespace",
+                *PATTERN_RULES["trailing-whitespace"],
+            ))
+        if crlf:
+            enabled.append(("crlf", *PATTERN_RULES["crlf"]))
+        if indent is not None:
+            enabled.append(("indent", *INDENT_PATTERNS[indent]))
+        # (rule, message) of each capturing group, in group order
+        self.pattern_rules = [(rule, message) for rule, _, message in enabled]
+        self.pattern = None
+        if enabled:
+            self.pattern = re.compile(
+                b"".join(b"(?:(?=(" + pattern + b")))?" for _, pattern, _ in enabled)
+            )
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a RuleSet from a spec such as "crlf,indent=spaces,max-blank-run=2".
+
+        Raises ValueError for unknown rules or bad values.
+        """
+        options = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            rule, _, value = item.partition("=")
+            if rule in ("trailing-whitespace", "whitespace-only", "crlf") and not value:
+                options[rule.replace("-", "_")] = True
+            elif rule == "indent" and value:
+                options["indent"] = value
+            elif rule == "max-blank-run" and value:
+                options["max_blank_run"] = int(value)
+            else:
+                raise ValueError(f"Unknown rule: {item!r}")
+        return cls(**options)
+
+    @property
+    def rules(self):
+        """Names of the enabled rules."""
+        names = [rule for rule, _ in self.pattern_rules]
+        if self.whitespace_only:
+            names.append("whitespace-only")
+        if self.max_blank_run is not None:
+            names.append("max-blank-run")
+        return names
+
+    def iter_violations(self, lines):
+        """Yield the RuleViolations of raw patch lines, in patch order.
+
+        Added lines are checked against every rule in one pass; violations
+        carry the target line number. Runs of blank lines are counted over
+        consecutive added lines and broken by context lines and hunk starts.
+        """
+        pattern = self.pattern
+        pattern_rules = self.pattern_rules
+        whitespace_only = self.whitespace_only
+        max_blank_run = self.max_blank_run
+        check_blank = whitespace_only or max_blank_run is not None
+
+        path = None
+        target_line_no = 0
+        blank_run = 0
+
+        for kind, line, value in scanner.classify_lines(lines):
+            if kind == scanner.ADDED:
+                body = line[1:]
+                if pattern is not None:
+                    match = pattern.match(body)
+                    if match.lastindex is not None:
+                        for (rule, message), group in zip(
+                            pattern_rules, match.groups()
+                        ):
+                            if group is not None:
+                                yield RuleViolation(rule, path, target_line_no, message)
+                if check_blank and scanner.is_blank(body):
+                    if whitespace_only and body not in LINE_ENDINGS:
+                        yield RuleViolation(
+                            "whitespace-only",
+                            path,
+                            target_line_no,
+                            "whitespace-only line added",
+                        )
+                    blank_run += 1
+                    if blank_run - 1 == max_blank_run:
+                        yield RuleViolation(
+                            "max-blank-run",
+                            path,
+                            target_line_no,
+                            f"more than {max_blank_run} consecutive blank lines added",
+                        )
+                else:
+                    blank_run = 0
+                target_line_no += 1
+            elif kind == scanner.CONTEXT:
+                blank_run = 0
+                target_line_no += 1
+            elif kind == scanner.HUNK:
+                path, (_, _, target_line_no, _, _) = value
+                blank_run = 0
+
+
+def check_patch_file(patch_path, rule_set):
+    """Yield the RuleViolations of a patch path, or standard input for "-".
+
+    Compressed patches are decompressed as they are read.
+    """
+    with open_patch_input(patch_path) as f:
+        yield from rule_set.iter_violations(f)
+
+
+def format_violation(violation):
+    """Return the text report line of a violation."""
+    return (
+        f"{violation.path}:{violation.line_no}: {violation.rule}: {violation.message}"
+    )
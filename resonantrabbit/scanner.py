@@ -0,0 +1,219 @@
+"""
+Parse-free scanner for empty line statistics in git patches.
+Part of project resonantrabbit.
+"""
+
+import re
+
+import unidiff
+from unidiff.constants import (
+    DEV_NULL,
+    RE_DIFF_GIT_HEADER,
+    RE_DIFF_GIT_HEADER_NO_PREFIX,
+    RE_DIFF_GIT_HEADER_URI_LIKE,
+    RE_HUNK_HEADER,
+    RE_SOURCE_FILENAME,
+    RE_TARGET_FILENAME,
+)
+
+# Every file diff in git output starts with this header
+DIFF_GIT_HEADER = b"diff --git "
+
+# First byte markers of hunk body lines
+ADDED = ord("+")
+REMOVED = ord("-")
+CONTEXT = ord(" ")
+NO_NEWLINE = ord("\\")
+# A bare newline inside a hunk is an empty context line
+BARE_NEWLINE = (ord("\n"), ord("\r"))
+
+# Leading bytes of whitespace that bytes.isspace() does not know about but
+# str.isspace() does: ASCII separators and the UTF-8 encoded Unicode spaces
+UNICODE_SPACE_LEADS = b"\x1c\x1d\x1e\x1f\xc2\xe1\xe2\xe3"
+
+# UTF-8 encodings of every character str.isspace() accepts (none is above
+# U+3000), so whitespace-only bodies can be matched without decoding them
+BLANK_BODY = re.compile(
+    b"(?:"
+    + b"|".join(
+        re.escape(chr(c).encode("utf-8")) for c in range(0x3001) if chr(c).isspace()
+    )
+    + b")*"
+)
+
+
+def is_blank(body):
+    """Return True if a raw line body is empty or whitespace-only.
+
+    Matches the str.strip() check used on parsed lines, including Unicode
+    whitespace, while only decoding the rare bodies that could contain it.
+    """
+    stripped = body.strip()
+    if not stripped:
+        return True
+    if stripped[0] not in UNICODE_SPACE_LEADS:
+        return False
+    return body.decode("utf-8", "replace").isspace()
+
+
+def is_blank_at(buffer, start, end):
+    """Return True if buffer[start:end] is blank, without copying it."""
+    return BLANK_BODY.fullmatch(buffer, start, end) is not None
+
+
+def file_path(source_file, target_file):
+    """Return the path unidiff reports for a file with these headers."""
+    return unidiff.PatchedFile(source=source_file, target=target_file).path
+
+
+def parse_diff_git_header(line):
+    """Return the source and target files named by a "diff --git" line."""
+    text = line.decode("utf-8")
+    match = (
+        RE_DIFF_GIT_HEADER.match(text)
+        or RE_DIFF_GIT_HEADER_URI_LIKE.match(text)
+        or RE_DIFF_GIT_HEADER_NO_PREFIX.match(text)
+    )
+    if match is None:
+        raise unidiff.UnidiffParseError(f"Invalid diff header: {text}")
+    return match.group("source"), match.group("target")
+
+
+def parse_hunk_header(line):
+    """Return the hunk header fields of a raw "@@" line.
+
+    The fields are (source_start, source_length, target_start, target_length,
+    section_header); None is returned when the line is not a hunk header.
+    """
+    match = RE_HUNK_HEADER.match(line.decode("utf-8"))
+    if match is None:
+        return None
+    source_start, source_length, target_start, target_length, section = match.groups()
+    return (
+        int(source_start),
+        1 if source_length is None else int(source_length),
+        int(target_start),
+        1 if target_length is None else int(target_length),
+        section,
+    )
+
+
+# Kinds of classified lines besides the body markers: a hunk header, and the
+# end of a file diff, which has no line of its own
+HUNK = "hunk"
+FILE_END = "file end"
+
+
+def classify_lines(lines):
+    """Yield (kind, line, value) for the hunk lines of raw patch lines.
+
+    Hunk body lines are classified by their first byte and yield that marker
+    as kind, with bare newlines as CONTEXT, and None as value. A hunk header
+    yields HUNK with (path, header fields) as value, and every file diff ends
+    with FILE_END, its path as value and None as line. File headers, and text
+    between file diffs, are read without being yielded. Only file and hunk
+    headers are decoded, and hunk lengths are checked like unidiff does.
+    """
+    source_file = None
+    target_file = None
+    path = None
+    pending_source = None
+    in_git_header = False
+    source_left = 0
+    target_left = 0
+
+    for line in lines:
+        if source_left > 0 or target_left > 0:
+            marker = line[0] if line else None
+            if marker == ADDED:
+                target_left -= 1
+            elif marker == REMOVED:
+                source_left -= 1
+            elif marker == CONTEXT or marker in BARE_NEWLINE:
+                marker = CONTEXT
+                source_left -= 1
+                target_left -= 1
+            elif marker != NO_NEWLINE:
+                raise unidiff.UnidiffParseError(f"Hunk diff line expected: {line!r}")
+            if source_left < 0 or target_left < 0:
+                raise unidiff.UnidiffParseError("Hunk is longer than expected")
+            yield marker, line, None
+            continue
+
+        if line.startswith(DIFF_GIT_HEADER):
+            if source_file is not None:
+                yield FILE_END, None, path or file_path(source_file, target_file)
+            source_file, target_file = parse_diff_git_header(line)
+            path = None
+            in_git_header = True
+        elif line.startswith(b"@@ "):
+            header = parse_hunk_header(line)
+            if header is None:
+                continue
+            if source_file is None:
+                raise unidiff.UnidiffParseError(f"Unexpected hunk found: {line!r}")
+            if path is None:
+                path = file_path(source_file, target_file)
+            _, source_left, _, target_left, _ = header
+            in_git_header = False
+            yield HUNK, line, (path, header)
+        elif in_git_header and line.startswith(b"new file mode "):
+            source_file = DEV_NULL
+        elif in_git_header and line.startswith(b"deleted file mode "):
+            target_file = DEV_NULL
+        elif line.startswith(b"--- ") and not in_git_header:
+            # A plain unified diff starts a new file at its source header
+            match = RE_SOURCE_FILENAME.match(line.decode("utf-8"))
+            if match is not None:
+                if source_file is not None:
+                    yield FILE_END, None, path or file_path(source_file, target_file)
+                source_file = None
+                pending_source = match.group("filename")
+        elif line.startswith(b"+++ ") and source_file is None:
+            match = RE_TARGET_FILENAME.match(line.decode("utf-8"))
+            if match is not None and pending_source is not None:
+                source_file = pending_source
+                target_file = match.group("filename")
+                path = None
+                pending_source = None
+
+    if source_left > 0 or target_left > 0:
+        raise unidiff.UnidiffParseError("Hunk is shorter than expected")
+    if source_file is not None:
+        yield FILE_END, None, path or file_path(source_file, target_file)
+
+
+def iter_empty_line_counts(lines):
+    """Yield per-file empty line counts from raw patch lines without parsing.
+
+    Hunk bodies are classified by classify_lines. Each item is an
+    EmptyLineCount, which print_empty_line_analysis renders like a full
+    FileReport.
+    """
+    # Imported here and below so that the pre-commit hook, which only needs
+    # the line helpers, does not pay for loading them
+    from .report import EmptyLineCount
+
+    empty_added = 0
+    empty_removed = 0
+    for kind, line, value in classify_lines(lines):
+        if kind == ADDED:
+            if is_blank(line[1:]):
+                empty_added += 1
+        elif kind == REMOVED:
+            if is_blank(line[1:]):
+                empty_removed += 1
+        elif kind == FILE_END:
+            yield EmptyLineCount(value, empty_added, empty_removed)
+            empty_added = empty_removed = 0
+
+
+def scan_empty_lines(patch_file_path):
+    """Stream per-file empty line counts from a patch file on disk.
+
+    Compressed patches are decompressed as they are read.
+    """
+    from .compressed import open_patch_input
+
+    with open_patch_input(patch_file_path) as f:
+        yield from iter_empty_line_counts(f)
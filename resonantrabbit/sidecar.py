@@ -0,0 +1,405 @@
+"""
+Persistent sidecar index (.patch.idx) for random access into large patches.
+Part of project resonantrabbit.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from dataclasses import asdict, dataclass
+
+from . import lazy, mapped, scanner
+
+INDEX_SUFFIX = ".idx"
+MAGIC = b"RRPIDX\0\0"
+FORMAT_VERSION = 1
+
+# Magic, format version, patch size, patch mtime (ns), file count, hunk
+# count, string table size and SHA-256 of the patch
+HEADER = struct.Struct("<8sIQqQQQ32s")
+# Offset of the patch mtime in the header, updated when only the mtime changed
+MTIME_OFFSET = struct.calcsize("<8sIQ")
+# Byte range, first hunk and hunk count, added, removed, empty added and
+# empty removed lines, then the path, source and target file in the string
+# table (offset and lengths) and the added/removed file flags
+FILE_RECORD = struct.Struct("<9Q3IB")
+# Byte range from the hunk header, patch line number of the header, source
+# and target start, source and target length, and the line counters
+HUNK_RECORD = struct.Struct("<5Q6I")
+
+ADDED_FILE = 1
+REMOVED_FILE = 2
+
+
+class StaleIndexError(Exception):
+    """Raised when a sidecar index no longer matches its patch."""
+
+
+@dataclass(slots=True)
+class FileStats:
+    """Precomputed statistics of one file diff, read from the index."""
+
+    path: str
+    source_file: str
+    target_file: str
+    is_added_file: bool
+    is_removed_file: bool
+    added: int
+    removed: int
+    empty_added: int
+    empty_removed: int
+    hunk_count: int
+    start: int
+    end: int
+
+    @property
+    def is_modified_file(self):
+        return not (self.is_added_file or self.is_removed_file)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def format_file_stats(stats):
+    """Return the lines reporting the FileStats of one file diff."""
+    return [
+        f"File: {stats.path}",
+        f"  Source file: {stats.source_file}",
+        f"  Target file: {stats.target_file}",
+        f"  Is added file: {stats.is_added_file}",
+        f"  Is removed file: {stats.is_removed_file}",
+        f"  Is modified file: {stats.is_modified_file}",
+        f"  Added lines: {stats.added}",
+        f"  Removed lines: {stats.removed}",
+        f"  Number of hunks: {stats.hunk_count}",
+        f"  Empty lines added: {stats.empty_added}",
+        f"  Empty lines removed: {stats.empty_removed}",
+        "",
+    ]
+
+
+def index_path_for(patch_file_path):
+    """Return the sidecar index path of a patch: the patch path plus ".idx"."""
+    return patch_file_path + INDEX_SUFFIX
+
+
+def _hunk_counts(hunk, buffer):
+    """Return the added, removed, empty added and empty removed line counts."""
+    counts = [0, 0, 0, 0]
+    offsets = hunk.line_offsets
+    for i, line_type in enumerate(hunk.line_types):
+        if line_type == mapped.ADDED:
+            counts[0] += 1
+            if scanner.is_blank_at(buffer, offsets[i] + 1, offsets[i + 1]):
+                counts[2] += 1
+        elif line_type == mapped.REMOVED:
+            counts[1] += 1
+            if scanner.is_blank_at(buffer, offsets[i] + 1, offsets[i + 1]):
+                counts[3] += 1
+    return counts
+
+
+def _build_tables(buffer):
+    """Return the file table, hunk table and string table of a patch buffer."""
+    files = bytearray()
+    hunks = bytearray()
+    strings = bytearray()
+    hunk_count = 0
+
+    for mapped_file in mapped.iter_mapped_files(buffer):
+        first_hunk = hunk_count
+        file_counts = [0, 0, 0, 0]
+        for hunk in mapped_file.hunks:
+            counts = _hunk_counts(hunk, buffer)
+            file_counts = [a + b for a, b in zip(file_counts, counts)]
+            end = (
+                hunk.line_offsets[-1]
+                if len(hunk)
+                else buffer.find(b"\n", hunk.start) + 1
+            )
+            hunks += HUNK_RECORD.pack(
+                hunk.start,
+                end,
+                hunk.diff_line_no,
+                hunk.source_start,
+                hunk.target_start,
+                hunk.source_length,
+                hunk.target_length,
+                *counts,
+            )
+            hunk_count += 1
+
+        names = [
+            name.encode("utf-8")
+            for name in (
+                mapped_file.path,
+                mapped_file.source_file,
+                mapped_file.target_file,
+            )
+        ]
+        flags = (ADDED_FILE if mapped_file.is_added_file else 0) | (
+            REMOVED_FILE if mapped_file.is_removed_file else 0
+        )
+        files += FILE_RECORD.pack(
+            mapped_file.start,
+            mapped_file.end,
+            first_hunk,
+            hunk_count - first_hunk,
+            *file_counts,
+            len(strings),
+            *map(len, names),
+            flags,
+        )
+        strings += b"".join(names)
+
+    return files, hunks, strings, hunk_count
+
+
+def build_index(patch_file_path, index_file_path=None):
+    """Scan a patch once and write its sidecar index; returns the index path.
+
+    The index is written to a temporary file and moved into place, so readers
+    never see a partial index.
+    """
+    index_file_path = index_file_path or index_path_for(patch_file_path)
+
+    with open(patch_file_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = b""
+        try:
+            digest = hashlib.sha256(buffer).digest()
+            files, hunks, strings, hunk_count = _build_tables(buffer)
+        finally:
+            if stat.st_size:
+                buffer.close()
+
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        stat.st_size,
+        stat.st_mtime_ns,
+        len(files) // FILE_RECORD.size,
+        hunk_count,
+        len(strings),
+        digest,
+    )
+    directory = os.path.dirname(os.path.abspath(index_file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        # Readable by whoever can read the patch
+        os.fchmod(fd, stat.st_mode & 0o666)
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(files)
+            f.write(hunks)
+            f.write(strings)
+        os.replace(temp_path, index_file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return index_file_path
+
+
+def _file_digest(patch_file_path):
+    """Return the SHA-256 of a patch file."""
+    with open(patch_file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").digest()
+
+
+class PatchIndex:
+    """Read side of a sidecar index, answering queries without a full parse.
+
+    File and hunk records have a fixed size, so they are read straight from
+    the mapped index; hunk lines are read from the patch by seeking to the
+    recorded byte range.
+    """
+
+    def __init__(self, patch_file_path, index_file_path=None):
+        self.patch_file_path = patch_file_path
+        self.index_file_path = index_file_path or index_path_for(patch_file_path)
+        with open(self.index_file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise StaleIndexError(f"Truncated index: {self.index_file_path}")
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            self.patch_size,
+            self.patch_mtime_ns,
+            self.file_count,
+            self.hunk_count,
+            strings_size,
+            self.patch_digest,
+        ) = HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise StaleIndexError(f"Not a version {FORMAT_VERSION} index")
+
+        self._hunks_offset = HEADER.size + self.file_count * FILE_RECORD.size
+        self._strings_offset = self._hunks_offset + self.hunk_count * HUNK_RECORD.size
+        if len(self._data) != self._strings_offset + strings_size:
+            self.close()
+            raise StaleIndexError(f"Truncated index: {self.index_file_path}")
+        self._paths = None
+
+    def close(self):
+        """Release the mapped index."""
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.file_count
+
+    def is_stale(self, verify_hash=False):
+        """Return True if the patch changed since the index was built.
+
+        A different size means stale. When the size and mtime match, the
+        index is trusted unless verify_hash is set; otherwise the patch is
+        hashed, so a patch that was only touched or copied keeps its index
+        (open_index then records the new mtime).
+        """
+        stat = os.stat(self.patch_file_path)
+        if stat.st_size != self.patch_size:
+            return True
+        if stat.st_mtime_ns == self.patch_mtime_ns and not verify_hash:
+            return False
+        return _file_digest(self.patch_file_path) != self.patch_digest
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._data[start : start + length].decode("utf-8")
+
+    def file_stats(self, file_index):
+        """Return the FileStats of the file diff at a position in the patch."""
+        if not 0 <= file_index < self.file_count:
+            raise IndexError(file_index)
+        (
+            start,
+            end,
+            _,
+            hunk_count,
+            added,
+            removed,
+            empty_added,
+            empty_removed,
+            strings,
+            path_len,
+            source_len,
+            target_len,
+            flags,
+        ) = FILE_RECORD.unpack_from(
+            self._data, HEADER.size + file_index * FILE_RECORD.size
+        )
+        return FileStats(
+            path=self._string(strings, path_len),
+            source_file=self._string(strings + path_len, source_len),
+            target_file=self._string(strings + path_len + source_len, target_len),
+            is_added_file=bool(flags & ADDED_FILE),
+            is_removed_file=bool(flags & REMOVED_FILE),
+            added=added,
+            removed=removed,
+            empty_added=empty_added,
+            empty_removed=empty_removed,
+            hunk_count=hunk_count,
+            start=start,
+            end=end,
+        )
+
+    def __iter__(self):
+        for file_index in range(self.file_count):
+            yield self.file_stats(file_index)
+
+    def find(self, path):
+        """Return the position of the first file diff of a path, or None."""
+        if self._paths is None:
+            self._paths = {}
+            for file_index in range(self.file_count):
+                record = FILE_RECORD.unpack_from(
+                    self._data, HEADER.size + file_index * FILE_RECORD.size
+                )
+                self._paths.setdefault(self._string(record[8], record[9]), file_index)
+        return self._paths.get(path)
+
+    def stats_for_path(self, path):
+        """Return the FileStats of a path, or None if the patch lacks it."""
+        file_index = self.find(path)
+        return None if file_index is None else self.file_stats(file_index)
+
+    def hunk(self, path, hunk_number):
+        """Parse hunk number hunk_number (from 1) of a path's file diff.
+
+        Only the bytes of that hunk are read from the patch. Returns a unidiff
+        Hunk; raises KeyError for unknown paths and IndexError for hunks
+        the file does not have.
+        """
+        file_index = self.find(path)
+        if file_index is None:
+            raise KeyError(path)
+        record = FILE_RECORD.unpack_from(
+            self._data, HEADER.size + file_index * FILE_RECORD.size
+        )
+        first_hunk, hunk_count = record[2], record[3]
+        if not 1 <= hunk_number <= hunk_count:
+            raise IndexError(hunk_number)
+
+        start, end, diff_line_no, *header = HUNK_RECORD.unpack_from(
+            self._data,
+            self._hunks_offset + (first_hunk + hunk_number - 1) * HUNK_RECORD.size,
+        )
+        with open(self.patch_file_path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+        source_start, target_start, source_length, target_length = header[:4]
+        lazy_hunk = lazy.LazyHunk(
+            data,
+            source_start,
+            source_length,
+            target_start,
+            target_length,
+            "",
+            0,
+            diff_line_no,
+        )
+        lazy_hunk.end = len(data)
+        return lazy_hunk.materialize()
+
+
+def _store_patch_mtime(index_file_path, mtime_ns):
+    """Record a new patch mtime in an index whose content is still valid."""
+    with open(index_file_path, "r+b") as f:
+        f.seek(MTIME_OFFSET)
+        f.write(struct.pack("<q", mtime_ns))
+
+
+def open_index(patch_file_path, index_file_path=None, verify_hash=False):
+    """Open the sidecar index of a patch, building it if missing or stale."""
+    index_file_path = index_file_path or index_path_for(patch_file_path)
+    try:
+        index = PatchIndex(patch_file_path, index_file_path)
+    except (FileNotFoundError, StaleIndexError):
+        index = None
+
+    if index is not None:
+        stale = index.is_stale(verify_hash)
+        mtime_ns = os.stat(patch_file_path).st_mtime_ns
+        if not stale and mtime_ns == index.patch_mtime_ns:
+            return index
+        index.close()
+        if not stale:
+            _store_patch_mtime(index_file_path, mtime_ns)
+            return PatchIndex(patch_file_path, index_file_path)
+
+    build_index(patch_file_path, index_file_path)
+    return PatchIndex(patch_file_path, index_file_path)
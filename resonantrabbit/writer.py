@@ -0,0 +1,122 @@
+"""
+Buffered text sink for large reports, with an optional gzip stream.
+Part of project resonantrabbit.
+"""
+
+import gzip
+import sys
+
+# Text collected before it is encoded and handed to the sink in one write
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# "buffer" writes only when the buffer fills up, "block" after every block of
+# text the renderers write (one per file diff), so a reader on the other end
+# of a pipe sees progress
+FLUSH_POLICIES = ("buffer", "block")
+
+# zlib's default level; gzip's own default of 9 costs far more time than it
+# saves space on report text
+GZIP_LEVEL = 6
+
+
+def write_lines(out, lines):
+    """Write lines as one block of text to out, or to standard output."""
+    (sys.stdout if out is None else out).write("\n".join(lines) + "\n")
+
+
+class ReportWriter:
+    """Text stream that batches report output into few large writes.
+
+    Renderers write whole blocks of text; they are joined, encoded and passed
+    to the binary sink once buffer_size characters have accumulated, at the
+    points chosen by the flush policy, and on flush() or close().
+    """
+
+    __slots__ = (
+        "_chunks",
+        "_pending",
+        "buffer_size",
+        "encoding",
+        "flush_policy",
+        "sink",
+    )
+
+    def __init__(
+        self,
+        sink,
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        flush_policy="buffer",
+        encoding="utf-8",
+    ):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy: {flush_policy!r}")
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.flush_policy = flush_policy
+        self.encoding = encoding
+        self._chunks = []
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, text):
+        """Buffer text, writing it out once the buffer is full."""
+        self._chunks.append(text)
+        self._pending += len(text)
+        if self._pending >= self.buffer_size or self.flush_policy == "block":
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        """Write all buffered text to the sink and flush it."""
+        if self._chunks:
+            self.sink.write("".join(self._chunks).encode(self.encoding))
+            self._chunks = []
+            self._pending = 0
+        self.sink.flush()
+
+    def close(self):
+        """Flush the buffered text and close the sink.
+
+        Standard output is flushed but left open.
+        """
+        self.flush()
+        if self.sink is not sys.stdout.buffer:
+            self.sink.close()
+
+
+def open_report_writer(
+    path=None,
+    compress=False,
+    buffer_size=DEFAULT_BUFFER_SIZE,
+    flush_policy=None,
+):
+    """Open a ReportWriter on a file path, or on standard output for None.
+
+    With compress, or for paths ending in ".gz", the output is gzip
+    compressed as it is written. Without an explicit flush policy, output
+    to a terminal is flushed after every block and anything else only
+    when the buffer fills up.
+    """
+    compress = compress or (path is not None and path.endswith(".gz"))
+    if path is None:
+        sys.stdout.flush()
+        sink = sys.stdout.buffer
+        if flush_policy is None:
+            flush_policy = "block" if sink.isatty() else "buffer"
+        if compress:
+            sink = gzip.GzipFile(
+                fileobj=sink, mode="wb", filename="", compresslevel=GZIP_LEVEL
+            )
+    elif compress:
+        sink = gzip.open(path, "wb", compresslevel=GZIP_LEVEL)  # noqa: SIM115 - owned by the writer
+    else:
+        sink = open(path, "wb")  # noqa: SIM115 - owned by the writer
+
+    return ReportWriter(
+        sink, buffer_size=buffer_size, flush_policy=flush_policy or "buffer"
+    )
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Differential tests of the in-memory patch applier against git apply.
+Part of project resonantrabbit.
+"""
+
+import os
+import random
+import subprocess
+
+import pytest
+
+from resonantrabbit import applier
+
+NUMBERED = "".join(f"line {i}\n" for i in range(1, 31))
+
+
+def git(directory, *args, data=None, check=True):
+    """Run a git command in directory and return the completed process."""
+    return subprocess.run(
+        ["git", *args], cwd=directory, input=data, check=check, capture_output=True
+    )
+
+
+def write_tree(directory, files):
+    """Write a tree of path to bytes mappings into directory."""
+    for path, content in files.items():
+        full_path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(content)
+
+
+def encode_tree(files):
+    """Return a tree with text content encoded, as the applier takes it."""
+    return {
+        path: content if isinstance(content, bytes) else content.encode()
+        for path, content in files.items()
+    }
+
+
+@pytest.fixture
+def make_patch(tmp_path):
+    """Return a function diffing two trees with git in a scratch repository."""
+    counter = iter(range(10**6))
+
+    def make_patch(original, modified, *diff_args):
+        repo = tmp_path / f"diff{next(counter)}"
+        repo.mkdir()
+        git(repo, "init", "-q")
+        write_tree(repo, encode_tree(original))
+        git(repo, "add", "-A")
+        git(
+            repo,
+            "-c",
+            "user.name=T",
+            "-c",
+            "user.email=t@e",
+            "commit",
+            "-q",
+            "--allow-empty",
+            "-m",
+            "Original",
+        )
+        for path in original:
+            os.remove(repo / path)
+        write_tree(repo, encode_tree(modified))
+        git(repo, "add", "-A")
+        return git(repo, "diff", "--cached", *diff_args).stdout
+
+    return make_patch
+
+
+@pytest.fixture
+def apply_both(tmp_path):
+    """Return a function applying a patch to a tree with git apply and with
+    the in-memory applier, returning both outcomes."""
+    counter = iter(range(10**6))
+
+    def apply_both(patch, files, *apply_args):
+        files = encode_tree(files)
+        directory = tmp_path / f"apply{next(counter)}"
+        directory.mkdir()
+        write_tree(directory, files)
+        result = git(directory, "apply", *apply_args, data=patch, check=False)
+        git_tree = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                full_path = os.path.join(root, name)
+                with open(full_path, "rb") as f:
+                    git_tree[os.path.relpath(full_path, directory)] = f.read()
+
+        tree = dict(files)
+        try:
+            applier.apply_patch(
+                applier.parse_patch(patch),
+                tree,
+                unidiff_zero="--unidiff-zero" in apply_args,
+            )
+            applied = True
+        except applier.PatchApplyError:
+            applied = False
+        return (result.returncode == 0, git_tree), (applied, tree)
+
+    return apply_both
+
+
+class TestApplier:
+    """Test suite for the applier on patches git apply accepts or refuses."""
+
+    def check_same(self, apply_both, patch, files, *apply_args, applies=None):
+        """Check that both appliers agree, and on whether the patch applies."""
+        from_git, in_memory = apply_both(patch, files, *apply_args)
+        assert in_memory == from_git
+        if applies is not None:
+            assert in_memory[0] is applies
+        return in_memory[1]
+
+    def test_git_apply_integration(self, make_patch, apply_both):
+        """Test the changes of test_git_apply_integration."""
+        original = {
+            "example.py": 'def hello():\n    print("Hello, World!")\ndef goodbye():\n'
+            '    print("Goodbye!")\n\ndef main():\n    hello()\n    goodbye()\n',
+            "config.txt": "# Configuration file\nsetting1=value1\n\nsetting2=value2\n"
+            "\nsetting3=value3\n",
+        }
+        modified = {
+            "example.py": 'def hello():\n    print("Hello, World!")\n\n'
+            'def goodbye():\n    print("Goodbye!")\n    \n    # Added some spacing\n'
+            "def main():\n    hello() \n    goodbye()\n",
+            "config.txt": "# Configuration file\nsetting1=value1\nsetting2=value2\n"
+            "setting3=value3\n",
+            "newfile.md": "# New File\n\nThis is a new markdown file.\n",
+        }
+        patch = make_patch(original, modified)
+        tree = self.check_same(apply_both, patch, original, applies=True)
+        assert tree == encode_tree(modified)
+
+    def test_offset_and_context_mismatch(self, make_patch, apply_both):
+        """Test hunks found at an offset, and refused when context differs."""
+        modified = NUMBERED.replace("line 10\n", "line ten\n").replace(
+            "line 25\n", "line 25\nline 25b\n"
+        )
+        patch = make_patch({"n.txt": NUMBERED}, {"n.txt": modified})
+
+        shifted = NUMBERED.replace("line 5\n", "line 5\nx\ny\n")
+        self.check_same(apply_both, patch, {"n.txt": shifted}, applies=True)
+        shifted_down = NUMBERED.replace("line 20\n", "")
+        self.check_same(apply_both, patch, {"n.txt": shifted_down}, applies=True)
+        mismatch = NUMBERED.replace("line 9\n", "line nine\n")
+        self.check_same(apply_both, patch, {"n.txt": mismatch}, applies=False)
+
+    def test_beginning_and_end_of_file(self, make_patch, apply_both):
+        """Test hunks without leading or trailing context, which must match at
+        the start or the end of the file."""
+        modified = "first\n" + NUMBERED + "last\n"
+        patch = make_patch({"n.txt": NUMBERED}, {"n.txt": modified})
+
+        self.check_same(apply_both, patch, {"n.txt": NUMBERED}, applies=True)
+        self.check_same(apply_both, patch, {"n.txt": "x\n" + NUMBERED}, applies=False)
+        self.check_same(apply_both, patch, {"n.txt": NUMBERED + "x\n"}, applies=False)
+
+    @pytest.mark.parametrize(
+        "original, modified",
+        [
+            ("a\nb", "a\nb\n"),
+            ("a\nb\n", "a\nb"),
+            ("a\nb", "a\nc"),
+            ("a\nb", "a\nb\nc"),
+            ("", "a"),
+            ("a", ""),
+        ],
+    )
+    def test_no_newline_at_end_of_file(
+        self, make_patch, apply_both, original, modified
+    ):
+        """Test changes to and around a last line without a newline."""
+        patch = make_patch({"f.txt": original}, {"f.txt": modified})
+        tree = self.check_same(apply_both, patch, {"f.txt": original}, applies=True)
+        assert tree == {"f.txt": modified.encode()}
+        self.check_same(apply_both, patch, {"f.txt": original + "\n"})
+
+    def test_new_and_deleted_files(self, make_patch, apply_both):
+        """Test creating an existing file and deleting a changed one."""
+        patch = make_patch({"old.txt": "a\nb\n"}, {"new.txt": "n\n"})
+
+        self.check_same(apply_both, patch, {"old.txt": "a\nb\n"}, applies=True)
+        self.check_same(
+            apply_both, patch, {"old.txt": "a\nb\n", "new.txt": "n\n"}, applies=False
+        )
+        self.check_same(apply_both, patch, {"old.txt": "a\nb\nc\n"}, applies=False)
+        self.check_same(apply_both, patch, {}, applies=False)
+
+    def test_empty_files(self, make_patch, apply_both):
+        """Test new and deleted empty files, and emptying a file."""
+        patch = make_patch(
+            {"gone.txt": "", "kept.txt": "a\n"}, {"new.txt": "", "kept.txt": ""}
+        )
+        tree = self.check_same(
+            apply_both, patch, {"gone.txt": "", "kept.txt": "a\n"}, applies=True
+        )
+        assert tree == {"new.txt": b"", "kept.txt": b""}
+        self.check_same(apply_both, patch, {"gone.txt": "x", "kept.txt": "a\n"})
+
+    def test_crlf_and_bytes(self, make_patch, apply_both):
+        """Test CRLF endings, bare CRs and bytes that are not UTF-8."""
+        original = {"dos.txt": "a\r\nb\r\n", "raw.bin.txt": b"\xff\xfe\rx\n"}
+        modified = {"dos.txt": "a\r\nc\r\n", "raw.bin.txt": b"\xff\xfe\ry\n"}
+        patch = make_patch(original, modified, "--text")
+        tree = self.check_same(apply_both, patch, original, applies=True)
+        assert tree == encode_tree(modified)
+        self.check_same(
+            apply_both, patch, {**original, "dos.txt": "a\nb\n"}, applies=False
+        )
+
+    def test_rename(self, make_patch, apply_both):
+        """Test a renamed and changed file."""
+        patch = make_patch({"old.txt": NUMBERED}, {"new.txt": NUMBERED + "x\n"}, "-M")
+        assert b"rename from old.txt" in patch
+        tree = self.check_same(apply_both, patch, {"old.txt": NUMBERED}, applies=True)
+        assert tree == {"new.txt": (NUMBERED + "x\n").encode()}
+        self.check_same(
+            apply_both, patch, {"old.txt": NUMBERED, "new.txt": "y\n"}, applies=False
+        )
+
+    @pytest.mark.parametrize("apply_args", [(), ("--unidiff-zero",)])
+    def test_zero_context(self, make_patch, apply_both, apply_args):
+        """Test -U0 hunks with and without --unidiff-zero."""
+        modified = NUMBERED.replace("line 12\n", "line 12\nadded\n")
+        patch = make_patch({"n.txt": NUMBERED}, {"n.txt": modified}, "-U0")
+        self.check_same(apply_both, patch, {"n.txt": NUMBERED}, *apply_args)
+
+    def test_overlapping_hunks(self, apply_both):
+        """Test that a hunk does not match lines written by an earlier one."""
+        patch = (
+            b"diff --git a/f.txt b/f.txt\n"
+            b"--- a/f.txt\n"
+            b"+++ b/f.txt\n"
+            b"@@ -1,3 +1,3 @@\n"
+            b" a\n"
+            b"-b\n"
+            b"+c\n"
+            b" z\n"
+            b"@@ -4,3 +4,3 @@\n"
+            b" a\n"
+            b"-c\n"
+            b"+d\n"
+            b" z\n"
+        )
+        self.check_same(apply_both, patch, {"f.txt": "a\nb\nz\nq\n"}, applies=False)
+        self.check_same(
+            apply_both, patch, {"f.txt": "a\nb\nz\na\nc\nz\n"}, applies=True
+        )
+
+    def test_atomic(self, make_patch, apply_both):
+        """Test that a failing file diff leaves every file unchanged."""
+        original = {"a.txt": "a\n", "b.txt": "b\n"}
+        patch = make_patch(original, {"a.txt": "A\n", "b.txt": "B\n"})
+        tree = self.check_same(
+            apply_both, patch, {**original, "b.txt": "other\n"}, applies=False
+        )
+        assert tree == encode_tree({**original, "b.txt": "other\n"})
+
+    @pytest.mark.parametrize("seed", range(8))
+    def test_random_patches(self, make_patch, apply_both, seed):
+        """Test random patches on their tree and on randomly changed trees."""
+        rng = random.Random(seed)
+        original = {}
+        for i in range(4):
+            lines = [f"{rng.choice(['a', 'b', 'c', ''])}{i}.{n}\n" for n in range(40)]
+            original[f"dir{i % 2}/f{i}.txt"] = "".join(lines)
+        modified = {}
+        for path, content in original.items():
+            lines = content.splitlines(True)
+            for _ in range(rng.randrange(0, 8)):
+                n = rng.randrange(len(lines))
+                edit = rng.randrange(3)
+                if edit == 0:
+                    lines.insert(n, f"new {n}\n")
+                elif edit == 1:
+                    lines[n] = f"changed {n}\n"
+                elif len(lines) > 1:
+                    del lines[n]
+            if rng.random() < 0.2:
+                lines[-1] = lines[-1].rstrip("\n")
+            if rng.random() < 0.1:
+                continue
+            modified[path] = "".join(lines)
+        if rng.random() < 0.5:
+            modified["added.txt"] = "added\n"
+        context = f"-U{rng.choice([1, 2, 3, 5])}"
+        patch = make_patch(original, modified, context)
+
+        tree = self.check_same(apply_both, patch, original, applies=True)
+        assert tree == encode_tree(modified)
+        for _ in range(6):
+            changed = dict(original)
+            path = rng.choice(sorted(changed))
+            lines = changed[path].splitlines(True)
+            n = rng.randrange(len(lines))
+            edit = rng.randrange(4)
+            if edit == 0:
+                lines[n:n] = ["inserted\n"] * rng.randrange(1, 4)
+            elif edit == 1:
+                lines[n] = "conflict\n"
+            elif edit == 2:
+                del lines[n]
+            else:
+                lines.append("appended\n")
+            changed[path] = "".join(lines)
+            self.check_same(apply_both, patch, changed)
+
+
+class TestOverlayTree:
+    """Test suite for a directory with in-memory changes."""
+
+    def test_apply_to_overlay(self, tmp_path, make_patch):
+        """Test that the overlay holds the changes and the directory does not."""
+        original = {"a.txt": "a\n", "sub/b.txt": "b\n", "gone.txt": "g\n"}
+        modified = {"a.txt": "A\n", "sub/b.txt": "b\n", "new.txt": "n\n"}
+        patch = make_patch(original, modified)
+        root = tmp_path / "root"
+        write_tree(root, encode_tree(original))
+
+        tree = applier.OverlayTree(str(root))
+        changes = applier.apply_patch(applier.parse_patch(patch), tree)
+
+        assert changes == {"a.txt": b"A\n", "gone.txt": None, "new.txt": b"n\n"}
+        assert dict(tree) == encode_tree(modified)
+        assert "gone.txt" not in tree
+        assert (root / "gone.txt").read_text() == "g\n"
+        assert (root / "a.txt").read_text() == "a\n"
+        with pytest.raises(KeyError):
+            del tree["gone.txt"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
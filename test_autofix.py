@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Tests for the rewriter removing whitespace-only changes from patches.
+Part of project resonantrabbit.
+"""
+
+import io
+import itertools
+import os
+import random
+import subprocess
+import tempfile
+
+import pytest
+import unidiff
+
+from resonantrabbit import applier, autofix, main
+
+ORIGINAL = {
+    "example.py": 'def hello():\n    print("Hello, World!")\ndef goodbye():\n'
+    '    print("Goodbye!")\n\ndef main():\n    hello()\n    goodbye()\n',
+    "config.txt": "# Configuration file\nsetting1=value1\n\nsetting2=value2\n\n"
+    "setting3=value3\n",
+}
+
+# The lines of a longer file, for patches with several hunks
+NUMBERED = "".join(f"line {i}\n" for i in range(1, 41))
+
+
+def git(repo, *args, data=None):
+    """Run a git command in repo and return its standard output."""
+    return subprocess.run(
+        ["git", *args], cwd=repo, input=data, check=True, capture_output=True
+    ).stdout
+
+
+def write_files(repo, files):
+    """Write files into repo; None deletes a file."""
+    for name, content in files.items():
+        path = os.path.join(repo, name)
+        if content is None:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            with open(path, "w", newline="") as f:
+                f.write(content)
+
+
+def read_files(repo, names):
+    """Return the content of files in repo, None for missing ones."""
+    files = {}
+    for name in names:
+        path = os.path.join(repo, name)
+        if os.path.exists(path):
+            with open(path, newline="") as f:
+                files[name] = f.read()
+        else:
+            files[name] = None
+    return files
+
+
+def fix(patch):
+    """Return the fixed patch of patch bytes."""
+    return b"".join(autofix.iter_fixed_lines(io.BytesIO(patch)))
+
+
+def patch_lines(content):
+    """Return the lines of a file as unidiff gives them, with a newline after
+    a last line that has none."""
+    if not content:
+        return []
+    return (content if content.endswith("\n") else content + "\n").splitlines(True)
+
+
+def significant_lines(content):
+    """Return the lines of a file without blank lines and trailing whitespace."""
+    return [line.rstrip() for line in content.splitlines() if line.strip()]
+
+
+def check_positions(patch, source_files, target_files):
+    """Check that the lines of every hunk are where its header says, in the
+    files before and after the patch."""
+    for patched_file in unidiff.PatchSet(patch.decode("utf-8")):
+        source = patch_lines(source_files.get(patched_file.path))
+        target = patch_lines(target_files.get(patched_file.path))
+        for hunk in patched_file:
+            start = hunk.source_start - 1 if hunk.source_length else 0
+            assert source[start : start + hunk.source_length] == [
+                line.value for line in hunk.source_lines()
+            ]
+            start = hunk.target_start - 1 if hunk.target_length else 0
+            assert target[start : start + hunk.target_length] == [
+                line.value for line in hunk.target_lines()
+            ]
+
+
+class TestAutofix:
+    """Test suite for fixed patches applied with git apply."""
+
+    @pytest.fixture
+    def temp_git_repo(self):
+        """Create a temporary git repository."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            git(temp_dir, "init", "-q")
+            git(temp_dir, "config", "user.email", "test@example.com")
+            git(temp_dir, "config", "user.name", "Test User")
+            yield temp_dir
+
+    def apply_fixed(self, repo, original, modified, *diff_args):
+        """Commit original, diff it against modified, and git apply the fixed
+        diff to original; returns the fixed patch.
+
+        The in-memory applier must give the same files as git apply.
+        """
+        write_files(repo, original)
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "--allow-empty", "-m", "Original")
+        write_files(repo, modified)
+        git(repo, "add", "-A")
+        patch = git(repo, "diff", "--cached", *diff_args)
+        git(repo, "reset", "-q", "--hard")
+
+        fixed = fix(patch)
+        git(repo, "apply", "--check", data=fixed)
+        git(repo, "apply", data=fixed)
+
+        tree = {name: content.encode() for name, content in original.items()}
+        applier.apply_patch(applier.parse_patch(fixed), tree)
+        names = {*original, *modified}
+        assert {name: content.decode() for name, content in tree.items()} == {
+            name: content
+            for name, content in read_files(repo, names).items()
+            if content is not None
+        }
+        return fixed
+
+    def test_git_apply_integration(self, temp_git_repo):
+        """Test the changes of test_git_apply_integration without their noise."""
+        modified = {
+            "example.py": 'def hello():\n    print("Hello, World!")\n\n'
+            'def goodbye():\n    print("Goodbye!")\n    \n    # Added some spacing\n'
+            "def main():\n    hello() \n    goodbye()\n",
+            "config.txt": "# Configuration file\nsetting1=value1\nsetting2=value2\n"
+            "setting3=value3\n",
+            "newfile.md": "# New File\n\nThis is a new markdown file.\n\n"
+            "It has some empty lines.\n",
+        }
+        fixed = self.apply_fixed(temp_git_repo, ORIGINAL, modified)
+
+        expected = {
+            "example.py": 'def hello():\n    print("Hello, World!")\ndef goodbye():\n'
+            '    print("Goodbye!")\n\n    # Added some spacing\ndef main():\n'
+            "    hello()\n    goodbye()\n",
+            "config.txt": ORIGINAL["config.txt"],
+            "newfile.md": modified["newfile.md"],
+        }
+        assert read_files(temp_git_repo, expected) == expected
+        # Nothing but blank lines changed in config.txt
+        assert b"config.txt" not in fixed
+        check_positions(fixed, ORIGINAL, expected)
+
+    def test_hunk_headers_recomputed(self, temp_git_repo):
+        """Test target line numbers of later hunks after dropped lines."""
+        lines = NUMBERED.splitlines(True)
+        modified = lines[:]
+        modified[2:2] = ["\n", "\n", "added 1\n"]
+        modified[14] = "line 12   \n"
+        modified[24:26] = ["replaced\n"]
+        modified[35:35] = ["\n"]
+        original = {"numbers.txt": NUMBERED}
+        fixed = self.apply_fixed(
+            temp_git_repo, original, {"numbers.txt": "".join(modified)}
+        )
+
+        expected = lines[:]
+        expected[2:2] = ["added 1\n"]
+        expected[22:24] = ["replaced\n"]
+        expected = {"numbers.txt": "".join(expected)}
+        assert read_files(temp_git_repo, expected) == expected
+        check_positions(fixed, original, expected)
+
+    @pytest.mark.parametrize("context", ["-U0", "-U1", "-U3"])
+    def test_context_sizes(self, temp_git_repo, context):
+        """Test fixed patches of diffs with little or no context."""
+        original = {"numbers.txt": NUMBERED}
+        modified = NUMBERED.replace("line 5\n", "line 5 \n\n").replace(
+            "line 9\n", "\nline 9\nline 9b\n"
+        )
+        write_files(temp_git_repo, original)
+        git(temp_git_repo, "add", "-A")
+        git(temp_git_repo, "commit", "-q", "-m", "Original")
+        write_files(temp_git_repo, {"numbers.txt": modified})
+        patch = git(temp_git_repo, "diff", context)
+        git(temp_git_repo, "checkout", "-q", ".")
+
+        fixed = fix(patch)
+        git(temp_git_repo, "apply", "--unidiff-zero", data=fixed)
+        expected = {"numbers.txt": NUMBERED.replace("line 9\n", "line 9\nline 9b\n")}
+        assert read_files(temp_git_repo, expected) == expected
+        check_positions(fixed, original, expected)
+
+    def test_no_newline_at_end_of_file(self, temp_git_repo):
+        """Test that end-of-file newline changes are kept and the marker follows
+        its line."""
+        original = {"a.txt": "one\ntwo", "b.txt": "one\ntwo  ", "c.txt": "x\ny\n"}
+        modified = {"a.txt": "one \ntwo\n", "b.txt": "one\ntwo", "c.txt": "x \ny"}
+        fixed = self.apply_fixed(temp_git_repo, original, modified)
+
+        expected = {"a.txt": "one\ntwo\n", "b.txt": "one\ntwo  ", "c.txt": "x\ny"}
+        assert read_files(temp_git_repo, expected) == expected
+        assert b"b.txt" not in fixed
+        check_positions(fixed, original, expected)
+
+    def test_new_and_deleted_files_verbatim(self, temp_git_repo):
+        """Test that new and deleted files are kept line for line."""
+        original = {"old.txt": "a \n\n\nb\n", "keep.txt": "k\n"}
+        modified = {"old.txt": None, "new.txt": "x  \n\n\ty\n"}
+        fixed = self.apply_fixed(temp_git_repo, original, modified)
+
+        expected = {"old.txt": None, "new.txt": "x  \n\n\ty\n", "keep.txt": "k\n"}
+        assert read_files(temp_git_repo, expected) == expected
+        assert b"+x  \n+\n+\ty\n" in fixed
+        assert b"-a \n-\n-\n-b\n" in fixed
+
+    def test_rename_and_crlf(self, temp_git_repo):
+        """Test a renamed file with only noise, and CRLF endings kept."""
+        original = {"old.txt": "a\nb\nc\nd\ne\n", "dos.txt": "a\r\nb\r\n"}
+        modified = {
+            "old.txt": None,
+            "renamed.txt": "a\nb \nc\nd\ne\n",
+            "dos.txt": "a \r\nb\n",
+        }
+        fixed = self.apply_fixed(temp_git_repo, original, modified, "-M")
+
+        expected = {
+            "old.txt": None,
+            "renamed.txt": original["old.txt"],
+            "dos.txt": "a\r\nb\n",
+        }
+        assert read_files(temp_git_repo, expected) == expected
+        assert b"rename from old.txt\nrename to renamed.txt\n" in fixed
+        assert b"@@" not in fixed.split(b"diff --git a/old.txt")[1]
+
+    def test_random_edits(self, temp_git_repo):
+        """Test random edits: the fixed patch applies, and its result differs
+        from the edited file in blank lines and trailing whitespace only."""
+        rng = random.Random(24)
+        words = ["alpha", "beta", "  gamma", "\tdelta", ""]
+        original = {
+            f"f{i}.txt": "".join(f"{rng.choice(words)}{i}-{n}\n" for n in range(60))
+            for i in range(4)
+        }
+        modified = {}
+        for name, content in original.items():
+            lines = content.splitlines(True)
+            for _ in range(12):
+                n = rng.randrange(len(lines))
+                edit = rng.randrange(5)
+                if edit == 0:
+                    lines.insert(n, rng.choice(["\n", "  \n", "\t\n"]))
+                elif edit == 1:
+                    lines[n] = lines[n][:-1] + rng.choice([" ", "\t", "  "]) + "\n"
+                elif edit == 2:
+                    lines[n] = f"changed {n}\n"
+                elif edit == 3:
+                    lines[n] = rng.choice(["\n", " \n"])
+                else:
+                    del lines[n]
+            modified[name] = "".join(lines)
+        fixed = self.apply_fixed(temp_git_repo, original, modified)
+
+        result = read_files(temp_git_repo, original)
+        check_positions(fixed, original, result)
+        for name in original:
+            assert significant_lines(result[name]) == significant_lines(modified[name])
+        # Fixing the result's own diff changes nothing
+        git(temp_git_repo, "add", "-A")
+        diff = git(temp_git_repo, "diff", "--cached")
+        assert fix(diff) == diff
+
+    def test_long_run(self, temp_git_repo):
+        """Test that a long run of repeated lines is paired up in full."""
+        original = {"long.txt": "".join(f"x{n % 3}\n\n" for n in range(10000))}
+        lines = original["long.txt"].splitlines(True)
+        modified_lines = [line[:-1] + " \n" for line in lines]
+        modified_lines[10000] = "changed\n"
+        modified = {"long.txt": "".join(modified_lines)}
+
+        fixed = self.apply_fixed(temp_git_repo, original, modified)
+
+        changes = [
+            line for line in fixed.splitlines(True)[4:] if line.startswith((b"-", b"+"))
+        ]
+        assert changes == [b"-x2\n", b"+changed\n"]
+        assert read_files(temp_git_repo, original)["long.txt"] == "".join(
+            lines[:10000] + ["changed\n"] + lines[10001:]
+        )
+
+    def test_plain_unified_diff(self):
+        """Test a diff -u style patch without git headers."""
+        patch = (
+            b"--- a.txt.orig\n"
+            b"+++ a.txt\n"
+            b"@@ -1,3 +1,4 @@ section\n"
+            b" a\n"
+            b"+\n"
+            b"-b\n"
+            b"+B\n"
+            b" c\n"
+            b"--- b.txt.orig\n"
+            b"+++ b.txt\n"
+            b"@@ -1 +1 @@\n"
+            b"-x\n"
+            b"+x \n"
+        )
+        assert fix(patch) == (
+            b"--- a.txt.orig\n+++ a.txt\n@@ -1,3 +1,3 @@ section\n a\n-b\n+B\n c\n"
+        )
+
+    def test_text_between_files_is_kept(self):
+        """Test that text around file diffs, as in mailed patches, is kept."""
+        patch = (
+            b"Subject: [PATCH] Tidy\n"
+            b"\n"
+            b"diff --git a/x b/x\n"
+            b"--- a/x\n"
+            b"+++ b/x\n"
+            b"@@ -1 +1 @@\n"
+            b"-x\n"
+            b"+x\t\n"
+            b"-- \n"
+            b"2.43.0\n"
+        )
+        assert fix(patch) == b"Subject: [PATCH] Tidy\n\n-- \n2.43.0\n"
+
+    def test_streaming(self):
+        """Test that fixed lines are produced before the input is read."""
+
+        def endless_patch():
+            yield from [b"diff --git a/x b/x\n", b"--- a/x\n", b"+++ b/x\n"]
+            for start in itertools.count(1, 2):
+                yield f"@@ -{start},2 +{start},2 @@\n".encode()
+                yield from [b" a\n", b"-b\n", b"+B\n"]
+
+        lines = endless_patch()
+        fixed = autofix.iter_fixed_lines(lines)
+        assert list(itertools.islice(fixed, 8)) == [
+            b"diff --git a/x b/x\n",
+            b"--- a/x\n",
+            b"+++ b/x\n",
+            b"@@ -1,2 +1,2 @@\n",
+            b" a\n",
+            b"-b\n",
+            b"+B\n",
+            b"@@ -3,2 +3,2 @@\n",
+        ]
+
+    def test_truncated_hunk(self):
+        """Test that a hunk shorter than its header is a parse error."""
+        with pytest.raises(unidiff.UnidiffParseError):
+            fix(b"diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1,2 +1,2 @@\n-x\n")
+
+    def test_command_line(self, tmp_path):
+        """Test --fix on the checked-in patch, to standard output and a file."""
+        patch_path = os.path.join("testdata", "empty_lines.patch")
+        with open(patch_path, "rb") as f:
+            expected = fix(f.read())
+
+        output = tmp_path / "fixed.patch"
+        assert main.main([patch_path, "--fix", "--output", str(output)]) == 0
+        assert output.read_bytes() == expected
+        assert b"hello() " not in expected
+        assert b"+    # Added some spacing\n" in expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
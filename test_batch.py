@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for batch analysis of patch directories.
+Part of project resonantrabbit.
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from resonantrabbit import batch, main
+
+
+class TestBatchAnalysis:
+    """Test suite for the batch mode."""
+
+    @pytest.fixture
+    def patch_dir(self, tmp_path):
+        """Create a directory holding copies of the testdata patches."""
+        for i in range(6):
+            for name in ["empty_lines.patch", "simple.patch"]:
+                shutil.copy(os.path.join("testdata", name), tmp_path / f"{i}-{name}")
+        (tmp_path / "notes.txt").write_text("not a patch\n")
+        return tmp_path
+
+    def test_expand_directory_and_glob(self, patch_dir):
+        """Test that directories and globs expand to patch files only."""
+        from_dir = list(batch.expand_patch_paths([str(patch_dir)]))
+        from_glob = list(batch.expand_patch_paths([str(patch_dir / "*-simple.patch")]))
+
+        assert len(from_dir) == 12
+        assert all(p.endswith(".patch") for p in from_dir)
+        assert len(from_glob) == 6
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_results_cover_every_patch(self, patch_dir, executor):
+        """Test that every patch is analyzed exactly once."""
+        paths = list(batch.expand_patch_paths([str(patch_dir)]))
+
+        results = list(
+            batch.iter_batch_results(paths, max_workers=2, executor=executor)
+        )
+
+        assert sorted(r["patch"] for r in results) == paths
+        for result in results:
+            expected = (
+                (4, 3) if result["patch"].endswith("empty_lines.patch") else (0, 0)
+            )
+            assert (result["empty_added"], result["empty_removed"]) == expected
+
+    def test_in_flight_work_is_bounded(self, patch_dir):
+        """Test that paths are only pulled as earlier results are consumed."""
+        paths = list(batch.expand_patch_paths([str(patch_dir)]))
+        pulled = []
+
+        def pull_paths():
+            for path in paths:
+                pulled.append(path)
+                yield path
+
+        max_in_flight = 0
+        for consumed, _ in enumerate(
+            batch.iter_batch_results(
+                pull_paths(), max_workers=2, executor="thread", max_in_flight=3
+            ),
+            1,
+        ):
+            max_in_flight = max(max_in_flight, len(pulled) - consumed + 1)
+
+        assert len(pulled) == len(paths)
+        assert max_in_flight <= 4
+
+    def test_command_line_totals(self, patch_dir, capsys):
+        """Test that the batch report ends with the combined totals."""
+        assert main.main(["--batch", str(patch_dir), "--executor", "thread"]) == 0
+
+        out = capsys.readouterr().out
+        assert out.endswith(
+            "Total across all patches:\n"
+            "  Empty lines added: 24\n"
+            "  Empty lines removed: 18\n\n"
+        )
+
+    def test_unmatched_patterns_are_errors(self, patch_dir, tmp_path, capsys):
+        """Test that a missing directory or an empty glob is an error."""
+        missing = str(tmp_path / "nonexistent")
+
+        assert main.main(["--batch", missing]) == 1
+        assert main.main(["--batch", str(patch_dir), str(patch_dir / "*.diff")]) == 1
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert f"No patch files match: {missing}" in captured.err
+        assert "*.diff" in captured.err
+
+    def test_bad_patch_is_reported(self, patch_dir, capsys):
+        """Test that a broken patch is reported without stopping the batch."""
+        (patch_dir / "broken.patch").write_text(
+            "diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1,3 +1,3 @@\n-only\n"
+        )
+
+        status = main.main(["--batch", str(patch_dir), "--format", "ndjson"])
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert status == 1
+        assert records[-1]["errors"] == 1
+        assert records[-1]["patches"] == 12
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
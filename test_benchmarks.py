@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipeline benchmark harness and its regression gate.
+Part of project resonantrabbit.
+"""
+
+import json
+
+import pytest
+
+from benchmarks import bench_pipeline
+
+
+def result(seconds, peak_bytes):
+    return {
+        "lines": 1000,
+        "seconds": seconds,
+        "lines_per_second": 1,
+        "peak_bytes": peak_bytes,
+    }
+
+
+class TestPipelineBenchmark:
+    """Test suite for baselines and regression detection."""
+
+    def test_find_regressions(self):
+        """Test that only changes beyond the thresholds are reported."""
+        baseline = {"medium": {"analyze_patch": result(1.0, 1000)}}
+
+        def regressions(seconds, peak_bytes):
+            return bench_pipeline.find_regressions(
+                {"medium": {"analyze_patch": result(seconds, peak_bytes)}},
+                baseline,
+                time_threshold=0.25,
+                memory_threshold=0.10,
+            )
+
+        assert regressions(1.2, 1090) == []
+        assert regressions(0.5, 500) == []
+        assert len(regressions(1.3, 1000)) == 1
+        assert "peak_bytes" in regressions(1.0, 1200)[0]
+        assert len(regressions(2.0, 2000)) == 2
+        assert (
+            bench_pipeline.find_regressions(
+                {"huge": {"analyze_patch": result(9.0, 9000)}}, baseline, 0.25, 0.10
+            )
+            == []
+        )
+
+    def test_small_time_changes_are_noise(self):
+        """Test that millisecond slowdowns never fail the gate."""
+        baseline = {"small": {"analyze_patch": result(0.001, 1000)}}
+
+        assert (
+            bench_pipeline.find_regressions(
+                {"small": {"analyze_patch": result(0.004, 1000)}}, baseline, 0.25, 0.1
+            )
+            == []
+        )
+
+    def test_save_and_compare_baseline(self, tmp_path, capsys):
+        """Test a small run saved as a baseline and checked against it."""
+        baseline_path = tmp_path / "baselines" / "pipeline.json"
+        arguments = [
+            "--sizes",
+            "small",
+            "--repeat",
+            "1",
+            "--baseline",
+            str(baseline_path),
+        ]
+
+        assert bench_pipeline.main_benchmark([*arguments, "--save-baseline"]) == 0
+        stored = json.loads(baseline_path.read_text())
+        assert set(stored["results"]["small"]) == {
+            name for name, _, _ in bench_pipeline.CASES
+        }
+        for case in stored["results"]["small"].values():
+            assert case["lines"] >= bench_pipeline.SIZES["small"]
+            assert case["peak_bytes"] > 0
+
+        # Shrink the stored memory so the next run is a regression
+        for case in stored["results"]["small"].values():
+            case["peak_bytes"] //= 4
+        baseline_path.write_text(json.dumps(stored))
+        capsys.readouterr()
+
+        assert bench_pipeline.main_benchmark(arguments) == 1
+        assert "REGRESSION small load_patch_from_file" in capsys.readouterr().err
+
+    def test_missing_baseline(self, tmp_path, capsys):
+        """Test that comparing without a baseline fails with a hint."""
+        arguments = ["--sizes", "small", "--repeat", "1"]
+
+        assert (
+            bench_pipeline.main_benchmark([
+                *arguments,
+                "--baseline",
+                str(tmp_path / "none.json"),
+            ])
+            == 1
+        )
+        assert "--save-baseline" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar NumPy representation of patches.
+Part of project resonantrabbit.
+"""
+
+import os
+
+import pytest
+
+from resonantrabbit import main
+from test_scanner import generate_patch
+
+np = pytest.importorskip("numpy")
+columnar = pytest.importorskip("resonantrabbit.columnar")
+
+
+def unidiff_rows(patch_file):
+    """Return one (type, source, target, file, hunk, blank) row per line."""
+    rows = []
+    for file_index, file_patch in enumerate(main.stream_patch_from_file(patch_file)):
+        for hunk_index, hunk in enumerate(file_patch):
+            for line in hunk:
+                rows.append((
+                    ord(line.line_type) if line.line_type else columnar.EMPTY,
+                    -1 if line.source_line_no is None else line.source_line_no,
+                    -1 if line.target_line_no is None else line.target_line_no,
+                    file_index,
+                    hunk_index,
+                    line.value.strip() == "",
+                ))
+    return rows
+
+
+def column_rows(columns):
+    """Return the rows of the columnar arrays in the unidiff_rows layout."""
+    return list(
+        zip(
+            columns["line_type"].tolist(),
+            columns["source_line_no"].tolist(),
+            columns["target_line_no"].tolist(),
+            columns["file_index"].tolist(),
+            columns["hunk_index"].tolist(),
+            columns["is_blank"].tolist(),
+        )
+    )
+
+
+class TestColumnar:
+    """Test suite comparing the columnar arrays with unidiff objects."""
+
+    @pytest.mark.parametrize(
+        "patch_name", ["empty_lines.patch", "generated_test.patch", "simple.patch"]
+    )
+    def test_columns_match_unidiff_on_testdata(self, patch_name):
+        """Test that every line of the shipped patches becomes one row."""
+        patch_file = os.path.join("testdata", patch_name)
+
+        columns = columnar.load_columns(patch_file)
+
+        assert column_rows(columns) == unidiff_rows(patch_file)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_columns_match_unidiff_on_generated_patches(self, seed, tmp_path):
+        """Test the columns on generated patches with tricky whitespace."""
+        patch_file = tmp_path / "generated.patch"
+        patch_file.write_bytes(b"".join(generate_patch(seed)))
+
+        columns = columnar.load_columns(str(patch_file))
+
+        assert column_rows(columns) == unidiff_rows(str(patch_file))
+
+    def test_blank_detection_across_chunks(self, tmp_path, monkeypatch):
+        """Test that blank flags are right when lines span several chunks."""
+        monkeypatch.setattr(columnar, "BLANK_CHUNK_SIZE", 64)
+        patch_file = tmp_path / "generated.patch"
+        patch_file.write_bytes(b"".join(generate_patch(3)))
+
+        columns = columnar.load_columns(str(patch_file))
+
+        assert column_rows(columns) == unidiff_rows(str(patch_file))
+
+    def test_count_empty_lines_report(self, capsys):
+        """Test that the vectorized counts render the usual report."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+        main.demonstrate_empty_line_detection(main.stream_patch_from_file(patch_file))
+        expected = capsys.readouterr().out
+
+        columns = columnar.load_columns(patch_file)
+        main.print_empty_line_analysis(columnar.count_empty_lines(columns))
+
+        assert capsys.readouterr().out == expected
+
+    def test_empty_patch(self, tmp_path):
+        """Test that an empty patch gives empty columns."""
+        patch_file = tmp_path / "empty.patch"
+        patch_file.write_bytes(b"")
+
+        columns = columnar.load_columns(str(patch_file))
+
+        assert columns["paths"] == []
+        assert len(columns["line_type"]) == 0
+        assert columnar.count_empty_lines(columns) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for compact line records in the analysis path.
+Part of project resonantrabbit.
+"""
+
+import os
+import tracemalloc
+
+import pytest
+import unidiff
+
+from resonantrabbit import compact, corpus, main
+from test_scanner import generate_patch
+
+
+def line_fields(line):
+    """Return the fields of a line that the analysis and reports read."""
+    return (
+        line.line_type,
+        line.source_line_no,
+        line.target_line_no,
+        line.diff_line_no,
+        line.value,
+        str(line),
+    )
+
+
+def parse_with_unidiff(patch_file):
+    """Parse a patch from its raw lines, keeping CRLF line endings."""
+    with open(patch_file, "rb") as f:
+        return unidiff.PatchSet(f, encoding="utf-8")
+
+
+class TestCompactPatchSet:
+    """Test suite comparing compact line records with unidiff Lines."""
+
+    @pytest.fixture(
+        params=[f"seed{seed}" for seed in range(6)]
+        + ["plain", "empty_lines.patch", "generated_test.patch", "simple.patch"]
+    )
+    def patch_file(self, request, tmp_path):
+        """Return a shipped patch or write a generated one."""
+        if request.param.endswith(".patch"):
+            return os.path.join("testdata", request.param)
+        path = tmp_path / "generated.patch"
+        if request.param == "plain":
+            path.write_bytes(b"".join(generate_patch(6, git_headers=False)))
+        else:
+            path.write_bytes(b"".join(generate_patch(int(request.param[4:]))))
+        return str(path)
+
+    def test_lines_match_unidiff(self, patch_file):
+        """Test that every compact line reads like the unidiff Line."""
+        expected = parse_with_unidiff(patch_file)
+
+        with compact.CompactPatchSet.from_filename(patch_file) as patch_set:
+            assert len(patch_set) == len(expected)
+            for patched_file, expected_file in zip(patch_set, expected, strict=True):
+                assert patched_file.path == expected_file.path
+                for hunk, expected_hunk in zip(
+                    patched_file, expected_file, strict=True
+                ):
+                    assert len(hunk) == len(expected_hunk)
+                    assert (hunk.added, hunk.removed) == (
+                        expected_hunk.added,
+                        expected_hunk.removed,
+                    )
+                    assert list(map(line_fields, hunk)) == list(
+                        map(line_fields, expected_hunk)
+                    )
+
+    def test_analysis_matches_unidiff(self, patch_file, capsys):
+        """Test that both analyses give the same reports and output."""
+        expected = parse_with_unidiff(patch_file)
+        expected_analysis = main.analyze_patch(expected)
+        expected_detection = main.demonstrate_empty_line_detection(expected)
+        expected_output = capsys.readouterr().out
+
+        with compact.CompactPatchSet.from_filename(patch_file) as patch_set:
+            assert main.analyze_patch(patch_set) == expected_analysis
+            assert main.demonstrate_empty_line_detection(patch_set) == (
+                expected_detection
+            )
+            assert main.build_patch_report(patch_set) == (
+                main.build_patch_report(expected)
+            )
+            # The generic summarizer reads the same values through CompactLines
+            assert [main.summarize_file(f) for f in patch_set] == (
+                main.build_patch_report(expected).files
+            )
+        assert capsys.readouterr().out == expected_output
+
+    def test_indexing(self):
+        """Test indexing and slicing the lines of a hunk."""
+        patch_set = compact.CompactPatchSet(
+            b"--- a/x\n+++ b/x\n@@ -1,2 +1,2 @@\n-old\n+new\n \n"
+        )
+        hunk = patch_set[0][0]
+
+        assert [str(line) for line in hunk[1:]] == ["+new\n", " \n"]
+        assert hunk[-1].source_line_no == 2
+        assert hunk[-1].target_line_no == 2
+        assert hunk[0].is_removed
+        with pytest.raises(IndexError):
+            hunk[3]
+
+    def test_empty_patch(self, tmp_path):
+        """Test that an empty patch file gives an empty patch set."""
+        patch_file = tmp_path / "empty.patch"
+        patch_file.write_bytes(b"")
+
+        with compact.CompactPatchSet.from_filename(str(patch_file)) as patch_set:
+            assert len(patch_set) == 0
+            assert main.analyze_patch(patch_set, render=False).files == []
+
+    def test_smaller_than_unidiff(self, tmp_path):
+        """Test that compact lines take a fraction of the unidiff objects."""
+        patch_file = tmp_path / "corpus.patch"
+        corpus.write_corpus(str(patch_file), corpus.CorpusSpec(target_lines=20000))
+
+        def retained(load):
+            tracemalloc.start()
+            try:
+                patch_set = load(str(patch_file))
+                return tracemalloc.get_traced_memory()[0], patch_set
+            finally:
+                tracemalloc.stop()
+
+        unidiff_bytes, _ = retained(main.load_patch_from_file)
+        compact_bytes, patch_set = retained(compact.CompactPatchSet.from_filename)
+        with patch_set:
+            assert compact_bytes < unidiff_bytes / 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for transparently decompressed patch input.
+Part of project resonantrabbit.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+from resonantrabbit import batch, compressed, corpus, main
+
+PATCH_FILE = os.path.join("testdata", "empty_lines.patch")
+
+COMPRESSORS = {
+    "gzip": (gzip.compress, ".gz"),
+    "bz2": (bz2.compress, ".bz2"),
+    "xz": (lzma.compress, ".xz"),
+}
+if compressed.zstd is not None:
+    COMPRESSORS["zstd"] = (compressed.zstd.compress, ".zst")
+elif compressed.zstandard is not None:
+    COMPRESSORS["zstd"] = (compressed.zstandard.ZstdCompressor().compress, ".zst")
+
+
+def read_patch(patch_file):
+    """Return the raw bytes of a patch file."""
+    with open(patch_file, "rb") as f:
+        return f.read()
+
+
+class TestCompressedInput:
+    """Test suite for compressed patch files and standard input."""
+
+    @pytest.fixture(params=sorted(COMPRESSORS))
+    def compressed_file(self, request, tmp_path):
+        """Write the test patch compressed in each available format."""
+        compress, suffix = COMPRESSORS[request.param]
+        path = tmp_path / f"empty_lines.patch{suffix}"
+        path.write_bytes(compress(read_patch(PATCH_FILE)))
+        return request.param, str(path)
+
+    def test_detect_compression(self, compressed_file):
+        """Test that each format is recognized by its magic bytes."""
+        name, path = compressed_file
+        assert compressed.file_compression(path) == name
+        assert compressed.file_compression(PATCH_FILE) is None
+        assert compressed.detect_compression(b"") is None
+
+    def test_load_and_stream(self, compressed_file):
+        """Test that compressed patches parse like the plain patch."""
+        _, path = compressed_file
+        expected = main.load_patch_from_file(PATCH_FILE)
+
+        assert str(main.load_patch_from_file(path)) == str(expected)
+        assert [str(f) for f in main.stream_patch_from_file(path)] == [
+            str(f) for f in expected
+        ]
+
+    def test_command_line(self, compressed_file, capsys):
+        """Test that every report format is unchanged by compression."""
+        _, path = compressed_file
+        for output_format in ("text", "json", "ndjson"):
+            assert main.main([PATCH_FILE, "--format", output_format]) == 0
+            expected = capsys.readouterr().out.replace(PATCH_FILE, "PATCH")
+            assert main.main([path, "--format", output_format]) == 0
+            assert capsys.readouterr().out.replace(path, "PATCH") == expected
+
+        assert main.main([PATCH_FILE, "--profile"]) == 0
+        expected = capsys.readouterr().out
+        assert main.main([path, "--profile"]) == 0
+        assert capsys.readouterr().out == expected
+
+    def test_stdin(self, compressed_file, capsys, monkeypatch):
+        """Test that compressed standard input is decompressed."""
+        _, path = compressed_file
+        main.main([PATCH_FILE])
+        expected = capsys.readouterr().out
+
+        monkeypatch.setattr(
+            sys, "stdin", io.TextIOWrapper(io.BytesIO(read_patch(path)))
+        )
+        assert main.main(["-"]) == 0
+        assert capsys.readouterr().out == expected
+
+    def test_batch_directory(self, tmp_path):
+        """Test that batch mode picks up and scans compressed patches."""
+        data = read_patch(PATCH_FILE)
+        (tmp_path / "a.patch").write_bytes(data)
+        (tmp_path / "b.patch.gz").write_bytes(gzip.compress(data))
+        (tmp_path / "c.diff.xz").write_bytes(lzma.compress(data))
+
+        paths = list(batch.expand_patch_paths([str(tmp_path)]))
+        results = [batch.analyze_patch_file(path) for path in paths]
+
+        assert [os.path.basename(p) for p in paths] == [
+            "a.patch",
+            "b.patch.gz",
+            "c.diff.xz",
+        ]
+        assert results[1]["files"] == results[0]["files"]
+        assert results[2]["files"] == results[0]["files"]
+
+    def test_corrupt_input(self, tmp_path, capsys):
+        """Test that truncated and corrupt streams are reported as errors."""
+        data = gzip.compress(read_patch(PATCH_FILE))
+        truncated = tmp_path / "truncated.patch.gz"
+        truncated.write_bytes(data[: len(data) // 2])
+        corrupt = tmp_path / "corrupt.patch.xz"
+        corrupt.write_bytes(b"\xfd7zXZ\x00" + b"\x00" * 64)
+        corrupt_bz2 = tmp_path / "corrupt.patch.bz2"
+        corrupt_bz2.write_bytes(b"BZh9" + b"\x00" * 64)
+
+        assert main.main([str(truncated)]) == 1
+        assert main.main([str(corrupt)]) == 1
+        assert main.main([str(corrupt_bz2)]) == 1
+        assert capsys.readouterr().err.count("Could not read patch") == 3
+        assert "error" in batch.analyze_patch_file(str(truncated))
+
+    def test_output_errors_are_not_read_errors(self, tmp_path, capsys):
+        """Test that failing to write the report is not blamed on the patch."""
+        output = str(tmp_path / "missing" / "report.txt")
+
+        assert main.main([PATCH_FILE, "--output", output]) == 1
+        assert main.main([PATCH_FILE, "--fix", "--output", output]) == 1
+        err = capsys.readouterr().err
+        assert err.count("Could not write report") == 2
+        assert "Could not read patch" not in err
+
+    def test_modes_needing_plain_files(self, compressed_file, capsys):
+        """Test that modes mapping the patch file reject compressed patches."""
+        _, path = compressed_file
+        assert main.main([path, "--headers-only"]) == 1
+        assert main.main([path, "--file", "src/foo.py"]) == 1
+        assert main.main([path, "--follow"]) == 1
+        assert capsys.readouterr().err.count("need an uncompressed patch") == 3
+
+    def test_zstd_unavailable(self, tmp_path, monkeypatch):
+        """Test the error for zstd input without a zstd module."""
+        monkeypatch.setattr(compressed, "zstd", None)
+        monkeypatch.setattr(compressed, "zstandard", None)
+        path = tmp_path / "x.patch.zst"
+        path.write_bytes(b"\x28\xb5\x2f\xfd" + b"\x00" * 16)
+
+        with pytest.raises(compressed.UnsupportedCompressionError):
+            list(main.stream_patch_from_file(str(path)))
+
+    def test_streams_without_holding_text(self, tmp_path):
+        """Test that streaming keeps far less than the decompressed patch."""
+        path = tmp_path / "corpus.patch.gz"
+        text = corpus.generate_corpus(corpus.CorpusSpec(target_lines=100000), seed=3)
+        path.write_bytes(gzip.compress(text))
+
+        tracemalloc.start()
+        try:
+            for _ in main.stream_patch_from_file(str(path)):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < len(text) / 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic patch corpus generator.
+Part of project resonantrabbit.
+"""
+
+import io
+import subprocess
+
+import pytest
+import unidiff
+
+from resonantrabbit import corpus, lazy, main, scanner
+
+
+@pytest.fixture(scope="module")
+def patch():
+    """Generate a patch large enough to contain every kind of file diff."""
+    return corpus.generate_corpus(corpus.CorpusSpec(files=400), seed=5)
+
+
+class TestCorpus:
+    """Test suite checking generated patches are deterministic and well formed."""
+
+    def test_same_seed_same_patch(self, patch):
+        """Test that generation depends only on the spec and seed."""
+        spec = corpus.CorpusSpec(files=400)
+        assert corpus.generate_corpus(spec, seed=5) == patch
+        assert corpus.generate_corpus(spec, seed=6) != patch
+
+    def test_unidiff_parses_every_file(self, patch):
+        """Test that unidiff accepts the patch and sees each kind of file."""
+        patch_set = unidiff.PatchSet(io.BytesIO(patch), encoding="utf-8")
+
+        assert len(patch_set) == 400
+        assert any(f.is_added_file for f in patch_set)
+        assert any(f.is_removed_file for f in patch_set)
+        assert any(f.is_rename for f in patch_set)
+        assert all(len(f) >= 1 for f in patch_set)
+        assert len({f.path for f in patch_set}) == 400
+
+        summaries = list(map(main.summarize_file, patch_set))
+        assert sum(s.empty_added + s.empty_removed for s in summaries) > 0
+        assert "café".encode() in patch
+        assert [(s.path, s.empty_added, s.empty_removed) for s in summaries] == [
+            (c.path, c.empty_added, c.empty_removed)
+            for c in scanner.iter_empty_line_counts(patch.splitlines(True))
+        ]
+
+    def test_git_accepts_patch(self, patch, tmp_path):
+        """Test that git apply reads the whole patch."""
+        patch_file = tmp_path / "corpus.patch"
+        patch_file.write_bytes(patch)
+
+        result = subprocess.run(
+            ["git", "apply", "--numstat", str(patch_file)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        assert len(result.stdout.splitlines()) == 400
+
+    def test_ratios(self):
+        """Test that the spec ratios shape the generated content."""
+        spec = corpus.CorpusSpec(
+            files=50,
+            blank_ratio=0.0,
+            non_ascii_ratio=0.0,
+            added_file_ratio=1.0,
+        )
+        patch_set = unidiff.PatchSet(
+            io.BytesIO(corpus.generate_corpus(spec)), encoding="utf-8"
+        )
+
+        assert all(f.is_added_file for f in patch_set)
+        assert all(
+            line.value.strip() and line.value.isascii()
+            for patched_file in patch_set
+            for hunk in patched_file
+            for line in hunk
+        )
+
+    def test_target_lines(self, tmp_path):
+        """Test that --lines writes whole file diffs up to the target."""
+        patch_file = tmp_path / "corpus.patch"
+
+        assert corpus.main([str(patch_file), "--lines", "5000", "--seed", "2"]) == 0
+
+        data = patch_file.read_bytes()
+        line_count = data.count(b"\n")
+        assert 5000 <= line_count < 5500
+        assert (
+            corpus.write_corpus(
+                str(tmp_path / "again.patch"), corpus.CorpusSpec(target_lines=5000), 2
+            )
+            == line_count
+        )
+        with lazy.LazyPatchSet.from_filename(str(patch_file)) as patch_set:
+            assert len(patch_set) == data.count(b"diff --git ")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis daemon and its thin client.
+Part of project resonantrabbit.
+"""
+
+import gzip
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from resonantrabbit import daemon, daemon_client, main
+
+PATCHES = [
+    os.path.join("testdata", "empty_lines.patch"),
+    os.path.join("testdata", "simple.patch"),
+]
+
+
+def wait_for_socket(socket_path, process, timeout=10.0):
+    """Wait until a daemon process accepts connections on socket_path."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stderr.read()
+        try:
+            with daemon_client.DaemonClient(socket_path) as client:
+                return client.request({"command": "ping"})
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"daemon did not start on {socket_path}")
+
+
+@pytest.fixture(scope="module")
+def socket_path(tmp_path_factory):
+    """Start a daemon for the tests of this module and stop it afterwards."""
+    path = str(tmp_path_factory.mktemp("daemon") / "rr.sock")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "resonantrabbit.main", "--daemon", path],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        wait_for_socket(path, process)
+        yield path
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+class TestDaemon:
+    """Test suite for daemon requests and client output."""
+
+    @pytest.mark.parametrize("output_format", ["text", "json", "ndjson"])
+    def test_client_matches_local_report(self, socket_path, output_format, capsys):
+        """Test that the client prints what a local run prints."""
+        assert main.main([*PATCHES, "--format", output_format]) == 0
+        expected = capsys.readouterr().out
+
+        assert (
+            daemon_client.main([
+                "--socket",
+                socket_path,
+                "--format",
+                output_format,
+                *PATCHES,
+            ])
+            == 0
+        )
+        assert capsys.readouterr().out == expected
+
+    def test_stdin(self, socket_path, capsys, monkeypatch):
+        """Test that standard input is sent to the daemon as patch data."""
+        main.main([PATCHES[0]])
+        expected = capsys.readouterr().out
+
+        with open(PATCHES[0], "rb") as f:
+            monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(f.read())))
+        assert daemon_client.main(["--socket", socket_path]) == 0
+        assert capsys.readouterr().out == expected
+
+    def test_repeated_requests_on_one_connection(self, socket_path):
+        """Test bytes, compressed bytes and paths on a kept-open connection."""
+        with open(PATCHES[0], "rb") as f:
+            data = f.read()
+        # Compared after the JSON round trip, which turns tuples into lists
+        expected = json.loads(json.dumps(daemon.analyze_request({"name": "x"}, data)))
+
+        with daemon_client.DaemonClient(socket_path) as client:
+            for _ in range(3):
+                assert client.analyze_bytes(data, name="x") == expected
+            assert client.analyze_bytes(gzip.compress(data), name="x") == expected
+            response = client.analyze(PATCHES[0])
+        assert response == {**expected, "patch": PATCHES[0]}
+
+    def test_concurrent_requests(self, socket_path):
+        """Test that concurrent requests get their own responses in order."""
+        patch_paths = PATCHES * 8
+        responses = daemon_client.analyze_all(
+            socket_path, patch_paths, max_connections=3
+        )
+
+        assert [r["patch"] for r in responses] == patch_paths
+        assert [len(r["files"]) for r in responses] == [3, 1] * 8
+
+    def test_errors_keep_the_connection(self, socket_path, tmp_path):
+        """Test that a bad patch is reported and the next request still works."""
+        bad_patch = tmp_path / "bad.patch"
+        bad_patch.write_text("diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1,2 +1,2 @@\n")
+
+        with daemon_client.DaemonClient(socket_path) as client:
+            assert "error" in client.analyze(str(bad_patch))
+            assert "error" in client.analyze(str(tmp_path / "missing.patch"))
+            assert "error" in client.request({"name": "x"})
+            assert "error" in client.request({"command": "reload"})
+            assert len(client.analyze(PATCHES[1])["files"]) == 1
+
+        assert daemon_client.main(["--socket", socket_path, str(bad_patch)]) == 1
+
+    @pytest.mark.parametrize("line", [b"not json\n", b"[1]\n", b'"x"\n'])
+    def test_bad_request_line(self, socket_path, line):
+        """Test that a request that is not a JSON object gets an error response."""
+        with daemon_client.DaemonClient(socket_path) as client:
+            client.sock.sendall(line)
+            assert client.receive()["error"].startswith("Bad request")
+
+    def test_overlong_request_line(self, socket_path):
+        """Test that a line over the reader's limit gets an error response."""
+        with daemon_client.DaemonClient(socket_path) as client:
+            client.sock.sendall(b"x" * (70 * 1024) + b"\n")
+            assert client.receive()["error"].startswith("Bad request")
+
+    def test_socket_is_private(self, socket_path):
+        """Test that only the owner of the daemon can connect to its socket."""
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+    def test_second_daemon_is_refused(self, socket_path, capsys):
+        """Test that a live daemon's socket is not taken over."""
+        assert main.main(["--daemon", socket_path]) == 1
+        assert "already listening" in capsys.readouterr().err
+
+
+class TestDaemonLifecycle:
+    """Test suite for starting and stopping the daemon."""
+
+    def test_shutdown_and_stale_socket(self, tmp_path_factory):
+        """Test shutdown, and that a stale socket file is replaced."""
+        path = str(tmp_path_factory.mktemp("lifecycle") / "rr.sock")
+        # A socket file nobody listens on, as left behind by a killed daemon
+        with socket.socket(socket.AF_UNIX) as stale:
+            stale.bind(path)
+
+        process = subprocess.Popen(
+            [sys.executable, "-m", "resonantrabbit.main", "--daemon", path],
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            assert wait_for_socket(path, process)["pid"] == process.pid
+            assert daemon_client.main(["--socket", path, "--shutdown"]) == 0
+            assert process.wait(timeout=10) == 0
+        finally:
+            if process.poll() is None:
+                process.kill()
+        assert not os.path.exists(path)
+        assert "Listening on" in process.stderr.read()
+
+    def test_client_without_daemon(self, tmp_path, capsys):
+        """Test the client error when no daemon is running."""
+        path = str(tmp_path / "none.sock")
+        assert daemon_client.main(["--socket", path, PATCHES[0]]) == 1
+        assert "Could not reach daemon" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
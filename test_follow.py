@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Tests for following a growing patch file.
+Part of project resonantrabbit.
+"""
+
+import json
+
+import pytest
+
+from resonantrabbit import follow, main, scanner
+from test_scanner import generate_patch
+
+
+def split_files(lines):
+    """Split patch lines into the byte content of each file diff."""
+    files = []
+    for line in lines:
+        if line.startswith(scanner.DIFF_GIT_HEADER):
+            files.append(b"")
+        files[-1] += line
+    return files
+
+
+class TestFollow:
+    """Test suite for PatchFollower and --follow."""
+
+    @pytest.fixture
+    def file_diffs(self):
+        """Byte content of each file diff of a generated patch."""
+        return split_files(generate_patch(7, file_count=12))
+
+    def test_polls_match_full_scan(self, file_diffs, tmp_path):
+        """Test that incremental polls add up to a scan of the whole patch."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(b"")
+        follower = follow.PatchFollower(str(spool))
+
+        seen = []
+        for file_diff in file_diffs:
+            with open(spool, "ab") as f:
+                # Append in two writes so polls also see partial file diffs
+                f.write(file_diff[:17])
+                seen += follower.poll()
+                f.write(file_diff[17:])
+            seen += follower.poll()
+        seen += follower.finish()
+
+        expected = list(scanner.scan_empty_lines(str(spool)))
+        assert seen == expected
+        assert follower.totals == {
+            "files": len(expected),
+            "empty_added": sum(c.empty_added for c in expected),
+            "empty_removed": sum(c.empty_removed for c in expected),
+        }
+        assert follower.offset == spool.stat().st_size
+
+    def test_last_file_waits_for_next_header(self, file_diffs, tmp_path):
+        """Test that a file diff is only reported once the next one starts."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(file_diffs[0] + file_diffs[1])
+        follower = follow.PatchFollower(str(spool))
+
+        assert len(follower.poll()) == 1
+        assert follower.offset == len(file_diffs[0])
+        assert follower.poll() == []
+
+        with open(spool, "ab") as f:
+            f.write(file_diffs[2])
+        assert len(follower.poll()) == 1
+        assert follower.totals["files"] == 2
+
+    def test_only_appended_bytes_are_scanned(self, file_diffs, tmp_path, monkeypatch):
+        """Test that earlier file diffs are not scanned again."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(b"".join(file_diffs[:6]))
+        follower = follow.PatchFollower(str(spool))
+        follower.poll()
+
+        scanned = []
+        original = scanner.iter_empty_line_counts
+
+        def record(lines):
+            data = lines.read()
+            scanned.append(data)
+            return original([data] if data else [])
+
+        monkeypatch.setattr(scanner, "iter_empty_line_counts", record)
+        with open(spool, "ab") as f:
+            f.write(b"".join(file_diffs[6:8]))
+        follower.poll()
+
+        assert scanned == [file_diffs[5] + file_diffs[6]]
+
+    def test_spool_is_read_in_chunks(self, file_diffs, tmp_path, monkeypatch):
+        """Test that a large spool is scanned a chunk at a time."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(b"".join(file_diffs))
+        expected = list(scanner.scan_empty_lines(str(spool)))
+        monkeypatch.setattr(follow, "READ_SIZE", 64)
+        follower = follow.PatchFollower(str(spool))
+
+        scanned = []
+        original = scanner.iter_empty_line_counts
+
+        def record(lines):
+            data = lines.read()
+            scanned.append(data)
+            return original(data.splitlines(True))
+
+        monkeypatch.setattr(scanner, "iter_empty_line_counts", record)
+
+        assert follower.finish() == expected
+        assert b"".join(scanned) == spool.read_bytes()
+        assert max(map(len, scanned)) <= max(map(len, file_diffs)) + 64
+
+    def test_interrupted_scan_is_not_lost(self, file_diffs, tmp_path, monkeypatch):
+        """Test that finish() after an interrupted scan still counts everything."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(b"".join(file_diffs))
+        follower = follow.PatchFollower(str(spool))
+        original = scanner.iter_empty_line_counts
+
+        def interrupted(lines):
+            yield next(original(lines))
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(scanner, "iter_empty_line_counts", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            follower.poll()
+        monkeypatch.undo()
+
+        expected = list(scanner.scan_empty_lines(str(spool)))
+        assert follower.finish() == expected
+        assert follower.totals["files"] == len(expected)
+        assert follower.offset == spool.stat().st_size
+
+    def test_truncated_file_starts_over(self, file_diffs, tmp_path):
+        """Test that a truncated spool file is followed from the beginning."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(b"".join(file_diffs))
+        follower = follow.PatchFollower(str(spool))
+        follower.poll()
+
+        spool.write_bytes(file_diffs[0])
+        assert follower.finish() == list(scanner.scan_empty_lines(str(spool)))
+        assert follower.totals["files"] == 1
+
+    def test_follow_command_line(self, file_diffs, tmp_path, capsys, monkeypatch):
+        """Test that --follow reports appended file diffs until interrupted."""
+        spool = tmp_path / "spool.patch"
+        spool.write_bytes(file_diffs[0])
+        chunks = iter(file_diffs[1:])
+
+        def append_or_stop(seconds):
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise KeyboardInterrupt
+            with open(spool, "ab") as f:
+                f.write(chunk)
+
+        monkeypatch.setattr(follow.time, "sleep", append_or_stop)
+        args = ["--follow", "--format", "ndjson", "--poll-interval", "0", str(spool)]
+        assert main.main(args) == 0
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        files = [r for r in records if r["type"] == "file"]
+        totals = [r for r in records if r["type"] == "totals"]
+        expected = list(scanner.scan_empty_lines(str(spool)))
+        assert [r["path"] for r in files] == [c.path for c in expected]
+        assert [t["files"] for t in totals] == list(range(1, len(file_diffs) + 1))
+        assert totals[-1]["empty_added"] == sum(c.empty_added for c in expected)
+
+    def test_follow_needs_one_file(self, capsys):
+        """Test that --follow rejects standard input and several patches."""
+        assert main.main(["--follow", "-"]) == 1
+        assert main.main(["--follow", "--format", "json", "README.md"]) == 1
+        assert "--follow" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("interval", ["-1", "nan"])
+    def test_bad_poll_interval(self, interval, capsys):
+        """Test that a negative poll interval is rejected by the parser."""
+        with pytest.raises(SystemExit) as excinfo:
+            main.main(["--follow", "--poll-interval", interval, "README.md"])
+        assert excinfo.value.code == 2
+        assert "must not be negative" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
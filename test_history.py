@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for git history analysis streamed from git log -p.
+Part of project resonantrabbit.
+"""
+
+import json
+import os
+import subprocess
+
+import pytest
+
+from resonantrabbit import history, main, scanner
+
+
+def git(repo, *args):
+    """Run a git command in repo and return its standard output."""
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, capture_output=True
+    ).stdout
+
+
+class TestHistory:
+    """Test suite for per-commit analysis of git log output."""
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        """Create a repository with a few commits touching empty lines."""
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        git(repo, "init", "-q")
+        git(repo, "config", "user.email", "test@example.com")
+        git(repo, "config", "user.name", "Test User")
+
+        contents = [
+            {"a.py": "one\n\ntwo\n", "b.txt": "x\n"},
+            {"a.py": "one\ntwo\n\n\n", "b.txt": "x\n   \ny\n"},
+            {"a.py": "one\ntwo\n", "c.md": "diff --git a/fake b/fake\n\n"},
+        ]
+        for i, files in enumerate(contents):
+            for name, text in files.items():
+                (repo / name).write_text(text)
+            git(repo, "add", ".")
+            git(repo, "commit", "-q", "-m", f"Commit {i}\n\ndiff --git a/x b/x")
+        return str(repo)
+
+    def test_results_match_git_show(self, repo):
+        """Test that every commit is analyzed like its own git show patch."""
+        results = history.analyze_history(repo, "HEAD")
+
+        shas = git(repo, "rev-list", "HEAD").decode().split()
+        assert list(results) == shas
+        for sha in shas:
+            patch = git(repo, "show", "--format=", sha)
+            expected = list(scanner.iter_empty_line_counts(patch.splitlines(True)))
+            assert results[sha]["files"] == [c.to_dict() for c in expected]
+
+        first, second, third = (results[sha] for sha in reversed(shas))
+        assert (first["empty_added"], first["empty_removed"]) == (1, 0)
+        assert (second["empty_added"], second["empty_removed"]) == (3, 1)
+        assert (third["empty_added"], third["empty_removed"]) == (1, 2)
+
+    @pytest.mark.parametrize("option", ["diff.noprefix", "diff.mnemonicPrefix"])
+    def test_diff_prefix_config_is_ignored(self, repo, option):
+        """Test that paths are reported the same whatever the prefix config."""
+        git(repo, "config", option, "true")
+        # Without prefixes, the directory would be taken for an a/ prefix
+        os.mkdir(os.path.join(repo, "a"))
+        with open(os.path.join(repo, "a", "f.txt"), "w") as f:
+            f.write("x\n\n")
+        git(repo, "add", ".")
+        git(repo, "commit", "-q", "-m", "Add a/f.txt")
+
+        results = history.analyze_history(repo, "HEAD~1..HEAD")
+
+        [result] = results.values()
+        assert [f["path"] for f in result["files"]] == ["a/f.txt"]
+        assert result["empty_added"] == 1
+
+    def test_revision_range(self, repo):
+        """Test that only the commits in the range are analyzed."""
+        results = history.analyze_history(repo, "HEAD~2..HEAD")
+
+        assert list(results) == git(repo, "rev-list", "HEAD~2..HEAD").decode().split()
+
+    def test_closing_early_stops_git(self, repo):
+        """Test that abandoning the results does not leave git running."""
+        results = history.iter_history_results(repo, "HEAD")
+        next(results)
+        results.close()
+
+    def test_bad_range_raises(self, repo):
+        """Test that a git log failure is raised after the stream ends."""
+        with pytest.raises(subprocess.CalledProcessError) as e:
+            list(history.iter_history_results(repo, "no-such-branch"))
+        assert "no-such-branch" in e.value.stderr
+
+    def test_command_line_json(self, repo, capsys):
+        """Test that --git-log writes results keyed by commit SHA."""
+        assert main.main(["--git-log", "HEAD", "--repo", repo, "--format", "json"]) == 0
+
+        document = json.loads(capsys.readouterr().out)
+        assert (
+            list(document["commits"]) == git(repo, "rev-list", "HEAD").decode().split()
+        )
+        assert document["totals"] == {
+            "commits": 3,
+            "errors": 0,
+            "empty_added": 5,
+            "empty_removed": 3,
+        }
+
+    def test_command_line_errors(self, repo, capsys):
+        """Test that git failures and stray PATCH arguments are reported."""
+        assert main.main(["--git-log", "no-such-branch", "--repo", repo]) == 1
+        assert "git log failed" in capsys.readouterr().err
+        assert main.main(["--git-log", "HEAD", "some.patch"]) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
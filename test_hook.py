@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-commit hook on staged changes.
+Part of project resonantrabbit.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+import unidiff
+
+from resonantrabbit import hook, scanner
+
+
+def git(repo, *args):
+    """Run a git command in repo and return its standard output."""
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, capture_output=True
+    ).stdout
+
+
+def stage(repo, files):
+    """Write files into repo and stage them."""
+    for name, content in files.items():
+        with open(os.path.join(repo, name), "w", newline="") as f:
+            f.write(content)
+    git(repo, "add", *files)
+
+
+def run_hook(repo, limits=None):
+    """Run the hook on repo and return its exit status and report."""
+    out = io.StringIO()
+    status = hook.run_hook(repo, limits, out)
+    return status, out.getvalue()
+
+
+class TestPreCommitHook:
+    """Test suite for the staged diff checks."""
+
+    @pytest.fixture
+    def temp_git_repo(self):
+        """Create a temporary git repository with one commit."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            git(temp_dir, "init", "-q")
+            git(temp_dir, "config", "user.email", "test@example.com")
+            git(temp_dir, "config", "user.name", "Test User")
+            stage(
+                temp_dir,
+                {
+                    "example.py": "def hello():\n    pass\n\ndef main():\n    hello()\n",
+                    "config.txt": "setting1=value1\n\nsetting2=value2\n",
+                },
+            )
+            git(temp_dir, "commit", "-q", "-m", "Initial commit")
+            yield temp_dir
+
+    def test_clean_changes_pass_silently(self, temp_git_repo):
+        """Test that changes without blank lines pass with no output."""
+        stage(
+            temp_git_repo,
+            {"example.py": "def hello():\n    print(1)\n\ndef main():\n    hello()\n"},
+        )
+
+        assert run_hook(temp_git_repo) == (0, "")
+        assert run_hook(temp_git_repo, {"empty_added": 0}) == (0, "")
+
+    def test_whitespace_only_line_is_refused(self, temp_git_repo):
+        """Test the default check with the line of each offending addition."""
+        stage(
+            temp_git_repo,
+            {
+                "example.py": "def hello():\n    \n    pass\n\n\ndef main():\n"
+                "    hello()\n",
+                "new.txt": "x\n\t\n",
+            },
+        )
+
+        status, report = run_hook(temp_git_repo)
+        assert status == 1
+        assert report.splitlines()[:3] == [
+            "Staged changes have 2 added whitespace-only lines (at most 0 allowed):",
+            "  example.py:2",
+            "  new.txt:2",
+        ]
+        assert "--no-verify" in report
+
+    @pytest.mark.parametrize("option", ["diff.noprefix", "diff.mnemonicPrefix"])
+    def test_diff_prefix_config_is_ignored(self, temp_git_repo, option):
+        """Test that paths are reported the same whatever the prefix config."""
+        git(temp_git_repo, "config", option, "true")
+        # Without prefixes, the directory would be taken for an a/ prefix
+        os.mkdir(os.path.join(temp_git_repo, "a"))
+        stage(temp_git_repo, {"a/new.txt": "x\n\t\n"})
+
+        status, report = run_hook(temp_git_repo)
+        assert status == 1
+        assert report.splitlines()[1] == "  a/new.txt:2"
+
+    def test_limits(self, temp_git_repo):
+        """Test empty line limits on additions and removals."""
+        stage(
+            temp_git_repo,
+            {
+                "example.py": "def hello():\n    pass\n\n\n\ndef main():\n    hello()\n",
+                "config.txt": "setting1=value1\nsetting2=value2\n",
+            },
+        )
+
+        assert run_hook(temp_git_repo, {"empty_added": 2})[0] == 0
+        status, report = run_hook(temp_git_repo, {"empty_added": 1})
+        assert status == 1
+        assert "  example.py:4\n  example.py:5\n" in report
+        status, report = run_hook(temp_git_repo, {"empty_removed": 0})
+        assert status == 1
+        assert "1 removed empty lines" in report
+        assert "  config.txt:2\n" in report
+
+    def test_only_staged_changes_count(self, temp_git_repo):
+        """Test that unstaged edits are not checked."""
+        with open(os.path.join(temp_git_repo, "config.txt"), "a") as f:
+            f.write("   \n")
+
+        assert run_hook(temp_git_repo) == (0, "")
+        git(temp_git_repo, "add", "config.txt")
+        assert run_hook(temp_git_repo)[0] == 1
+
+    def test_deleted_and_crlf_files(self, temp_git_repo):
+        """Test deleted files, and that CRLF empty lines are not whitespace."""
+        git(temp_git_repo, "rm", "-q", "config.txt")
+        stage(temp_git_repo, {"dos.txt": "a\r\n\r\nb\r\n"})
+
+        assert run_hook(temp_git_repo) == (0, "")
+        status, report = run_hook(temp_git_repo, {"empty_added": 0, "empty_removed": 0})
+        assert status == 1
+        assert "  dos.txt:2\n" in report
+        assert "  config.txt:2\n" in report
+
+    def test_counts_match_scanner(self, temp_git_repo):
+        """Test that the hook counts what the scanner counts on the full diff."""
+        stage(
+            temp_git_repo,
+            {
+                "example.py": "\n \ndef hello():\n\n    pass\n",
+                "config.txt": "setting1=value1\n  \n\nsetting2=value2\n\n",
+                "other.md": "# Title\n\n　\n",
+            },
+        )
+
+        found = hook.staged_lines(temp_git_repo)
+        counts = list(
+            scanner.iter_empty_line_counts(
+                io.BytesIO(git(temp_git_repo, "diff", "--cached"))
+            )
+        )
+        assert len(found["empty_added"]) == sum(c.empty_added for c in counts)
+        assert len(found["empty_removed"]) == sum(c.empty_removed for c in counts)
+        assert ("other.md", 3) in found["whitespace_only_added"]
+
+    def test_not_a_repository(self, tmp_path):
+        """Test that a git failure is reported."""
+        status, report = run_hook(str(tmp_path))
+        assert status == 1
+        assert report.startswith("git diff --cached failed:")
+
+    def test_hunk_longer_than_header(self):
+        """Test that a hunk overrunning its header is a parse error."""
+        diff = b"diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1 +1 @@\n+a\n+\n"
+        with pytest.raises(unidiff.UnidiffParseError, match="longer than expected"):
+            hook.collect_staged_lines(io.BytesIO(diff))
+
+    def test_git_not_found(self, tmp_path, monkeypatch):
+        """Test that a missing git executable is reported without a traceback."""
+        monkeypatch.setenv("PATH", str(tmp_path))
+        status, report = run_hook(str(tmp_path))
+        assert status == 1
+        assert report.startswith("Could not run git:")
+
+    def test_command_line(self, temp_git_repo):
+        """Test the hook module as git would run it."""
+        stage(temp_git_repo, {"config.txt": "setting1=value1\n\n\n"})
+        # The hook runs inside the checked repository, away from the package
+        env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+
+        def run(*args):
+            return subprocess.run(
+                [sys.executable, "-m", "resonantrabbit.hook", *args],
+                cwd=temp_git_repo,
+                env=env,
+                check=False,
+                capture_output=True,
+                text=True,
+            )
+
+        assert run().returncode == 0
+        result = run("--max-empty-added", "0")
+        assert result.returncode == 1
+        assert "config.txt:3" in result.stderr
+        assert run("--repo", temp_git_repo, "--max-empty-added", "1").returncode == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the lazy PatchSet built from a file and hunk offset index.
+Part of project resonantrabbit.
+"""
+
+import os
+
+import pytest
+import unidiff
+
+from resonantrabbit import lazy, main
+from test_scanner import generate_patch
+
+
+def file_fields(patched_file):
+    """Return the file level fields a header report shows."""
+    return (
+        patched_file.path,
+        patched_file.source_file,
+        patched_file.target_file,
+        patched_file.is_added_file,
+        patched_file.is_removed_file,
+        patched_file.is_modified_file,
+        patched_file.added,
+        patched_file.removed,
+        len(patched_file),
+    )
+
+
+def parse_with_unidiff(patch_file):
+    """Parse a patch from its raw lines, keeping CRLF line endings."""
+    with open(patch_file, "rb") as f:
+        return unidiff.PatchSet(f, encoding="utf-8")
+
+
+class TestLazyPatchSet:
+    """Test suite comparing the lazy PatchSet with unidiff's."""
+
+    @pytest.fixture(params=[(seed, True) for seed in range(6)] + [(6, False)])
+    def patch_file(self, request, tmp_path):
+        """Write a generated patch, with or without git headers."""
+        seed, git_headers = request.param
+        path = tmp_path / "generated.patch"
+        path.write_bytes(b"".join(generate_patch(seed, git_headers=git_headers)))
+        return str(path)
+
+    def test_index_matches_unidiff(self, patch_file):
+        """Test that indexed file fields match fully parsed files."""
+        expected = parse_with_unidiff(patch_file)
+
+        with lazy.LazyPatchSet.from_filename(patch_file) as patch_set:
+            assert list(map(file_fields, patch_set)) == list(map(file_fields, expected))
+            assert (patch_set.added, patch_set.removed) == (
+                expected.added,
+                expected.removed,
+            )
+
+    def test_materialized_hunks_match_unidiff(self, patch_file):
+        """Test that iterated hunks hold the same lines as unidiff's."""
+        expected = parse_with_unidiff(patch_file)
+
+        with lazy.LazyPatchSet.from_filename(patch_file) as patch_set:
+            for lazy_file, expected_file in zip(patch_set, expected, strict=True):
+                for hunk, expected_hunk in zip(lazy_file, expected_file, strict=True):
+                    assert str(hunk) == str(expected_hunk)
+                    assert [
+                        (line.line_type, line.source_line_no, line.target_line_no)
+                        for line in hunk
+                    ] == [
+                        (line.line_type, line.source_line_no, line.target_line_no)
+                        for line in expected_hunk
+                    ]
+                    assert [line.diff_line_no for line in hunk] == [
+                        line.diff_line_no for line in expected_hunk
+                    ]
+
+            summaries = list(map(main.summarize_file, patch_set))
+        assert summaries == list(map(main.summarize_file, expected))
+
+    def test_header_report_parses_no_lines(self, patch_file, monkeypatch, capsys):
+        """Test that the header report never materializes a hunk."""
+        expected = parse_with_unidiff(patch_file)
+        main.print_header_report(map(main.summarize_file, expected))
+        expected_output = capsys.readouterr().out
+
+        def fail(self):
+            raise AssertionError("hunk was parsed for a header report")
+
+        monkeypatch.setattr(lazy.LazyHunk, "materialize", fail)
+        with lazy.LazyPatchSet.from_filename(patch_file) as patch_set:
+            main.print_header_report(patch_set)
+
+        assert capsys.readouterr().out == expected_output
+
+    def test_empty_patch(self, tmp_path):
+        """Test that an empty patch file gives an empty PatchSet."""
+        patch_file = tmp_path / "empty.patch"
+        patch_file.write_bytes(b"")
+
+        with lazy.LazyPatchSet.from_filename(str(patch_file)) as patch_set:
+            assert len(patch_set) == 0
+
+    def test_headers_only_command_line(self, capsys):
+        """Test that --headers-only prints the file level analysis."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+
+        assert main.main(["--headers-only", patch_file]) == 0
+
+        out = capsys.readouterr().out
+        assert "File: example.py" in out
+        assert "  Added lines: 5" in out
+        assert "Sample lines from hunk:" not in out
+        assert out.endswith("PatchSet contains 3 files.\n\n")
+        assert main.main(["--headers-only", "--format", "json", patch_file]) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
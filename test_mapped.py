@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory-mapped patch input.
+Part of project resonantrabbit.
+"""
+
+import os
+import tracemalloc
+
+import pytest
+
+from resonantrabbit import main, mapped
+from test_scanner import generate_patch
+
+
+def unidiff_summaries(patch_file):
+    """Return file summaries computed from unidiff objects."""
+    return list(map(main.summarize_file, main.stream_patch_from_file(patch_file)))
+
+
+class TestMappedInput:
+    """Test suite comparing mapped summaries with the unidiff path."""
+
+    @pytest.mark.parametrize(
+        "patch_name", ["empty_lines.patch", "generated_test.patch", "simple.patch"]
+    )
+    def test_matches_unidiff_on_testdata(self, patch_name):
+        """Test that mapped summaries match unidiff on the shipped patches."""
+        patch_file = os.path.join("testdata", patch_name)
+
+        summaries = list(mapped.iter_mapped_summaries(patch_file))
+
+        assert summaries == unidiff_summaries(patch_file)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_unidiff_on_generated_patches(self, seed, tmp_path):
+        """Test that mapped summaries match unidiff on generated patches."""
+        patch_file = tmp_path / "generated.patch"
+        patch_file.write_bytes(b"".join(generate_patch(seed)))
+
+        summaries = list(mapped.iter_mapped_summaries(str(patch_file)))
+
+        assert summaries == unidiff_summaries(str(patch_file))
+
+    def test_trailing_lines_attach_to_last_hunk(self):
+        """Test that a trailing newline and marker belong to the last hunk."""
+        buffer = (
+            b"--- a/x\n+++ b/x\n@@ -1 +1 @@\n-old\n+new\n"
+            b"\\ No newline at end of file\n\n"
+        )
+
+        (mapped_file,) = mapped.iter_mapped_files(buffer)
+
+        assert mapped_file.end == len(buffer)
+        assert bytes(mapped_file.hunks[0].line_types) == b"-+\\\x00"
+
+    def test_report_is_identical(self, capsys):
+        """Test that the report rendered from mapped input is unchanged."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+        main.report_patch(main.stream_patch_from_file(patch_file))
+        expected = capsys.readouterr().out
+
+        main.print_patch_report(mapped.iter_mapped_summaries(patch_file))
+
+        assert capsys.readouterr().out == expected
+
+    def test_allocations_stay_below_patch_size(self, tmp_path):
+        """Test that the mapped path does not copy the patch into memory."""
+        patch_file = tmp_path / "large.patch"
+        with open(patch_file, "wb") as f:
+            for seed in range(200):
+                f.writelines(generate_patch(seed))
+        patch_size = os.path.getsize(patch_file)
+
+        tracemalloc.start()
+        try:
+            for _ in mapped.iter_mapped_summaries(str(patch_file)):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < patch_size / 4
+
+    def test_empty_patch(self, tmp_path):
+        """Test that an empty patch yields no summaries."""
+        patch_file = tmp_path / "empty.patch"
+        patch_file.write_bytes(b"")
+
+        assert list(mapped.iter_mapped_summaries(str(patch_file))) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
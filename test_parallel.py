@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for parallel analysis of large patches.
+Part of project resonantrabbit.
+"""
+
+import os
+
+import pytest
+
+from resonantrabbit import main, parallel
+
+
+class TestParallelAnalysis:
+    """Test suite comparing the parallel path with the serial one."""
+
+    @pytest.fixture
+    def large_patch(self, tmp_path):
+        """Write a patch with many files built from the testdata patches."""
+        with open(os.path.join("testdata", "empty_lines.patch"), "rb") as f:
+            template = f.read()
+
+        patch_file = tmp_path / "large.patch"
+        with open(patch_file, "wb") as f:
+            f.write(b"From: preamble that is not part of any file\n")
+            f.writelines(
+                template.replace(b"example.py", f"example{i}.py".encode())
+                for i in range(40)
+            )
+        return str(patch_file)
+
+    def test_find_file_offsets(self):
+        """Test that file boundaries are found at the start of lines only."""
+        data = b"diff --git a/x b/x\n+diff --git a/y b/y\ndiff --git a/z b/z\n"
+
+        offsets = parallel.find_file_offsets(data)
+
+        assert offsets == [0, data.rindex(b"diff --git")]
+
+    def test_plan_shards_covers_whole_file(self):
+        """Test that shards are contiguous and start on file boundaries."""
+        offsets = [10, 30, 50, 90]
+
+        shards = parallel.plan_shards(offsets, 120, shard_size=35)
+
+        assert shards == [(0, 50), (50, 90), (90, 120)]
+
+    @pytest.mark.parametrize("shard_size", [1, 1024, parallel.DEFAULT_SHARD_SIZE])
+    def test_report_is_byte_identical(self, large_patch, shard_size, capsys):
+        """Test that parallel output matches the serial report exactly."""
+        main.report_patch(main.stream_patch_from_file(large_patch))
+        serial = capsys.readouterr().out
+
+        main.print_patch_report(
+            parallel.iter_summaries_parallel(
+                large_patch, max_workers=2, shard_size=shard_size
+            )
+        )
+
+        assert capsys.readouterr().out == serial
+
+    def test_separate_reports_are_byte_identical(self, large_patch, capsys):
+        """Test the parallel analyze and empty line reports against serial."""
+        main.analyze_patch(main.stream_patch_from_file(large_patch))
+        main.demonstrate_empty_line_detection(main.stream_patch_from_file(large_patch))
+        serial = capsys.readouterr().out
+
+        parallel.analyze_patch_parallel(large_patch, max_workers=2)
+        parallel.demonstrate_empty_line_detection_parallel(large_patch, max_workers=2)
+
+        assert capsys.readouterr().out == serial
+
+    def test_command_line_jobs(self, large_patch, capsys):
+        """Test that --jobs gives the serial command line report."""
+        assert main.main([large_patch]) == 0
+        serial = capsys.readouterr().out
+
+        assert main.main([large_patch, "--jobs", "2"]) == 0
+
+        assert capsys.readouterr().out == serial
+
+    @pytest.mark.parametrize("jobs", ["0", "-1"])
+    def test_command_line_rejects_bad_jobs(self, large_patch, jobs, capsys):
+        """Test that --jobs below 1 is a usage error, with or without --batch."""
+        for mode in ([], ["--batch"]):
+            with pytest.raises(SystemExit) as excinfo:
+                main.main([large_patch, "--jobs", jobs, *mode])
+            assert excinfo.value.code == 2
+            assert "must be at least 1" in capsys.readouterr().err
+
+    def test_empty_patch(self, tmp_path):
+        """Test that an empty patch yields no summaries."""
+        patch_file = tmp_path / "empty.patch"
+        patch_file.write_bytes(b"")
+
+        assert list(parallel.iter_summaries_parallel(str(patch_file))) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for per-phase timing and profiling instrumentation.
+Part of project resonantrabbit.
+"""
+
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+import pytest
+
+from resonantrabbit import main, profiling
+from test_scanner import generate_patch
+
+
+def run_text_report(patch_paths, profiler=None):
+    """Return the text report of patch_paths, optionally profiled."""
+    out = io.StringIO()
+    if profiler is None:
+        main.write_text_report(patch_paths, out=out)
+    else:
+        with profiling.profile_run(profiler):
+            main.write_text_report(patch_paths, out=out, profiler=profiler)
+    return out.getvalue()
+
+
+class TestPhaseProfiler:
+    """Test suite for phase accounting and the profiled report pipeline."""
+
+    @pytest.fixture(params=[True, False], ids=["git", "plain"])
+    def patch_file(self, request, tmp_path):
+        """Write a generated patch, with or without git headers."""
+        path = tmp_path / "generated.patch"
+        path.write_bytes(b"".join(generate_patch(2, git_headers=request.param)))
+        return str(path)
+
+    def test_nested_phases_are_exclusive(self):
+        """Test that time in an inner phase is not charged to the outer one."""
+        profiler = profiling.PhaseProfiler()
+
+        with profiler.phase("render"):
+            time.sleep(0.01)
+            with profiler.phase("parse"):
+                time.sleep(0.05)
+            items = list(profiler.timed(iter([1, 2]), "read"))
+
+        phases = profiler.run.phases
+        assert items == [1, 2]
+        assert phases["parse"].seconds >= 0.05
+        assert phases["render"].seconds >= 0.01
+        # Render keeps only its own sleep, well short of the parse phase
+        assert (
+            phases["read"].seconds < phases["render"].seconds < phases["parse"].seconds
+        )
+
+    def test_report_is_unchanged(self, patch_file):
+        """Test that profiling does not change the report output."""
+        profiler = profiling.PhaseProfiler()
+
+        assert run_text_report([patch_file], profiler) == run_text_report([patch_file])
+
+    def test_records_per_patch_and_file(self, patch_file):
+        """Test that every file gets a record and every phase is measured."""
+        finished = []
+        profiler = profiling.PhaseProfiler(
+            on_file=lambda patch, record: finished.append((patch.patch, record.path))
+        )
+        run_text_report([patch_file, patch_file], profiler)
+
+        paths = [f.path for f in main.stream_patch_from_file(patch_file)]
+        assert [p.patch for p in profiler.patches] == [patch_file, patch_file]
+        for patch in profiler.patches:
+            assert [f.path for f in patch.files] == paths
+            for phase in profiling.PHASES:
+                assert patch.phases[phase].seconds > 0
+        assert finished == [(patch_file, path) for path in paths] * 2
+
+        document = profiler.to_dict()
+        assert document["allocation_unit"] == "blocks"
+        assert len(document["patches"][0]["files"]) == len(paths)
+        # The report title is rendered outside any patch
+        assert document["run"]["render"]["seconds"] > 0
+
+    def test_tracemalloc_counts_bytes(self, patch_file):
+        """Test that allocations are measured in bytes under tracemalloc."""
+        tracemalloc.start()
+        try:
+            profiler = profiling.PhaseProfiler()
+            run_text_report([patch_file], profiler)
+        finally:
+            tracemalloc.stop()
+
+        assert profiler.allocation_unit == "bytes"
+        assert profiler.patches[0].phases["parse"].peak > 0
+
+    def test_command_line(self, tmp_path, capsys):
+        """Test --profile output and the cProfile and tracemalloc dumps."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+        assert main.main([patch_file]) == 0
+        expected = capsys.readouterr().out
+
+        cprofile_path = tmp_path / "run.prof"
+        snapshot_path = tmp_path / "run.snapshot"
+        assert (
+            main.main([
+                patch_file,
+                "--profile",
+                "--cprofile",
+                str(cprofile_path),
+                "--tracemalloc",
+                str(snapshot_path),
+            ])
+            == 0
+        )
+
+        captured = capsys.readouterr()
+        assert captured.out == expected
+        assert f"Patch: {patch_file} (3 files" in captured.err
+        assert "peak bytes" in captured.err
+        assert not tracemalloc.is_tracing()
+        assert pstats.Stats(str(cprofile_path)).total_calls > 0
+        assert tracemalloc.Snapshot.load(str(snapshot_path)).traces
+
+    def test_command_line_json(self, capsys):
+        """Test that --profile works with the JSON formats."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+        for output_format in ("json", "ndjson"):
+            assert main.main([patch_file, "--format", output_format]) == 0
+            expected = capsys.readouterr().out
+            assert main.main([patch_file, "--format", output_format, "--profile"]) == 0
+            captured = capsys.readouterr()
+            assert captured.out == expected
+            assert "=== Profile ===" in captured.err
+
+    def test_command_line_errors(self, tmp_path, capsys):
+        """Test the options --profile cannot be combined with."""
+        patch_file = os.path.join("testdata", "simple.patch")
+
+        assert main.main([patch_file, "--cprofile", str(tmp_path / "x")]) == 1
+        assert main.main([patch_file, "--profile", "--headers-only"]) == 1
+        assert (
+            main.main([patch_file, "--profile", "--cache-dir", str(tmp_path / "c")])
+            == 1
+        )
+        assert "--profile cannot be combined" in capsys.readouterr().err
+
+    @pytest.mark.parametrize(
+        "mode",
+        [["--batch"], ["--rules"], ["--fix"], ["--follow"], ["--file", "x.py"]],
+    )
+    def test_other_modes_reject_profile(self, mode, capsys):
+        """Test that modes the profiler does not cover reject --profile."""
+        patch_file = os.path.join("testdata", "simple.patch")
+
+        # --rules keeps status 1 for violations and reports usage errors with 2
+        expected = main.RULES_ERROR_STATUS if mode == ["--rules"] else 1
+        assert main.main([patch_file, "--profile", *mode]) == expected
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "--profile cannot be combined" in captured.err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the structured analysis result model.
+Part of project resonantrabbit.
+"""
+
+import dataclasses
+import json
+import os
+
+import pytest
+
+from resonantrabbit import main
+from resonantrabbit.report import (
+    EmptyLineCount,
+    EmptyLineReport,
+    FileReport,
+    PatchReport,
+)
+
+
+class TestReport:
+    """Test suite for PatchReport and the reports it holds."""
+
+    @pytest.fixture
+    def patch_file(self):
+        """Path to the testdata patch with empty line changes."""
+        return os.path.join("testdata", "empty_lines.patch")
+
+    def test_analysis_returns_report_without_rendering(self, patch_file, capsys):
+        """Test that render=False returns the report and prints nothing."""
+        report = main.analyze_patch(
+            main.stream_patch_from_file(patch_file), render=False
+        )
+
+        assert capsys.readouterr().out == ""
+        assert isinstance(report, PatchReport)
+        assert all(isinstance(f, FileReport) for f in report.files)
+        assert (report.empty_added, report.empty_removed) == (4, 3)
+
+    def test_rendered_report_matches_returned_report(self, patch_file, capsys):
+        """Test that rendering the returned report prints the same text."""
+        report = main.demonstrate_empty_line_detection(
+            main.stream_patch_from_file(patch_file)
+        )
+        printed = capsys.readouterr().out
+
+        main.print_empty_line_analysis(report.files)
+
+        assert capsys.readouterr().out == printed
+
+    def test_rendered_report_round_trip(self, patch_file, capsys):
+        """Test that a rendered analysis returns counts that survive JSON."""
+        report = main.analyze_patch(main.stream_patch_from_file(patch_file))
+
+        data = json.loads(json.dumps(report.to_dict()))
+
+        assert capsys.readouterr().out
+        assert isinstance(report, EmptyLineReport)
+        assert EmptyLineReport.from_dict(data) == report
+        assert (report.empty_added, report.empty_removed) == (4, 3)
+
+    def test_reports_use_slots(self, patch_file):
+        """Test that report objects carry no per-instance dict."""
+        report = main.build_patch_report(main.stream_patch_from_file(patch_file))
+        file_report = report.files[0]
+
+        for obj in (report, file_report, file_report.hunks[0]):
+            assert not hasattr(obj, "__dict__")
+        assert not hasattr(file_report.hunks[0].empty_line_events[0], "__dict__")
+
+    def test_json_round_trip(self, patch_file):
+        """Test that reports survive a round trip through JSON."""
+        report = main.build_patch_report(main.stream_patch_from_file(patch_file))
+
+        data = json.loads(json.dumps(report.to_dict()))
+
+        assert PatchReport.from_dict(data) == report
+        assert data["total_empty_added"] == report.empty_added
+
+    def test_to_dict_matches_asdict(self, patch_file):
+        """Test that the explicit to_dict gives the JSON of dataclasses.asdict."""
+        report = main.build_patch_report(main.stream_patch_from_file(patch_file))
+
+        for file_report in report.files:
+            assert json.dumps(file_report.to_dict()) == json.dumps(
+                dataclasses.asdict(file_report)
+            )
+
+    def test_unrendered_reports_skip_samples(self, patch_file):
+        """Test that samples are only collected for reports that render."""
+        report = main.analyze_patch(
+            main.stream_patch_from_file(patch_file), render=False
+        )
+        counts = main.demonstrate_empty_line_detection(
+            main.stream_patch_from_file(patch_file), render=False
+        )
+
+        assert all(not h.sample_lines for f in report.files for h in f.hunks)
+        assert counts.files == [
+            EmptyLineCount(f.path, f.empty_added, f.empty_removed) for f in report.files
+        ]
+
+    def test_empty_line_count_renders_like_file_report(self, patch_file, capsys):
+        """Test that scanner counts render the same empty line analysis."""
+        report = main.build_patch_report(main.stream_patch_from_file(patch_file))
+        main.print_empty_line_analysis(report.files)
+        expected = capsys.readouterr().out
+
+        main.print_empty_line_analysis(
+            EmptyLineCount(f.path, f.empty_added, f.empty_removed) for f in report.files
+        )
+
+        assert capsys.readouterr().out == expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed analysis result cache.
+Part of project resonantrabbit.
+"""
+
+import os
+import shutil
+
+import pytest
+
+from resonantrabbit import main, result_cache
+from resonantrabbit.report import FileReport
+
+
+def read_patch():
+    """Return the bytes of the testdata patch with empty line changes."""
+    with open(os.path.join("testdata", "empty_lines.patch"), "rb") as f:
+        return f.read()
+
+
+class TestResultCache:
+    """Test suite for the on-disk result cache."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create an empty cache in a temporary directory."""
+        return result_cache.ResultCache(str(tmp_path / "cache"))
+
+    @pytest.fixture
+    def patch_file(self, tmp_path):
+        """Copy a testdata patch to a temporary location."""
+        path = tmp_path / "copy.patch"
+        shutil.copy(os.path.join("testdata", "empty_lines.patch"), path)
+        return str(path)
+
+    def test_hit_skips_parsing(self, cache, patch_file, monkeypatch):
+        """Test that a cache hit returns the stored result without parsing."""
+        first = cache.summarize_patch_file(patch_file)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("patch was parsed on a cache hit")
+
+        monkeypatch.setattr(main, "stream_patch_from_file", fail)
+        second = cache.summarize_patch_file(patch_file)
+
+        assert second == first
+        assert [s.empty_added for s in second] == [2, 0, 2]
+
+    def test_key_depends_on_content_and_version(self, cache, patch_file, monkeypatch):
+        """Test that the key follows the patch bytes and analyzer version."""
+        key = cache.key_for_file(patch_file)
+        copy = patch_file + ".copy"
+        shutil.copy(patch_file, copy)
+
+        assert cache.key_for_file(copy) == key
+
+        with open(copy, "ab") as f:
+            f.write(b"\n")
+        assert cache.key_for_file(copy) != key
+
+        monkeypatch.setattr(result_cache, "ANALYZER_VERSION", "test")
+        assert cache.key_for_file(patch_file) != key
+
+    def test_least_recently_used_entries_are_evicted(self, cache):
+        """Test that eviction drops the oldest entries beyond max_bytes."""
+        for i in range(3):
+            cache.put(
+                f"{i:064x}", [FileReport("x" * 100, "a", "b", False, False, True)]
+            )
+        entry_size = os.path.getsize(cache._entry_path(f"{0:064x}"))
+        for i in range(3):
+            os.utime(cache._entry_path(f"{i:064x}"), ns=(i, i))
+
+        # Reading the oldest entry makes it the most recently used one
+        assert cache.get(f"{0:064x}") is not None
+        cache.max_bytes = entry_size * 2
+        cache.evict()
+
+        assert cache.get(f"{0:064x}") is not None
+        assert cache.get(f"{1:064x}") is None
+        assert cache.get(f"{2:064x}") is not None
+
+    def test_puts_keep_a_running_size(self, cache, monkeypatch):
+        """Test that storing entries scans the directory only when needed."""
+        walks = []
+        walk = os.walk
+
+        def counting_walk(top):
+            walks.append(top)
+            return walk(top)
+
+        monkeypatch.setattr(os, "walk", counting_walk)
+        summaries = [FileReport("x" * 100, "a", "b", False, False, True)]
+
+        for i in range(10):
+            cache.put(f"{i:064x}", summaries)
+        assert len(walks) == 1
+
+        entry_size = os.path.getsize(cache._entry_path(f"{0:064x}"))
+        assert cache.total_size == entry_size * 10
+        cache.max_bytes = entry_size * 10
+        cache.put(f"{10:064x}", summaries)
+        assert len(walks) == 2
+        assert cache.total_size <= cache.max_bytes
+
+    def test_hit_is_streamed(self, cache, patch_file):
+        """Test that a hit yields reports lazily from the stored entry."""
+        expected = cache.summarize_patch_file(patch_file)
+
+        hit = cache.iter_patch_file(patch_file)
+
+        assert next(hit) == expected[0]
+        assert list(hit) == expected[1:]
+
+    def test_truncated_entry_is_a_miss(self, cache, patch_file):
+        """Test that an entry cut short is recomputed instead of served."""
+        expected = cache.summarize_patch_file(patch_file)
+        entry_path = cache._entry_path(cache.key_for_file(patch_file))
+        with open(entry_path, "r+b") as f:
+            f.truncate(os.path.getsize(entry_path) // 2)
+
+        assert cache.get(cache.key_for_file(patch_file)) is None
+        assert list(cache.iter_patch_file(patch_file)) == expected
+        assert cache.get(cache.key_for_file(patch_file)) == expected
+
+    def test_batch_workers_leave_eviction_to_the_parent(
+        self, cache, tmp_path, monkeypatch
+    ):
+        """Test that process workers report stored bytes to one running total."""
+        from resonantrabbit import batch
+
+        paths = []
+        for i in range(4):
+            path = tmp_path / f"{i}.patch"
+            path.write_bytes(
+                read_patch().replace(b"example.py", f"example{i}.py".encode())
+            )
+            paths.append(str(path))
+        walks = []
+        walk = os.walk
+
+        def counting_walk(top):
+            walks.append(top)
+            return walk(top)
+
+        monkeypatch.setattr(os, "walk", counting_walk)
+        results = list(
+            batch.iter_batch_results(
+                paths, max_workers=2, executor="process", cache=cache
+            )
+        )
+
+        assert not any("error" in result for result in results)
+        assert len(walks) == 1
+        entries = [
+            os.path.join(root, name)
+            for root, _, names in walk(cache.directory)
+            for name in names
+        ]
+        assert len(entries) == 4
+        assert cache.total_size == sum(map(os.path.getsize, entries))
+
+    def test_command_line_uses_cache(self, tmp_path, patch_file, capsys):
+        """Test that --cache-dir output matches an uncached run."""
+        cache_dir = str(tmp_path / "cli-cache")
+        main.main([patch_file])
+        uncached = capsys.readouterr().out
+
+        main.main(["--cache-dir", cache_dir, patch_file])
+        miss = capsys.readouterr().out
+        main.main(["--cache-dir", cache_dir, patch_file])
+        hit = capsys.readouterr().out
+
+        assert miss == uncached
+        assert hit == uncached
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_batch_populates_cache(self, cache, patch_file):
+        """Test that batch workers share results through the cache."""
+        from resonantrabbit import batch
+
+        (first,) = batch.iter_batch_results(
+            [patch_file], executor="thread", cache=cache
+        )
+        key = cache.key_for_file(patch_file)
+
+        assert cache.get(key) is not None
+        assert (first["empty_added"], first["empty_removed"]) == (4, 3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
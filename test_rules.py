@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass whitespace rule engine.
+Part of project resonantrabbit.
+"""
+
+import gzip
+import io
+import json
+import os
+
+import pytest
+import unidiff
+
+from resonantrabbit import main, rules
+from resonantrabbit.report import RuleViolation
+
+EMPTY_LINES_PATCH = os.path.join("testdata", "empty_lines.patch")
+
+
+def make_patch(*added, path="example.py", start=1):
+    """Return the bytes of a git patch adding lines to a new file."""
+    body = b"".join(b"+" + line for line in added)
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        "new file mode 100644\n"
+        "--- /dev/null\n"
+        f"+++ b/{path}\n"
+        f"@@ -0,0 +{start},{len(added)} @@\n"
+    ).encode() + body
+
+
+def check(spec, patch):
+    """Return (rule, line_no) of the violations of a patch under a spec."""
+    rule_set = rules.RuleSet.parse(spec)
+    return [(v.rule, v.line_no) for v in rule_set.iter_violations(io.BytesIO(patch))]
+
+
+class TestRuleSet:
+    """Test suite for the rules and their compiled check."""
+
+    def test_trailing_whitespace(self):
+        """Test that only lines with content followed by whitespace break it."""
+        patch = make_patch(b"a \n", b"b\t\n", b"  c\n", b"   \n", b"d \r\n", b"e")
+        assert check("trailing-whitespace", patch) == [
+            ("trailing-whitespace", 1),
+            ("trailing-whitespace", 2),
+            ("trailing-whitespace", 5),
+        ]
+
+    def test_crlf(self):
+        """Test that CRLF endings are reported and bare CRs are not."""
+        patch = make_patch(b"a\r\n", b"b\n", b"c\rd\n", b"\r\n")
+        assert check("crlf", patch) == [("crlf", 1), ("crlf", 4)]
+
+    @pytest.mark.parametrize(
+        "style, expected",
+        [
+            ("spaces", [("indent", 2), ("indent", 4)]),
+            ("tabs", [("indent", 1), ("indent", 4)]),
+        ],
+    )
+    def test_indent(self, style, expected):
+        """Test both indent styles; blank lines are left to the blank rules."""
+        patch = make_patch(b"    a\n", b"\tb\n", b"c\n", b" \tc\n", b"\t\t\n")
+        assert check(f"indent={style}", patch) == expected
+
+    def test_whitespace_only(self):
+        """Test that empty lines are allowed but whitespace-only lines are not."""
+        patch = make_patch(b"\n", b"\r\n", b" \n", b"\t\r\n", b"a\n", b"  ")
+        assert check("whitespace-only", patch) == [
+            ("whitespace-only", 3),
+            ("whitespace-only", 4),
+            ("whitespace-only", 6),
+        ]
+
+    def test_max_blank_run(self):
+        """Test that each run over the limit is reported once, at its first
+        line over the limit."""
+        patch = make_patch(b"\n", b"\n", b"\n", b"\n", b"a\n", b"\n", b"  \n", b"\n")
+        assert check("max-blank-run=2", patch) == [
+            ("max-blank-run", 3),
+            ("max-blank-run", 8),
+        ]
+        assert check("max-blank-run=0", make_patch(b"a\n", b"\n")) == [
+            ("max-blank-run", 2)
+        ]
+
+    def test_blank_run_broken_by_context_and_hunks(self):
+        """Test that context lines and hunk starts end a run of blank lines."""
+        patch = (
+            b"diff --git a/x.txt b/x.txt\n"
+            b"--- a/x.txt\n"
+            b"+++ b/x.txt\n"
+            b"@@ -1,2 +1,4 @@\n"
+            b"+\n"
+            b" a\n"
+            b"-b\n"
+            b"+\n"
+            b"+\n"
+            b"@@ -9,0 +13,1 @@\n"
+            b"+\n"
+        )
+        assert check("max-blank-run=2", patch) == []
+        assert check("max-blank-run=1", patch) == [("max-blank-run", 4)]
+        assert check("max-blank-run=0", patch) == [
+            ("max-blank-run", 1),
+            ("max-blank-run", 3),
+            ("max-blank-run", 13),
+        ]
+
+    def test_target_line_numbers_and_paths(self):
+        """Test violations across files of git and plain unified diffs."""
+        patch = (
+            make_patch(b"a\n", b"b \n", path="one.py", start=1) + b"--- two.txt.orig\n"
+            b"+++ two.txt\n"
+            b"@@ -10,2 +20,3 @@\n"
+            b" x\n"
+            b"-y\n"
+            b"+y \n"
+            b"+z\n"
+            b"\\ No newline at end of file\n"
+        )
+        violations = list(
+            rules.RuleSet.parse("trailing-whitespace").iter_violations(
+                io.BytesIO(patch)
+            )
+        )
+        assert [(v.path, v.line_no) for v in violations] == [
+            ("one.py", 2),
+            ("two.txt", 21),
+        ]
+
+    def test_combined_rules_single_match(self):
+        """Test that one line can break several rules in one match."""
+        rule_set = rules.RuleSet.parse("trailing-whitespace,crlf,indent=tabs")
+        assert rule_set.pattern.groups == 3
+        assert check(
+            "trailing-whitespace,crlf,indent=tabs", make_patch(b"  a \r\n")
+        ) == [
+            ("trailing-whitespace", 1),
+            ("crlf", 1),
+            ("indent", 1),
+        ]
+        assert rule_set.rules == ["trailing-whitespace", "crlf", "indent"]
+
+    def test_testdata_patch(self):
+        """Test the default rules on a checked-in patch."""
+        rule_set = rules.RuleSet.parse(rules.DEFAULT_RULES)
+        violations = list(rules.check_patch_file(EMPTY_LINES_PATCH, rule_set))
+        assert violations == [
+            RuleViolation(
+                "whitespace-only", "example.py", 6, "whitespace-only line added"
+            ),
+            RuleViolation(
+                "trailing-whitespace", "example.py", 9, "trailing whitespace added"
+            ),
+        ]
+        assert rules.format_violation(violations[1]) == (
+            "example.py:9: trailing-whitespace: trailing whitespace added"
+        )
+
+    def test_compressed_patch(self, tmp_path):
+        """Test that compressed patches are checked like plain ones."""
+        with open(EMPTY_LINES_PATCH, "rb") as f:
+            data = f.read()
+        compressed = tmp_path / "empty_lines.patch.gz"
+        compressed.write_bytes(gzip.compress(data))
+        rule_set = rules.RuleSet.parse(rules.DEFAULT_RULES)
+
+        assert list(rules.check_patch_file(str(compressed), rule_set)) == list(
+            rules.check_patch_file(EMPTY_LINES_PATCH, rule_set)
+        )
+
+    @pytest.mark.parametrize(
+        "spec",
+        [
+            "tabs",
+            "crlf=1",
+            "indent",
+            "indent=mixed",
+            "max-blank-run",
+            "max-blank-run=-1",
+        ],
+    )
+    def test_bad_spec(self, spec):
+        """Test that unknown rules and bad values are refused."""
+        with pytest.raises(ValueError):
+            rules.RuleSet.parse(spec)
+
+    def test_truncated_hunk(self):
+        """Test that a hunk shorter than its header is a parse error."""
+        with pytest.raises(unidiff.UnidiffParseError):
+            check("crlf", make_patch(b"a\n", b"b\n")[:-3])
+
+
+class TestRulesCommandLine:
+    """Test suite for the --rules option."""
+
+    def test_text(self, capsys):
+        """Test the text report and the exit status on violations."""
+        assert main.main([EMPTY_LINES_PATCH, "--rules"]) == 1
+        assert capsys.readouterr().out.splitlines() == [
+            "example.py:6: whitespace-only: whitespace-only line added",
+            "example.py:9: trailing-whitespace: trailing whitespace added",
+            "2 violations of trailing-whitespace, crlf, whitespace-only, max-blank-run",
+            "",
+        ]
+
+    def test_clean_patch(self, capsys):
+        """Test that a patch without violations exits with status 0."""
+        assert main.main(["testdata/simple.patch", "--rules", "crlf"]) == 0
+        assert capsys.readouterr().out == "0 violations of crlf\n\n"
+
+    def test_single_violation(self, capsys):
+        """Test that the summary of a single violation is singular."""
+        assert main.main([EMPTY_LINES_PATCH, "--rules", "trailing-whitespace"]) == 1
+        assert capsys.readouterr().out.splitlines()[-2] == (
+            "1 violation of trailing-whitespace"
+        )
+
+    def test_json_formats(self, capsys):
+        """Test the json and ndjson reports of several patches."""
+        patches = [EMPTY_LINES_PATCH, "testdata/simple.patch"]
+        assert (
+            main.main([
+                *patches,
+                "--rules",
+                "crlf,trailing-whitespace",
+                "--format",
+                "json",
+            ])
+            == 1
+        )
+        report = json.loads(capsys.readouterr().out)
+        assert [p["patch"] for p in report["patches"]] == patches
+        assert report["patches"][0]["violations"] == [
+            {
+                "rule": "trailing-whitespace",
+                "path": "example.py",
+                "line_no": 9,
+                "message": "trailing whitespace added",
+            }
+        ]
+        assert report["patches"][1]["violations"] == []
+
+        assert (
+            main.main([
+                *patches,
+                "--rules",
+                "trailing-whitespace",
+                "--format",
+                "ndjson",
+            ])
+            == 1
+        )
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [r["type"] for r in records] == ["violation", "totals", "totals"]
+        assert records[1] == {"type": "totals", "patch": patches[0], "violations": 1}
+
+    def test_bad_spec(self, capsys):
+        """Test that a bad spec is reported with status 2, not 1."""
+        assert main.main([EMPTY_LINES_PATCH, "--rules", "nope"]) == 2
+        assert "Bad --rules: Unknown rule: 'nope'" in capsys.readouterr().err
+
+    def test_unreadable_patches(self, tmp_path, capsys):
+        """Test that patches the check cannot read exit with status 2."""
+        bad_patch = tmp_path / "bad.patch"
+        bad_patch.write_text("diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1,2 +1,2 @@\n")
+
+        assert main.main([str(bad_patch), "--rules"]) == 2
+        assert main.main([str(tmp_path / "missing.patch"), "--rules"]) == 2
+        err = capsys.readouterr().err
+        assert "Could not parse patch" in err
+        assert "Patch file not found" in err
+
+    def test_usage_errors(self, tmp_path, capsys):
+        """Test that usage errors of --rules exit with status 2, not 1."""
+        with open(EMPTY_LINES_PATCH, "rb") as f:
+            data = f.read()
+        compressed = tmp_path / "empty_lines.patch.gz"
+        compressed.write_bytes(gzip.compress(data))
+
+        assert main.main([str(compressed), "--rules", "--headers-only"]) == 2
+        assert "need an uncompressed patch" in capsys.readouterr().err
+        for mode in (["--batch"], ["--fix"], ["--follow"], ["--file", "x.py"]):
+            assert main.main([EMPTY_LINES_PATCH, "--rules", *mode]) == 2
+            assert "--rules cannot be combined" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
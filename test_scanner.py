@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for the parse-free empty line scanner.
+Part of project resonantrabbit.
+"""
+
+import os
+import random
+
+import pytest
+import unidiff
+
+from resonantrabbit import main, scanner
+from resonantrabbit.report import EmptyLineCount
+
+LINE_VALUES = [
+    "",
+    " ",
+    "\t",
+    "    ",
+    " ",
+    "　 ",
+    "\x1c",
+    "-- looks like a header",
+    "++ also looks like a header",
+    "def function():",
+    "    return 1",
+    "naïve café",
+    "trailing space ",
+    "crlf line\r",
+    " \r",
+]
+
+
+def generate_patch(seed, file_count=20, git_headers=True):
+    """Generate a random but well-formed patch as a list of byte lines."""
+    rng = random.Random(seed)
+    lines = []
+
+    for i in range(file_count):
+        kind = rng.choice(["modified", "added", "removed", "renamed"])
+        if not git_headers:
+            kind = "modified"
+        source = f"a/dir/file{i}.txt"
+        target = f"b/dir/renamed{i}.txt" if kind == "renamed" else f"b/dir/file{i}.txt"
+
+        if git_headers:
+            lines.append(f"diff --git {source} {target}\n")
+            if kind == "added":
+                lines.append("new file mode 100644\n")
+            elif kind == "removed":
+                lines.append("deleted file mode 100644\n")
+            elif kind == "renamed":
+                lines.extend([
+                    "similarity index 80%\n",
+                    f"rename from dir/file{i}.txt\n",
+                    f"rename to dir/renamed{i}.txt\n",
+                ])
+            lines.append("index 1234567..89abcde 100644\n")
+        lines.extend([
+            f"--- {'/dev/null' if kind == 'added' else source}\n",
+            f"+++ {'/dev/null' if kind == 'removed' else target}\n",
+        ])
+
+        hunk_count = 1 if kind in ("added", "removed") else rng.randint(1, 4)
+        source_start = 1
+        for h in range(hunk_count):
+            body = []
+            for _ in range(rng.randint(1, 12)):
+                if kind == "added":
+                    line_type = "+"
+                elif kind == "removed":
+                    line_type = "-"
+                else:
+                    line_type = rng.choice(["+", "-", " ", " "])
+                body.append((line_type, rng.choice(LINE_VALUES)))
+
+            source_length = sum(1 for t, _ in body if t != "+")
+            target_length = sum(1 for t, _ in body if t != "-")
+            hunk_source_start = 0 if kind == "added" else source_start
+            hunk_target_start = 0 if kind == "removed" else source_start
+            lines.append(
+                f"@@ -{hunk_source_start},{source_length} "
+                f"+{hunk_target_start},{target_length} @@ section {h}\n"
+            )
+            for line_type, value in body:
+                # Some context lines are written as bare newlines like some tools do
+                if line_type == " " and value == "" and rng.random() < 0.3:
+                    lines.append("\n")
+                else:
+                    lines.append(f"{line_type}{value}\n")
+            if h == hunk_count - 1 and rng.random() < 0.2:
+                lines.append("\\ No newline at end of file\n")
+            source_start += source_length + rng.randint(5, 20)
+
+    return [line.encode("utf-8") for line in lines]
+
+
+def unidiff_counts(lines):
+    """Return per-file empty line counts computed from unidiff objects."""
+    return [
+        EmptyLineCount(summary.path, summary.empty_added, summary.empty_removed)
+        for summary in map(main.summarize_file, main.iter_patch_files(lines))
+    ]
+
+
+class TestScanner:
+    """Differential tests for the scanner against the unidiff path."""
+
+    @pytest.mark.parametrize(
+        "patch_name", ["empty_lines.patch", "generated_test.patch", "simple.patch"]
+    )
+    def test_matches_unidiff_on_testdata(self, patch_name):
+        """Test that scanner counts match unidiff on the shipped patches."""
+        patch_file = os.path.join("testdata", patch_name)
+        with open(patch_file, "rb") as f:
+            lines = f.readlines()
+
+        assert list(scanner.scan_empty_lines(patch_file)) == unidiff_counts(lines)
+
+    @pytest.mark.parametrize("seed", range(25))
+    def test_matches_unidiff_on_generated_patches(self, seed):
+        """Test that scanner counts match unidiff on generated git patches."""
+        lines = generate_patch(seed)
+
+        assert list(scanner.iter_empty_line_counts(lines)) == unidiff_counts(lines)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_unidiff_without_git_headers(self, seed):
+        """Test that plain unified diffs are split into files like unidiff does."""
+        lines = generate_patch(seed, git_headers=False)
+
+        assert list(scanner.iter_empty_line_counts(lines)) == unidiff_counts(lines)
+
+    def test_empty_line_report_matches(self, capsys):
+        """Test that the empty line report is identical on both paths."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+
+        main.demonstrate_empty_line_detection(main.stream_patch_from_file(patch_file))
+        expected = capsys.readouterr().out
+
+        main.print_empty_line_analysis(scanner.scan_empty_lines(patch_file))
+
+        assert capsys.readouterr().out == expected
+
+    def test_truncated_hunk_raises(self):
+        """Test that a hunk shorter than its header is rejected like unidiff."""
+        lines = generate_patch(0, file_count=1)[:-1]
+
+        with pytest.raises(unidiff.UnidiffParseError):
+            list(scanner.iter_empty_line_counts(lines))
+
+    def test_is_blank_unicode_whitespace(self):
+        """Test that blank detection agrees with str.strip()."""
+        for value in LINE_VALUES:
+            body = f"{value}\n".encode()
+            assert scanner.is_blank(body) == (f"{value}\n".strip() == "")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
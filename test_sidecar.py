@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent sidecar index.
+Part of project resonantrabbit.
+"""
+
+import os
+import shutil
+
+import pytest
+import unidiff
+
+from resonantrabbit import main, sidecar
+from test_scanner import generate_patch
+
+
+class TestSidecarIndex:
+    """Test suite for building, querying and refreshing .patch.idx files."""
+
+    @pytest.fixture
+    def patch_file(self, tmp_path):
+        """Write a generated patch to a temporary file."""
+        path = tmp_path / "generated.patch"
+        path.write_bytes(b"".join(generate_patch(3, file_count=30)))
+        return str(path)
+
+    def test_stats_match_unidiff(self, patch_file):
+        """Test that indexed statistics match a full unidiff analysis."""
+        summaries = list(
+            map(main.summarize_file, main.stream_patch_from_file(patch_file))
+        )
+
+        with sidecar.open_index(patch_file) as index:
+            assert os.path.exists(patch_file + ".idx")
+            assert len(index) == len(summaries)
+            for stats, summary in zip(index, summaries, strict=True):
+                assert (
+                    stats.path,
+                    stats.source_file,
+                    stats.target_file,
+                    stats.is_added_file,
+                    stats.is_removed_file,
+                    stats.is_modified_file,
+                    stats.added,
+                    stats.removed,
+                    stats.empty_added,
+                    stats.empty_removed,
+                    stats.hunk_count,
+                ) == (
+                    summary.path,
+                    summary.source_file,
+                    summary.target_file,
+                    summary.is_added_file,
+                    summary.is_removed_file,
+                    summary.is_modified_file,
+                    summary.added,
+                    summary.removed,
+                    summary.empty_added,
+                    summary.empty_removed,
+                    len(summary.hunks),
+                )
+            assert index.stats_for_path("no/such/file") is None
+
+    def test_hunk_lookup_matches_unidiff(self, patch_file):
+        """Test that a hunk read through the index equals the parsed one."""
+        with open(patch_file, "rb") as f:
+            expected = unidiff.PatchSet(f, encoding="utf-8")
+
+        with sidecar.open_index(patch_file) as index:
+            for patched_file in expected:
+                for number, expected_hunk in enumerate(patched_file, 1):
+                    hunk = index.hunk(patched_file.path, number)
+                    assert str(hunk) == str(expected_hunk)
+                    assert [line.diff_line_no for line in hunk] == [
+                        line.diff_line_no for line in expected_hunk
+                    ]
+                with pytest.raises(IndexError):
+                    index.hunk(patched_file.path, len(patched_file) + 1)
+
+    def test_changed_patch_is_reindexed(self, patch_file):
+        """Test that a patch with a new size gets a fresh index."""
+        with sidecar.open_index(patch_file) as index:
+            file_count = len(index)
+
+        with open(patch_file, "ab") as f:
+            f.write(b"".join(generate_patch(4, file_count=2)))
+
+        with sidecar.open_index(patch_file) as index:
+            assert len(index) == file_count + 2
+
+    def test_touched_patch_keeps_index(self, patch_file, monkeypatch):
+        """Test that an mtime change alone is resolved by the hash check."""
+        sidecar.build_index(patch_file)
+        stat = os.stat(patch_file)
+        os.utime(patch_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        def fail(*args, **kwargs):
+            raise AssertionError("index was rebuilt")
+
+        monkeypatch.setattr(sidecar, "build_index", fail)
+        with sidecar.open_index(patch_file) as index:
+            assert index.patch_mtime_ns == stat.st_mtime_ns + 10**9
+            assert not index.is_stale()
+
+    def test_same_size_edit_needs_hash_check(self, patch_file):
+        """Test that verify_hash catches edits that keep size and mtime."""
+        sidecar.build_index(patch_file)
+        stat = os.stat(patch_file)
+        with open(patch_file, "r+b") as f:
+            f.seek(-2, os.SEEK_END)
+            f.write(b"X\n")
+        os.utime(patch_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        with sidecar.PatchIndex(patch_file) as index:
+            assert not index.is_stale()
+            assert index.is_stale(verify_hash=True)
+        with sidecar.open_index(patch_file, verify_hash=True) as index:
+            assert not index.is_stale(verify_hash=True)
+
+    def test_corrupt_index_is_rebuilt(self, patch_file):
+        """Test that a truncated or foreign index file is replaced."""
+        index_path = sidecar.build_index(patch_file)
+        with open(index_path, "r+b") as f:
+            f.truncate(100)
+
+        with sidecar.open_index(patch_file) as index:
+            assert len(index) == 30
+
+    def test_command_line_queries(self, tmp_path, capsys):
+        """Test --file statistics and --hunk output."""
+        patch_file = str(tmp_path / "empty_lines.patch")
+        shutil.copy(os.path.join("testdata", "empty_lines.patch"), patch_file)
+
+        assert main.main([patch_file, "--file", "example.py"]) == 0
+        out = capsys.readouterr().out
+        assert "  Empty lines added: 2" in out
+        assert "  Number of hunks: 1" in out
+
+        assert main.main([patch_file, "--file", "example.py", "--hunk", "1"]) == 0
+        assert capsys.readouterr().out.startswith("@@ -1,8 +1,10 @@")
+
+        assert main.main([patch_file, "--file", "missing.py"]) == 1
+        assert main.main([patch_file, "--file", "example.py", "--hunk", "2"]) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
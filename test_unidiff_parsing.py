@@ -4,13 +4,19 @@ Tests for git patch parsing with unidiff library.
 Part of project resonantrabbit.
 """
 
+import io
+import json
 import os
 import subprocess
+import sys
 import tempfile
 
 import pytest
 import unidiff
 
+from resonantrabbit import main
+from resonantrabbit.report import EmptyLineEvent
+
 
 class TestUnidiffParsing:
     """Test suite for unidiff patch parsing."""
@@ -217,6 +223,164 @@ It has some empty lines.
         reconstructed_paths = [f.path for f in patch_set_2]
         assert original_paths == reconstructed_paths
 
+    @pytest.mark.parametrize(
+        "patch_name", ["empty_lines.patch", "generated_test.patch", "simple.patch"]
+    )
+    def test_stream_patch_matches_patchset(self, patch_name):
+        """Test that streaming a patch yields the same files as a full parse."""
+        patch_file = os.path.join("testdata", patch_name)
+        patch_set = unidiff.PatchSet.from_filename(patch_file, encoding="utf-8")
+
+        streamed = list(main.stream_patch_from_file(patch_file))
+
+        assert [str(f) for f in streamed] == [str(f) for f in patch_set]
+        assert [f.diff_line_no for f in streamed] == [f.diff_line_no for f in patch_set]
+        streamed_line_nos = [
+            line.diff_line_no for f in streamed for hunk in f for line in hunk
+        ]
+        original_line_nos = [
+            line.diff_line_no for f in patch_set for hunk in f for line in hunk
+        ]
+        assert streamed_line_nos == original_line_nos
+
+    def test_stream_patch_is_lazy(self):
+        """Test that files are parsed only as the stream is consumed."""
+        lines = iter([
+            b"diff --git a/one.txt b/one.txt\n",
+            b"--- a/one.txt\n",
+            b"+++ b/one.txt\n",
+            b"@@ -1 +1 @@\n",
+            b"-old\n",
+            b"+new\n",
+            b"diff --git a/two.txt b/two.txt\n",
+            b"--- a/two.txt\n",
+            b"+++ b/two.txt\n",
+            b"@@ -1 +1 @@\n",
+            b"-old\n",
+            b"+new\n",
+        ])
+        stream = main.iter_patch_files(lines)
+
+        first = next(stream)
+
+        assert first.path == "one.txt"
+        # Only the first file and the header of the second have been read
+        assert next(lines) == b"--- a/two.txt\n"
+
+    def test_summarize_file_empty_lines(self):
+        """Test that the single-pass summary finds empty line changes."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+        summaries = [
+            main.summarize_file(f) for f in main.stream_patch_from_file(patch_file)
+        ]
+
+        example = summaries[0]
+        assert example.path == "example.py"
+        assert (example.added, example.removed) == (5, 3)
+        assert (example.empty_added, example.empty_removed) == (2, 1)
+        assert example.hunks[0].empty_line_events == [
+            EmptyLineEvent("+", None, 3),
+            EmptyLineEvent("-", 5, None),
+            EmptyLineEvent("+", None, 6),
+        ]
+        assert example.hunks[0].has_more_lines
+        assert len(example.hunks[0].sample_lines) == main.SAMPLE_LINE_COUNT
+
+    def test_report_patch_matches_separate_reports(self, capsys):
+        """Test that the fused report prints the same text as both reports."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+
+        main.analyze_patch(main.stream_patch_from_file(patch_file))
+        main.demonstrate_empty_line_detection(main.stream_patch_from_file(patch_file))
+        separate = capsys.readouterr().out
+
+        main.report_patch(main.stream_patch_from_file(patch_file))
+        fused = capsys.readouterr().out
+
+        assert fused == separate
+
+
+class TestCommandLine:
+    """Test suite for the resonantrabbit command line entry point."""
+
+    def test_text_report(self, capsys):
+        """Test that the text format prints both reports for a patch path."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+
+        assert main.main([patch_file]) == 0
+
+        out = capsys.readouterr().out
+        assert out.startswith("=== Git Patch Parsing with Unidiff ===")
+        assert "PatchSet contains 3 files." in out
+        assert "=== Empty Line Change Analysis ===" in out
+
+    def test_stdin_matches_path(self, capsys, monkeypatch):
+        """Test that "-" reads the patch from standard input."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+        main.main([patch_file])
+        from_path = capsys.readouterr().out
+
+        with open(patch_file, "rb") as f:
+            monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(f.read())))
+        assert main.main(["-"]) == 0
+
+        assert capsys.readouterr().out == from_path
+
+    def test_json_report(self, capsys):
+        """Test that the JSON format is one document covering every patch."""
+        patches = [
+            os.path.join("testdata", "empty_lines.patch"),
+            os.path.join("testdata", "simple.patch"),
+        ]
+
+        assert main.main(["--format", "json", *patches]) == 0
+
+        document = json.loads(capsys.readouterr().out)
+        assert [p["patch"] for p in document["patches"]] == patches
+        first = document["patches"][0]
+        assert [f["path"] for f in first["files"]] == [
+            "example.py",
+            "config.txt",
+            "newfile.md",
+        ]
+        assert (first["total_empty_added"], first["total_empty_removed"]) == (4, 3)
+
+    def test_ndjson_report(self, capsys):
+        """Test that the NDJSON format has one record per file plus totals."""
+        patch_file = os.path.join("testdata", "empty_lines.patch")
+
+        assert main.main(["--format", "ndjson", patch_file]) == 0
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [r["type"] for r in records] == ["file", "file", "file", "totals"]
+        assert records[-1] == {
+            "type": "totals",
+            "patch": patch_file,
+            "files": 3,
+            "empty_added": 4,
+            "empty_removed": 3,
+        }
+
+    def test_missing_patch(self, capsys):
+        """Test that a missing patch file is reported with a failing status."""
+        assert main.main(["does-not-exist.patch"]) == 1
+        assert "Patch file not found" in capsys.readouterr().err
+
+    def test_piped_git_diff(self):
+        """Test piping a patch through the script as git diff output would be."""
+        with open(os.path.join("testdata", "empty_lines.patch"), "rb") as f:
+            patch_content = f.read()
+
+        result = subprocess.run(
+            [sys.executable, "-m", "resonantrabbit.main", "--format", "ndjson", "-"],
+            input=patch_content,
+            capture_output=True,
+            check=True,
+        )
+
+        totals = json.loads(result.stdout.splitlines()[-1])
+        assert (totals["empty_added"], totals["empty_removed"]) == (4, 3)
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the buffered report writer.
+Part of project resonantrabbit.
+"""
+
+import gzip
+import io
+import os
+
+import pytest
+
+from resonantrabbit import main, writer
+
+
+class CountingSink(io.BytesIO):
+    """In-memory binary sink that counts the writes it receives."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+class TestReportWriter:
+    """Test suite for ReportWriter and the --output options."""
+
+    @pytest.fixture
+    def patch_file(self):
+        """Path to the testdata patch with empty line changes."""
+        return os.path.join("testdata", "empty_lines.patch")
+
+    def test_report_matches_print_output(self, patch_file, capsys):
+        """Test that the buffered report has the same text as printing."""
+        main.report_patch(main.stream_patch_from_file(patch_file))
+        printed = capsys.readouterr().out
+
+        sink = CountingSink()
+        with writer.ReportWriter(sink) as out:
+            report = main.build_patch_report(main.stream_patch_from_file(patch_file))
+            main.print_patch_report(report.files, out)
+
+            assert sink.writes == 0
+            assert sink.getvalue() == b""
+            out.flush()
+            assert sink.getvalue().decode("utf-8") == printed
+
+    def test_buffer_policy_writes_when_full(self):
+        """Test that the buffer policy only writes once the buffer is full."""
+        sink = CountingSink()
+        out = writer.ReportWriter(sink, buffer_size=10)
+
+        out.write("abcd")
+        out.write("efgh")
+        assert sink.writes == 0
+        out.write("ijkl")
+        assert (sink.writes, sink.getvalue()) == (1, b"abcdefghijkl")
+
+    def test_block_policy_writes_every_block(self):
+        """Test that the block policy writes each block as it comes."""
+        sink = CountingSink()
+        out = writer.ReportWriter(sink, flush_policy="block")
+
+        writer.write_lines(out, ["one", ""])
+        writer.write_lines(out, ["two"])
+
+        assert (sink.writes, sink.getvalue()) == (2, b"one\n\ntwo\n")
+
+    def test_unknown_flush_policy(self):
+        """Test that an unknown flush policy is rejected."""
+        with pytest.raises(ValueError):
+            writer.ReportWriter(io.BytesIO(), flush_policy="line")
+
+    def test_output_file_and_gzip(self, patch_file, tmp_path, capsys):
+        """Test that --output writes the report and .gz names compress it."""
+        main.main([patch_file])
+        expected = capsys.readouterr().out
+
+        plain = tmp_path / "report.txt"
+        compressed = tmp_path / "report.txt.gz"
+        assert main.main(["--output", str(plain), patch_file]) == 0
+        assert main.main(["-o", str(compressed), patch_file]) == 0
+
+        assert capsys.readouterr().out == ""
+        assert plain.read_text(encoding="utf-8") == expected
+        assert gzip.decompress(compressed.read_bytes()).decode("utf-8") == expected
+
+    def test_gzip_standard_output(self, patch_file, capsysbinary):
+        """Test that --gzip compresses the report written to standard output."""
+        assert main.main(["--format", "ndjson", patch_file]) == 0
+        expected = capsysbinary.readouterr().out
+
+        assert main.main(["--gzip", "--format", "ndjson", patch_file]) == 0
+
+        assert gzip.decompress(capsysbinary.readouterr().out) == expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])